@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Async Document Status Monitor
+DocumentMonitor on an async SQLAlchemy engine, for use inside the API
+process or the asyncio recovery runner without blocking the event loop.
+Independent queries run concurrently on separate pooled connections.
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from document_monitor import (
+    _valid_uuids,
+    status_counts_query,
+    progression_query,
+    format_progression,
+    error_documents_query,
+    format_error_documents,
+    recent_changes_query,
+    format_recent_changes,
+)
+from logger import get_logger
+
+logger = get_logger()
+
+ASYNC_DRIVER = "postgresql+asyncpg"
+
+
+def async_engine_from_sync(sync_engine=None, **engine_kwargs) -> AsyncEngine:
+    """Async engine on the same database as the application's sync engine."""
+    if sync_engine is None:
+        from database.database import engine as sync_engine
+
+    url = sync_engine.url.set(drivername=ASYNC_DRIVER)
+    engine_kwargs.setdefault("pool_size", 5)
+    engine_kwargs.setdefault("pool_pre_ping", True)
+    return create_async_engine(url, **engine_kwargs)
+
+
+class AsyncDocumentMonitor:
+    """Async counterpart of DocumentMonitor with the same methods and results.
+
+    Pass the host process's async engine when it has one; otherwise an
+    asyncpg engine is derived from database.database.engine and disposed
+    by close().
+    """
+
+    def __init__(self, async_engine: AsyncEngine = None):
+        self._owns_engine = async_engine is None
+        self.engine = async_engine or async_engine_from_sync()
+
+    async def close(self):
+        if self._owns_engine:
+            await self.engine.dispose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _fetch(self, query: str, params: Dict) -> List:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(query), params)
+            return result.fetchall()
+
+    async def get_document_status_counts(self, org_id: str = None) -> Dict[str, int]:
+        """Get current status counts for all documents."""
+        rows = await self._fetch(*status_counts_query(org_id))
+        return {row.status: row.count for row in rows}
+
+    async def check_restarted_documents_progression(
+        self, document_ids: List[str]
+    ) -> Dict:
+        """Check status progression of specific restarted documents."""
+        if not document_ids:
+            return {"error": "No document IDs provided"}
+
+        uuid_list = _valid_uuids(document_ids)
+        if not uuid_list:
+            return {"error": "No valid UUIDs found"}
+
+        return format_progression(await self._fetch(*progression_query(uuid_list)))
+
+    async def analyze_error_documents(
+        self, limit: int = 50, org_id: str = None, cursor: str = None
+    ) -> Dict:
+        """Analyze a page of error documents for patterns."""
+        rows = await self._fetch(*error_documents_query(limit, org_id, cursor))
+        return format_error_documents(rows, limit, org_id)
+
+    async def get_recent_status_changes(
+        self, hours: int = 24, org_id: str = None
+    ) -> Dict:
+        """Get documents with recent status changes."""
+        rows = await self._fetch(*recent_changes_query(hours, org_id))
+        return format_recent_changes(rows, hours)
+
+    async def snapshot(
+        self,
+        org_id: str = None,
+        hours: int = 24,
+        error_limit: int = 50,
+        document_ids: List[str] = None,
+    ) -> Dict:
+        """Everything main() reports, queried concurrently."""
+        tasks = {
+            "status_counts": self.get_document_status_counts(org_id),
+            "recent_changes": self.get_recent_status_changes(hours, org_id),
+            "error_analysis": self.analyze_error_documents(error_limit, org_id),
+        }
+        if document_ids:
+            tasks["restart_progress"] = self.check_restarted_documents_progression(
+                document_ids
+            )
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        snapshot = {"timestamp": datetime.now().isoformat()}
+        for name, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                logger.add_log(
+                    "error", "all", f"ASYNC_MONITOR: {name} failed: {result}"
+                )
+                result = {"error": str(result)}
+            snapshot[name] = result
+        return snapshot
+
+
+async def main():
+    """Async version of document_monitor.main()."""
+    document_ids = sys.argv[1:]
+
+    print("=== Document Status Monitor (async) ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print()
+
+    async with AsyncDocumentMonitor() as monitor:
+        started = asyncio.get_running_loop().time()
+        snapshot = await monitor.snapshot(document_ids=document_ids)
+        elapsed = asyncio.get_running_loop().time() - started
+
+    print("=== Overall Status Distribution ===")
+    for status, count in snapshot["status_counts"].items():
+        print(f"{status}: {count}")
+    print()
+
+    recent_changes = snapshot["recent_changes"]
+    print("=== Recent Status Changes (24 hours) ===")
+    print(f"Total recent changes: {recent_changes.get('total_recent_changes')}")
+    for status, count in recent_changes.get("status_distribution", {}).items():
+        print(f"  {status}: {count}")
+    print()
+
+    error_analysis = snapshot["error_analysis"]
+    print("=== Error Document Analysis ===")
+    print(f"Total error documents: {error_analysis.get('total_error_documents')}")
+    for doc_type, count in error_analysis.get("doc_type_distribution", {}).items():
+        print(f"  {doc_type}: {count}")
+    print()
+
+    if "restart_progress" in snapshot:
+        progress = snapshot["restart_progress"]
+        print(f"=== Checking Specific Documents ({len(document_ids)} IDs) ===")
+        if "error" in progress:
+            print(f"Error: {progress['error']}")
+        else:
+            for status, count in progress["status_distribution"].items():
+                print(f"  {status}: {count}")
+        print()
+
+    print(f"All queries completed in {elapsed:.2f}s")
+    return snapshot
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Capacity Plan
+Throughput check for the Celery worker releases: reads each values file
+(merged over the chart defaults, like helm) and a per-document processing
+time, then reports documents/hour, time to drain the backlog and the
+replicas needed to drain it within an SLA, as autoscaling min/max values
+for templates/hpa.yaml.
+
+Processing time, backlog and arrival rate are measured from the database
+unless given on the command line:
+- processing time: time spent in 'running' from the status transition log
+  (time_in_state.py), which excludes queueing;
+- backlog: in-flight documents (pipeline_api.query_backlog);
+- arrivals: documents created per hour over the window, with completed
+  celery_taskmeta rows per hour as a cross-check of observed throughput.
+
+Usage:
+    python capacity_plan.py [--values FILE ...] [--sla-hours H]
+        [--latency SECONDS] [--backlog N] [--arrival-rate DOCS_PER_HOUR]
+"""
+
+import sys
+import os
+import glob
+import math
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+from worker_profiles import load_values
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RELEASE_VALUES = os.path.join(REPO_ROOT, "values-dev-api*.yaml")
+
+# Share of a worker slot planned to be busy; the rest absorbs bursts and
+# slow documents
+DEFAULT_UTILIZATION = 0.8
+# Queues carrying document pipeline tasks; releases consuming none of them
+# (beats, io) are not sized from document processing time
+DOCUMENT_QUEUES = tuple(
+    queue.strip()
+    for queue in os.getenv("CAPACITY_DOCUMENT_QUEUES", "celery").split(",")
+    if queue.strip()
+)
+DEFAULT_SLA_HOURS = 1.0
+MEASURE_WINDOW_HOURS = 24
+
+_CPU_UNITS = {"m": 0.001}
+_MEMORY_UNITS = {
+    "Ki": 2**10,
+    "Mi": 2**20,
+    "Gi": 2**30,
+    "Ti": 2**40,
+    "K": 10**3,
+    "M": 10**6,
+    "G": 10**9,
+    "T": 10**12,
+}
+
+
+def parse_cpu(quantity) -> Optional[float]:
+    """Kubernetes CPU quantity in cores ("500m" → 0.5)."""
+    if quantity in (None, ""):
+        return None
+    quantity = str(quantity)
+    for suffix, factor in _CPU_UNITS.items():
+        if quantity.endswith(suffix):
+            return float(quantity[: -len(suffix)]) * factor
+    return float(quantity)
+
+
+def parse_memory(quantity) -> Optional[int]:
+    """Kubernetes memory quantity in bytes ("512Mi" → 536870912)."""
+    if quantity in (None, ""):
+        return None
+    quantity = str(quantity)
+    for suffix in sorted(_MEMORY_UNITS, key=len, reverse=True):
+        if quantity.endswith(suffix):
+            return int(float(quantity[: -len(suffix)]) * _MEMORY_UNITS[suffix])
+    return int(float(quantity))
+
+
+def release_capacity(values_file: str) -> Dict:
+    """Worker layout of one release: replicas, slots and resources per pod."""
+    values = load_values([values_file])
+    celery = values.get("celery") or {}
+    profile_name = celery.get("workerProfile")
+    autoscaling = values.get("autoscaling") or {}
+    release = {
+        "values_file": os.path.basename(values_file),
+        "name": values.get("name")
+        or os.path.basename(values_file)[len("values-dev-") : -len(".yaml")],
+        "worker_profile": profile_name or None,
+    }
+    if not profile_name:
+        return release
+
+    profile = (celery.get("profiles") or {}).get(profile_name) or {}
+    # The profile's resources apply when the release sets none, as in the chart
+    resources = values.get("resources") or profile.get("resources") or {}
+    requests = resources.get("requests") or {}
+    limits = resources.get("limits") or {}
+    if autoscaling.get("enabled"):
+        replicas = (autoscaling.get("minReplicas"), autoscaling.get("maxReplicas"))
+    else:
+        replicas = (values.get("replicaCount", 1),) * 2
+
+    release.update(
+        queues=profile.get("queues") or [],
+        pool=profile.get("pool") or "prefork",
+        concurrency=int(profile.get("concurrency") or 1),
+        replicas_min=replicas[0],
+        replicas_max=replicas[1],
+        autoscaling=bool(autoscaling.get("enabled")),
+        cpu_request=parse_cpu(requests.get("cpu")),
+        cpu_limit=parse_cpu(limits.get("cpu")),
+        memory_request=parse_memory(requests.get("memory")),
+        memory_limit=parse_memory(limits.get("memory")),
+    )
+    return release
+
+
+def effective_slots(release: Dict, cpu_per_task: float = None) -> float:
+    """Documents one pod processes at once.
+
+    With ``cpu_per_task`` (cores a running document keeps busy) prefork
+    children beyond what the CPU limit can feed add no throughput.
+    """
+    slots = float(release["concurrency"])
+    if cpu_per_task and release.get("cpu_limit") and release["pool"] == "prefork":
+        slots = min(slots, release["cpu_limit"] / cpu_per_task)
+    return slots
+
+
+def plan(
+    release: Dict,
+    latency_seconds: float,
+    backlog: int,
+    arrival_rate: float,
+    sla_hours: float = DEFAULT_SLA_HOURS,
+    utilization: float = DEFAULT_UTILIZATION,
+    cpu_per_task: float = None,
+) -> Dict:
+    """Throughput, drain time and the replicas the SLA needs for one release.
+
+    Per pod: slots x 3600 / latency x utilization documents per hour. The
+    minimum keeps up with arrivals; the maximum also drains ``backlog``
+    within ``sla_hours``.
+    """
+    per_pod = effective_slots(release, cpu_per_task) * 3600 / latency_seconds
+    per_pod *= utilization
+    current = per_pod * release["replicas_max"]
+
+    spare = current - arrival_rate
+    drain_hours = backlog / spare if spare > 0 else None
+
+    needed_min = max(1, math.ceil(arrival_rate / per_pod)) if per_pod else None
+    needed_max = (
+        max(needed_min, math.ceil((arrival_rate + backlog / sla_hours) / per_pod))
+        if per_pod
+        else None
+    )
+
+    result = {
+        "docs_per_hour_per_pod": round(per_pod, 1),
+        "docs_per_hour": round(current, 1),
+        "drain_hours": round(drain_hours, 2) if drain_hours is not None else None,
+        "meets_sla": drain_hours is not None and drain_hours <= sla_hours,
+        "min_replicas": needed_min,
+        "max_replicas": needed_max,
+    }
+    if release.get("cpu_request") is not None:
+        result["cpu_requested_at_max"] = round(release["cpu_request"] * needed_max, 2)
+    if release.get("memory_request") is not None:
+        result["memory_requested_at_max_gib"] = round(
+            release["memory_request"] * needed_max / 2**30, 2
+        )
+    return result
+
+
+def hpa_values(result: Dict, utilization: float = DEFAULT_UTILIZATION) -> Dict:
+    """``autoscaling`` override for the release values file."""
+    return {
+        "autoscaling": {
+            "enabled": True,
+            "minReplicas": result["min_replicas"],
+            "maxReplicas": result["max_replicas"],
+            "targetCPUUtilizationPercentage": int(utilization * 100),
+        }
+    }
+
+
+def measure_workload(hours: int = MEASURE_WINDOW_HOURS) -> Dict:
+    """Processing time, backlog and arrival rate from the database."""
+    from sqlalchemy import text
+    from database.database import SessionLocal
+    from pipeline_api import query_backlog
+    from time_in_state import load_transitions, dwell_times
+
+    measured = {"window_hours": hours}
+
+    running = dwell_times(load_transitions(hours)).get("running") or {}
+    if running.get("completed"):
+        measured["latency_seconds"] = running["mean_seconds"]
+        measured["latency_p90_seconds"] = running["p90_seconds"]
+        measured["latency_samples"] = running["completed"]
+
+    backlog = query_backlog()
+    if "error" not in backlog:
+        measured["backlog"] = backlog["total"]
+
+    session = SessionLocal()
+    try:
+        cutoff = datetime.now() - timedelta(hours=hours)
+        created = session.execute(
+            text("""
+                SELECT COUNT(*) FROM documents
+                WHERE created_on >= :cutoff
+                AND is_deleted = false
+                """),
+            {"cutoff": cutoff},
+        ).scalar()
+        finished = session.execute(
+            text("""
+                SELECT COUNT(*) FROM celery_taskmeta
+                WHERE date_done >= :cutoff
+                AND status = 'SUCCESS'
+                """),
+            {"cutoff": cutoff},
+        ).scalar()
+        measured["arrival_rate"] = round((created or 0) / hours, 1)
+        measured["observed_tasks_per_hour"] = round((finished or 0) / hours, 1)
+    finally:
+        session.close()
+    return measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker capacity plan")
+    parser.add_argument(
+        "--values", action="append", help="release values file (default: all)"
+    )
+    parser.add_argument("--sla-hours", type=float, default=DEFAULT_SLA_HOURS)
+    parser.add_argument("--utilization", type=float, default=DEFAULT_UTILIZATION)
+    parser.add_argument("--latency", type=float, help="seconds per document")
+    parser.add_argument("--backlog", type=int, help="documents waiting")
+    parser.add_argument("--arrival-rate", type=float, help="new documents per hour")
+    parser.add_argument(
+        "--cpu-per-task", type=float, help="cores a running document keeps busy"
+    )
+    parser.add_argument("--hours", type=int, default=MEASURE_WINDOW_HOURS)
+    args = parser.parse_args()
+
+    print("=== Capacity Plan ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print()
+
+    workload = {}
+    if args.latency is None or args.backlog is None or args.arrival_rate is None:
+        try:
+            workload = measure_workload(args.hours)
+        except Exception as e:
+            print(f"⚠️  Could not measure the workload: {e}")
+    latency = args.latency or workload.get("latency_seconds")
+    backlog = args.backlog if args.backlog is not None else workload.get("backlog", 0)
+    arrival_rate = (
+        args.arrival_rate
+        if args.arrival_rate is not None
+        else workload.get("arrival_rate", 0.0)
+    )
+    if not latency:
+        print("❌ No processing time measured; pass --latency SECONDS")
+        return {"error": "no latency"}
+
+    source = "given" if args.latency else f"{workload.get('latency_samples')} docs"
+    print(f"Processing time: {latency:.1f}s per document ({source})")
+    if workload.get("latency_p90_seconds"):
+        print(f"  p90: {workload['latency_p90_seconds']:.1f}s")
+    print(f"Backlog: {backlog} documents, arrivals: {arrival_rate} docs/hour")
+    if "observed_tasks_per_hour" in workload:
+        print(f"Observed: {workload['observed_tasks_per_hour']} tasks/hour completed")
+    print(f"SLA: drain within {args.sla_hours}h at {args.utilization:.0%} utilization")
+    print()
+
+    report = {"workload": workload, "releases": {}}
+    for values_file in args.values or sorted(glob.glob(RELEASE_VALUES)):
+        release = release_capacity(values_file)
+        if not release["worker_profile"]:
+            continue
+        if not set(release["queues"]) & set(DOCUMENT_QUEUES):
+            print(
+                f"⏭️  {release['name']}: profile {release['worker_profile']} "
+                f"consumes {', '.join(release['queues'])}, not document queues"
+            )
+            print()
+            continue
+        result = plan(
+            release,
+            latency,
+            backlog,
+            arrival_rate,
+            args.sla_hours,
+            args.utilization,
+            args.cpu_per_task,
+        )
+        report["releases"][release["name"]] = {**release, **result}
+
+        replicas = (
+            f"{release['replicas_min']}-{release['replicas_max']}"
+            if release["autoscaling"]
+            else str(release["replicas_max"])
+        )
+        marker = "✅" if result["meets_sla"] else "❌"
+        print(
+            f"{marker} {release['name']} ({release['values_file']}, "
+            f"profile {release['worker_profile']})"
+        )
+        print(
+            f"   {replicas} replicas x {release['concurrency']} "
+            f"{release['pool']} slots → {result['docs_per_hour']} docs/hour "
+            f"({result['docs_per_hour_per_pod']} per pod)"
+        )
+        if result["drain_hours"] is None:
+            print("   Backlog never drains: arrivals exceed throughput")
+        else:
+            print(f"   Backlog drains in {result['drain_hours']}h")
+        print(
+            f"   Needed: min {result['min_replicas']}, max {result['max_replicas']}"
+            + (
+                f" ({result['cpu_requested_at_max']} CPU, "
+                f"{result['memory_requested_at_max_gib']} GiB requested at max)"
+                if "cpu_requested_at_max" in result
+                and "memory_requested_at_max_gib" in result
+                else ""
+            )
+        )
+        print("   Values override:")
+        for line in yaml.safe_dump(hpa_values(result, args.utilization)).splitlines():
+            print(f"     {line}")
+        print()
+
+    if not report["releases"]:
+        print("⚠️  No release values file runs a document processing worker")
+    return report
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
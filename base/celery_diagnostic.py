@@ -6,6 +6,7 @@ Check Celery task queue status and worker health
 
 import sys
 import os
+import argparse
 from datetime import datetime, timedelta
 
 # Add project root to Python path
@@ -14,10 +15,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import text
 from database.database import SessionLocal
 from logger import get_logger
+from diagnostics_cache import shared_cache
+from keyset import listing_scope, seek, split_page
 
 logger = get_logger()
 
 
+@shared_cache("celery_diagnostic.check_celery_task_status", ttl=30)
 def check_celery_task_status():
     """Check Celery task status and queue health."""
     session = SessionLocal()
@@ -94,6 +98,7 @@ def check_celery_task_status():
         session.close()
 
 
+@shared_cache("celery_diagnostic.check_document_processing_pipeline", ttl=30)
 def check_document_processing_pipeline():
     """Check document processing pipeline health."""
     session = SessionLocal()
@@ -141,10 +146,16 @@ def check_document_processing_pipeline():
         session.close()
 
 
-def analyze_error_patterns():
-    """Analyze error document patterns in detail."""
+@shared_cache("celery_diagnostic.analyze_error_patterns", ttl=60)
+def analyze_error_patterns(limit=20, cursor=None):
+    """Analyze error document patterns in detail.
+
+    Covers one keyset page of the last 24h of errors; ``next_cursor`` in
+    the result continues with older ones.
+    """
     session = SessionLocal()
     try:
+        scope = listing_scope("error_patterns")
         # Get recent error documents with extracted data analysis
         query = """
         SELECT
@@ -162,14 +173,14 @@ def analyze_error_patterns():
         WHERE status = 'error'
         AND is_deleted = false
         AND last_modified_on >= NOW() - INTERVAL '24 hours'
-        ORDER BY last_modified_on DESC
-        LIMIT 20
         """
 
-        result = session.execute(text(query))
+        tail, params = seek(cursor, scope, limit)
+        result = session.execute(text(query + tail), params)
+        rows, next_cursor = split_page(result, limit, scope)
         recent_errors = []
 
-        for row in result:
+        for row in rows:
             recent_errors.append(
                 {
                     "id": str(row.id),
@@ -204,6 +215,7 @@ def analyze_error_patterns():
             "doc_type_patterns": dict(doc_type_errors),
             "source_patterns": dict(source_errors),
             "data_status_patterns": dict(data_status_errors),
+            "next_cursor": next_cursor,
             "timestamp": datetime.now().isoformat(),
         }
 
@@ -214,6 +226,11 @@ def analyze_error_patterns():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Celery and pipeline diagnostic")
+    parser.add_argument("--error-limit", type=int, default=20)
+    parser.add_argument("--cursor", help="continue the error listing from here")
+    args = parser.parse_args()
+
     print("=== Celery and Document Processing Diagnostic ===")
     print(f"Timestamp: {datetime.now().isoformat()}")
     print()
@@ -253,7 +270,7 @@ def main():
 
     # Analyze error patterns
     print("=== Error Pattern Analysis ===")
-    error_patterns = analyze_error_patterns()
+    error_patterns = analyze_error_patterns(args.error_limit, args.cursor)
     if "error" in error_patterns:
         print(f"Error: {error_patterns['error']}")
     else:
@@ -261,7 +278,11 @@ def main():
         print("Doc type patterns:", error_patterns["doc_type_patterns"])
         print("Source patterns:", error_patterns["source_patterns"])
         print("Data status patterns:", error_patterns["data_status_patterns"])
+        if error_patterns["next_cursor"]:
+            print(f"Older errors: --cursor {error_patterns['next_cursor']}")
 
 
 if __name__ == "__main__":
-    main()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
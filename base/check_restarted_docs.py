@@ -5,6 +5,7 @@ Check specific restarted documents progression
 
 import sys
 import os
+import argparse
 from datetime import datetime, timedelta
 
 # Add project root to Python path
@@ -13,12 +14,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import text
 from database.database import SessionLocal
 from logger import get_logger
+from keyset import InvalidCursor, listing_scope, seek, split_page
 
 logger = get_logger()
 
 
-def get_recent_restarted_documents(limit=10):
-    """Get recently restarted documents to monitor their progression."""
+def restarted_documents_scope() -> str:
+    return listing_scope("restarted_documents")
+
+
+def get_restarted_documents_page(limit=10, cursor=None):
+    """One keyset page of RESTARTED documents, most recently modified first.
+
+    Returns the documents and ``next_cursor``, the token for the following
+    (older) page, or None when this is the last one.
+    """
     session = SessionLocal()
     try:
         query = """
@@ -32,14 +42,14 @@ def get_recent_restarted_documents(limit=10):
         FROM documents
         WHERE status = 'RESTARTED'
         AND is_deleted = false
-        ORDER BY last_modified_on DESC
-        LIMIT :limit
         """
 
-        result = session.execute(text(query), {"limit": limit})
+        tail, params = seek(cursor, restarted_documents_scope(), limit)
+        result = session.execute(text(query + tail), params)
+        rows, next_cursor = split_page(result, limit, restarted_documents_scope())
         documents = []
 
-        for row in result:
+        for row in rows:
             documents.append(
                 {
                     "id": str(row.id),
@@ -57,11 +67,16 @@ def get_recent_restarted_documents(limit=10):
                 }
             )
 
-        return documents
+        return {"documents": documents, "next_cursor": next_cursor}
     finally:
         session.close()
 
 
+def get_recent_restarted_documents(limit=10, cursor=None):
+    """Get recently restarted documents to monitor their progression."""
+    return get_restarted_documents_page(limit, cursor)["documents"]
+
+
 def check_processing_progression():
     """Check documents that might be stuck in processing states."""
     session = SessionLocal()
@@ -90,17 +105,28 @@ def check_processing_progression():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Recent restarted documents")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--cursor", help="continue from a previous page")
+    args = parser.parse_args()
+
     print("=== Recent Restarted Documents Monitor ===")
     print(f"Timestamp: {datetime.now().isoformat()}")
     print()
 
     # Get recent restarted documents
-    restarted_docs = get_recent_restarted_documents(10)
+    try:
+        page = get_restarted_documents_page(args.limit, args.cursor)
+    except InvalidCursor as e:
+        parser.error(f"--cursor: {e}")
+    restarted_docs = page["documents"]
     print(f"Recent RESTARTED documents ({len(restarted_docs)}):")
     for doc in restarted_docs:
         print(
             f"  {doc['id'][:8]}... | {doc['status']} | {doc['doc_type']} | {doc['filename']}"
         )
+    if page["next_cursor"]:
+        print(f"Next page: --cursor {page['next_cursor']}")
     print()
 
     # Check for potentially stuck documents
@@ -121,4 +147,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
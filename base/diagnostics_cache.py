@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Diagnostics Cache
+Redis-backed cache for diagnostic query results, shared by every pod and
+person running the same check. Each result is stored as JSON with a TTL;
+on a miss only one caller (per key, across processes) runs the query while
+the others wait for its result, and any Redis problem falls back to
+querying Postgres directly. Dicts keyed by anything but strings (status
+counts with a None status, say) are stored as key/value pairs so they come
+back with the same keys.
+
+Configured with DIAGNOSTICS_REDIS_URL (falling back to REDIS_URL); without
+it, or without the redis package, every call goes straight to the database.
+DIAGNOSTICS_CACHE=off disables the cache explicitly.
+"""
+
+import sys
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import functools
+from typing import Callable, Dict, Optional
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_explainer import explain_mode_active
+from recovery_guard import CircuitBreaker
+from logger import get_logger
+
+logger = get_logger()
+
+KEY_PREFIX = "diagnostics:v2"
+# A loader holding the lock longer than this is presumed dead
+LOCK_TTL_MS = 30000
+# How long waiters poll for the lock holder's result before querying
+# themselves
+WAIT_SECONDS = 10.0
+POLL_SECONDS = 0.05
+SOCKET_TIMEOUT = 0.25
+
+# Deletes the lock only if it still holds our token, so a loader that
+# overran LOCK_TTL_MS cannot release a lock another caller has taken since
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# Marks a dict stored as pairs because JSON object keys must be strings
+PAIRS_KEY = "__pairs__"
+
+
+def encode_value(value):
+    """``value`` with every non-string-keyed dict turned into key/value pairs."""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and PAIRS_KEY not in value:
+            return {key: encode_value(item) for key, item in value.items()}
+        return {PAIRS_KEY: [[key, encode_value(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def _decode_pairs(obj: Dict):
+    if len(obj) == 1 and PAIRS_KEY in obj:
+        return {
+            tuple(key) if isinstance(key, list) else key: item
+            for key, item in obj[PAIRS_KEY]
+        }
+    return obj
+
+
+def decode_value(payload):
+    return json.loads(payload, object_hook=_decode_pairs)
+
+
+class CircuitOpen(ConnectionError):
+    """Redis skipped because the breaker is open (already logged once)."""
+
+
+def redis_client_from_env():
+    """Redis client for DIAGNOSTICS_REDIS_URL / REDIS_URL, or None."""
+    if os.getenv("DIAGNOSTICS_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    url = os.getenv("DIAGNOSTICS_REDIS_URL") or os.getenv("REDIS_URL")
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError:
+        return None
+    return redis.Redis.from_url(
+        url,
+        socket_timeout=SOCKET_TIMEOUT,
+        socket_connect_timeout=SOCKET_TIMEOUT,
+    )
+
+
+class DiagnosticsCache:
+    """get_or_load over a Redis client, degrading to direct loads.
+
+    Redis errors feed a circuit breaker; while it is open calls skip Redis
+    entirely instead of paying a timeout each.
+    """
+
+    def __init__(self, client=None, breaker: CircuitBreaker = None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker(
+            "diagnostics-redis", failure_ratio=0.5, min_calls=3, window=10, cooldown=30
+        )
+        self._release = client.register_script(RELEASE_LOCK_SCRIPT) if client else None
+        self._breaker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "waited": 0, "fallbacks": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _redis(self, operation: Callable):
+        """Run a Redis call through the breaker; raises while it is open."""
+        with self._breaker_lock:
+            allowed = self.breaker.allow()
+        if not allowed:
+            raise CircuitOpen("diagnostics cache circuit open")
+        try:
+            result = operation()
+        except Exception:
+            with self._breaker_lock:
+                self.breaker.record(True)
+            raise
+        with self._breaker_lock:
+            self.breaker.record(False)
+        return result
+
+    def get_or_load(self, key: str, ttl: int, loader: Callable[[], Dict]) -> Dict:
+        if self.client is None or explain_mode_active():
+            return loader()
+
+        key = f"{KEY_PREFIX}:{key}"
+        token = uuid.uuid4().hex
+        lock = f"{key}:lock"
+        try:
+            cached = self._redis(lambda: self.client.get(key))
+            if cached is not None:
+                self._count("hits")
+                return decode_value(cached)
+
+            owner = self._redis(
+                lambda: self.client.set(lock, token, nx=True, px=LOCK_TTL_MS)
+            )
+            if not owner:
+                # Someone else is loading this key: wait for their result
+                self._count("waited")
+                deadline = time.monotonic() + WAIT_SECONDS
+                while not owner and time.monotonic() < deadline:
+                    time.sleep(POLL_SECONDS)
+                    cached = self._redis(lambda: self.client.get(key))
+                    if cached is not None:
+                        return decode_value(cached)
+                    # Taken over when the holder failed or gave up without
+                    # storing a result
+                    owner = self._redis(
+                        lambda: self.client.set(lock, token, nx=True, px=LOCK_TTL_MS)
+                    )
+        except CircuitOpen:
+            owner = False
+        except Exception as e:
+            owner = False
+            self._count("errors")
+            logger.add_log(
+                "warning", "all", f"DIAGNOSTICS_CACHE: falling back for {key}: {e}"
+            )
+
+        # Outside the try: a loader's own exception propagates as is rather
+        # than being mistaken for a Redis failure and run a second time
+        if owner:
+            return self._load(key, lock, token, ttl, loader)
+        self._count("fallbacks")
+        return loader()
+
+    def _load(self, key: str, lock: str, token: str, ttl: int, loader) -> Dict:
+        self._count("loads")
+        try:
+            value = loader()
+            if isinstance(value, dict) and "error" not in value:
+                payload = json.dumps(encode_value(value), default=str)
+                try:
+                    self._redis(lambda: self.client.set(key, payload, ex=ttl))
+                except Exception as e:
+                    logger.add_log(
+                        "warning", "all", f"DIAGNOSTICS_CACHE: store failed: {e}"
+                    )
+            return value
+        finally:
+            try:
+                self._redis(lambda: self._release(keys=[lock], args=[token]))
+            except Exception:
+                pass
+
+
+def cache_key(name: str, args, kwargs) -> str:
+    arguments = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha1(arguments.encode()).hexdigest()}"
+
+
+_default_cache: Optional[DiagnosticsCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> DiagnosticsCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DiagnosticsCache(redis_client_from_env())
+        return _default_cache
+
+
+def set_default_cache(cache: Optional[DiagnosticsCache]):
+    """Swap the process-wide cache (e.g. for an in-memory Redis stand-in)."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
+
+
+def shared_cache(name: str, ttl: int, method: bool = False, opt_in: bool = False):
+    """Cache a diagnostic function's result for ``ttl`` seconds.
+
+    The key is ``name`` plus the call's arguments; with ``method=True`` the
+    first argument (self) is left out of it. With ``opt_in=True`` calls go
+    to the database unless made with ``cached=True``, for reads that are
+    also compared before and after an action.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if opt_in and not kwargs.pop("cached", False):
+                return func(*args, **kwargs)
+            key_args = args[1:] if method else args
+            return default_cache().get_or_load(
+                cache_key(name, key_args, kwargs),
+                ttl,
+                lambda: func(*args, **kwargs),
+            )
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
@@ -11,6 +11,8 @@ from datetime import datetime
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from query_explainer import explain_mode_active
+from trigger_gate import run_gated
 from logger import get_logger
 
 logger = get_logger()
@@ -25,30 +27,32 @@ def direct_trigger_restarted_documents():
         print(f"Timestamp: {datetime.now().isoformat()}")
         print()
 
+        if explain_mode_active():
+            # The task enqueues work; only the monitor queries are explained
+            print("⏭️  Explain mode: skipping trigger_restarted_documents")
+            return {"status": "skipped", "reason": "explain mode"}
+
         # Import the function and run it with proper setup
         from ctasks.trigger_restarted_documents import trigger_restarted_documents
         from database.database import SessionLocal
-
-        # Create a mock Celery request object
-        class MockRequest:
-            def __init__(self):
-                self.id = f"direct-trigger-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-
-        # Mock self object
-        class MockSelf:
-            def __init__(self):
-                self.request = MockRequest()
+        from task_context import MockTaskSelf
 
         # Get database session manually since we're bypassing db_inject
         db = SessionLocal()
         try:
-            # Call the function with the database session
-            mock_self = MockSelf()
-            result = trigger_restarted_documents(mock_self, db=db)
+            # Call the function with the database session, under the trigger
+            # lock and only while the workers have headroom. The task picks
+            # its own batch size, so backpressure can only skip the run here.
+            mock_self = MockTaskSelf()
+            result = run_gated(
+                lambda batch_size: trigger_restarted_documents(mock_self, db=db)
+            )
 
             print("=== DIRECT TRIGGER RESULTS ===")
             if isinstance(result, dict):
                 print(f"Status: {result.get('status', 'Unknown')}")
+                if result.get("status") == "skipped":
+                    print(f"Reason: {result.get('reason')}")
                 print(f"Documents processed: {result.get('documents_processed', 0)}")
                 print(f"Documents queued: {result.get('documents_queued', 0)}")
                 print(f"Errors: {result.get('errors', 0)}")
@@ -73,43 +77,15 @@ def direct_trigger_restarted_documents():
 
 def check_status_before_and_after():
     """Check document status before and after direct trigger."""
-    from document_monitor import DocumentMonitor
-
-    monitor = DocumentMonitor()
-
-    print("=== STATUS BEFORE DIRECT TRIGGER ===")
-    before_status = monitor.get_document_status_counts()
-    for status, count in before_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
-
-    # Execute direct trigger
-    result = direct_trigger_restarted_documents()
+    from status_transitions import compare_around
 
-    # Wait a moment for any immediate changes
-    import time
-
-    time.sleep(2)
-
-    print("\n=== STATUS AFTER DIRECT TRIGGER ===")
-    after_status = monitor.get_document_status_counts()
-    for status, count in after_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
-
-    # Calculate changes
-    print("=== STATUS CHANGES ===")
-    for status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-        before_count = before_status.get(status, 0)
-        after_count = after_status.get(status, 0)
-        change = after_count - before_count
-        if change != 0:
-            print(f"{status}: {before_count} → {after_count} (change: {change:+d})")
-
-    return result
+    # settle_seconds gives the triggered tasks a moment to change status
+    return compare_around(
+        direct_trigger_restarted_documents, "DIRECT TRIGGER", settle_seconds=2
+    )
 
 
 if __name__ == "__main__":
-    check_status_before_and_after()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(check_status_before_and_after)
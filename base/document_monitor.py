@@ -6,8 +6,9 @@ Monitor progression of restarted documents and analyze error patterns.
 
 import sys
 import os
+import argparse
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 from collections import Counter
 import uuid
 
@@ -19,33 +20,232 @@ from sqlalchemy.orm import sessionmaker
 from database.database import engine, SessionLocal
 from database.models.models import Documents
 from logger import get_logger
+from diagnostics_cache import shared_cache
+from keyset import InvalidCursor, listing_scope, seek, split_page
 
 logger = get_logger()
 
 
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _valid_uuids(document_ids: List[str]) -> List[str]:
+    uuid_list = []
+    for doc_id in document_ids:
+        try:
+            if isinstance(doc_id, str):
+                uuid_list.append(str(uuid.UUID(doc_id)))
+            else:
+                uuid_list.append(str(doc_id))
+        except ValueError:
+            logger.add_log("warning", "all", f"Invalid UUID format: {doc_id}")
+            continue
+    return uuid_list
+
+
+# Query builders and row formatters shared by DocumentMonitor and
+# AsyncDocumentMonitor (async_document_monitor.py)
+
+
+def status_counts_query(org_id: str = None) -> Tuple[str, Dict]:
+    query = """
+    SELECT status, COUNT(*) as count
+    FROM documents
+    WHERE is_deleted = false
+    """
+
+    params = {}
+    if org_id:
+        query += " AND org_id = :org_id"
+        params["org_id"] = org_id
+
+    query += " GROUP BY status ORDER BY count DESC"
+    return query, params
+
+
+def progression_query(uuid_list: List[str]) -> Tuple[str, Dict]:
+    # Create placeholders for IN clause; compare on the uuid column
+    # itself (not id::text) so the primary key index is usable
+    placeholders = ",".join([f":id_{i}" for i in range(len(uuid_list))])
+    params = {f"id_{i}": uuid_val for i, uuid_val in enumerate(uuid_list)}
+
+    query = f"""
+    SELECT
+        id,
+        status,
+        doc_type,
+        filename,
+        created_on,
+        last_modified_on,
+        timestamp_for_validation
+    FROM documents
+    WHERE id IN ({placeholders})
+    AND is_deleted = false
+    ORDER BY last_modified_on DESC
+    """
+    return query, params
+
+
+def format_progression(rows) -> Dict:
+    documents = []
+    for row in rows:
+        documents.append(
+            {
+                "id": str(row.id),
+                "status": row.status,
+                "doc_type": row.doc_type,
+                "filename": row.filename,
+                "created_on": _iso(row.created_on),
+                "last_modified_on": _iso(row.last_modified_on),
+                "timestamp_for_validation": _iso(row.timestamp_for_validation),
+            }
+        )
+
+    # Analyze status distribution
+    status_counts = Counter(doc["status"] for doc in documents)
+
+    return {
+        "total_documents": len(documents),
+        "status_distribution": dict(status_counts),
+        "documents": documents,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def error_documents_scope(org_id: str = None) -> str:
+    return listing_scope("error_documents", org_id=org_id)
+
+
+def error_documents_query(
+    limit: int = 50, org_id: str = None, cursor: str = None
+) -> Tuple[str, Dict]:
+    """Error documents page, newest first, continuing after ``cursor``."""
+    query = """
+    SELECT
+        id,
+        status,
+        doc_type,
+        filename,
+        doc_source,
+        created_on,
+        last_modified_on,
+        extracted_data
+    FROM documents
+    WHERE status = 'error'
+    AND is_deleted = false
+    """
+
+    params = {}
+    if org_id:
+        query += " AND org_id = :org_id"
+        params["org_id"] = org_id
+
+    tail, page_params = seek(cursor, error_documents_scope(org_id), limit)
+    query += tail
+    params.update(page_params)
+    return query, params
+
+
+def format_error_document(row) -> Dict:
+    return {
+        "id": str(row.id),
+        "status": row.status,
+        "doc_type": row.doc_type,
+        "filename": row.filename,
+        "doc_source": row.doc_source,
+        "created_on": _iso(row.created_on),
+        "last_modified_on": _iso(row.last_modified_on),
+        "has_extracted_data": bool(row.extracted_data),
+    }
+
+
+def format_error_documents(rows, limit: int = 50, org_id: str = None) -> Dict:
+    rows, next_cursor = split_page(rows, limit, error_documents_scope(org_id))
+    error_docs = [format_error_document(row) for row in rows]
+
+    # Analyze patterns
+    doc_type_counts = Counter(doc["doc_type"] for doc in error_docs if doc["doc_type"])
+    doc_source_counts = Counter(
+        doc["doc_source"] for doc in error_docs if doc["doc_source"]
+    )
+
+    return {
+        "total_error_documents": len(error_docs),
+        "doc_type_distribution": dict(doc_type_counts),
+        "doc_source_distribution": dict(doc_source_counts),
+        "recent_errors": error_docs[:10],  # Show first 10 for details
+        "next_cursor": next_cursor,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def recent_changes_query(hours: int = 24, org_id: str = None) -> Tuple[str, Dict]:
+    cutoff_time = datetime.now() - timedelta(hours=hours)
+
+    query = """
+    SELECT
+        id,
+        status,
+        doc_type,
+        filename,
+        created_on,
+        last_modified_on
+    FROM documents
+    WHERE last_modified_on >= :cutoff_time
+    AND is_deleted = false
+    """
+
+    params = {"cutoff_time": cutoff_time}
+    if org_id:
+        query += " AND org_id = :org_id"
+        params["org_id"] = org_id
+
+    query += " ORDER BY last_modified_on DESC"
+    return query, params
+
+
+def format_recent_changes(rows, hours: int) -> Dict:
+    recent_changes = []
+    for row in rows:
+        recent_changes.append(
+            {
+                "id": str(row.id),
+                "status": row.status,
+                "doc_type": row.doc_type,
+                "filename": row.filename,
+                "created_on": _iso(row.created_on),
+                "last_modified_on": _iso(row.last_modified_on),
+            }
+        )
+
+    # Analyze status distribution
+    status_counts = Counter(doc["status"] for doc in recent_changes)
+
+    return {
+        "total_recent_changes": len(recent_changes),
+        "status_distribution": dict(status_counts),
+        "recent_changes": recent_changes[:20],  # Show first 20
+        "hours_analyzed": hours,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
 class DocumentMonitor:
     """Monitor document status progression and analyze patterns."""
 
     def __init__(self):
         self.engine = engine
 
+    @shared_cache("document_monitor.status_counts", ttl=30, method=True, opt_in=True)
     def get_document_status_counts(self, org_id: str = None) -> Dict[str, int]:
-        """Get current status counts for all documents."""
+        """Get current status counts for all documents.
+
+        Read from the database unless called with ``cached=True``.
+        """
         session = SessionLocal()
         try:
-            query = """
-            SELECT status, COUNT(*) as count
-            FROM documents
-            WHERE is_deleted = false
-            """
-
-            params = {}
-            if org_id:
-                query += " AND org_id = :org_id"
-                params["org_id"] = org_id
-
-            query += " GROUP BY status ORDER BY count DESC"
-
+            query, params = status_counts_query(org_id)
             result = session.execute(text(query), params)
             return {row.status: row.count for row in result}
         finally:
@@ -56,211 +256,105 @@ class DocumentMonitor:
         if not document_ids:
             return {"error": "No document IDs provided"}
 
+        uuid_list = _valid_uuids(document_ids)
+        if not uuid_list:
+            return {"error": "No valid UUIDs found"}
+
         session = SessionLocal()
         try:
-            # Convert string IDs to UUID format for query
-            uuid_list = []
-            for doc_id in document_ids:
-                try:
-                    if isinstance(doc_id, str):
-                        uuid_list.append(str(uuid.UUID(doc_id)))
-                    else:
-                        uuid_list.append(str(doc_id))
-                except ValueError:
-                    logger.add_log("warning", "all", f"Invalid UUID format: {doc_id}")
-                    continue
-
-            if not uuid_list:
-                return {"error": "No valid UUIDs found"}
-
-            # Create placeholders for IN clause
-            placeholders = ",".join([f":id_{i}" for i in range(len(uuid_list))])
-            params = {f"id_{i}": uuid_val for i, uuid_val in enumerate(uuid_list)}
-
-            query = f"""
-            SELECT
-                id,
-                status,
-                doc_type,
-                filename,
-                created_on,
-                last_modified_on,
-                timestamp_for_validation
-            FROM documents
-            WHERE id::text IN ({placeholders})
-            AND is_deleted = false
-            ORDER BY last_modified_on DESC
-            """
-
+            query, params = progression_query(uuid_list)
             result = session.execute(text(query), params)
-            documents = []
-
-            for row in result:
-                documents.append(
-                    {
-                        "id": str(row.id),
-                        "status": row.status,
-                        "doc_type": row.doc_type,
-                        "filename": row.filename,
-                        "created_on": (
-                            row.created_on.isoformat() if row.created_on else None
-                        ),
-                        "last_modified_on": (
-                            row.last_modified_on.isoformat()
-                            if row.last_modified_on
-                            else None
-                        ),
-                        "timestamp_for_validation": (
-                            row.timestamp_for_validation.isoformat()
-                            if row.timestamp_for_validation
-                            else None
-                        ),
-                    }
-                )
-
-            # Analyze status distribution
-            status_counts = Counter(doc["status"] for doc in documents)
-
-            return {
-                "total_documents": len(documents),
-                "status_distribution": dict(status_counts),
-                "documents": documents,
-                "timestamp": datetime.now().isoformat(),
-            }
+            return format_progression(result)
         finally:
             session.close()
 
-    def analyze_error_documents(self, limit: int = 50, org_id: str = None) -> Dict:
-        """Analyze recent error documents for patterns."""
+    @shared_cache("document_monitor.error_documents", ttl=60, method=True)
+    def analyze_error_documents(
+        self, limit: int = 50, org_id: str = None, cursor: str = None
+    ) -> Dict:
+        """Analyze a page of error documents for patterns.
+
+        Pass the returned ``next_cursor`` back as ``cursor`` for the next
+        (older) page; it is None on the last one.
+        """
         session = SessionLocal()
         try:
-            query = """
-            SELECT
-                id,
-                status,
-                doc_type,
-                filename,
-                doc_source,
-                created_on,
-                last_modified_on,
-                extracted_data
-            FROM documents
-            WHERE status = 'error'
-            AND is_deleted = false
-            """
-
-            params = {}
-            if org_id:
-                query += " AND org_id = :org_id"
-                params["org_id"] = org_id
-
-            query += " ORDER BY last_modified_on DESC LIMIT :limit"
-            params["limit"] = limit
-
+            query, params = error_documents_query(limit, org_id, cursor)
             result = session.execute(text(query), params)
-            error_docs = []
-
-            for row in result:
-                error_docs.append(
-                    {
-                        "id": str(row.id),
-                        "status": row.status,
-                        "doc_type": row.doc_type,
-                        "filename": row.filename,
-                        "doc_source": row.doc_source,
-                        "created_on": (
-                            row.created_on.isoformat() if row.created_on else None
-                        ),
-                        "last_modified_on": (
-                            row.last_modified_on.isoformat()
-                            if row.last_modified_on
-                            else None
-                        ),
-                        "has_extracted_data": bool(row.extracted_data),
-                    }
-                )
+            return format_error_documents(result, limit, org_id)
+        finally:
+            session.close()
 
-            # Analyze patterns
-            doc_type_counts = Counter(
-                doc["doc_type"] for doc in error_docs if doc["doc_type"]
-            )
-            doc_source_counts = Counter(
-                doc["doc_source"] for doc in error_docs if doc["doc_source"]
+    def get_error_documents_page(
+        self, limit: int = 50, org_id: str = None, cursor: str = None
+    ) -> Dict:
+        """One keyset page of error documents and the cursor for the next."""
+        session = SessionLocal()
+        try:
+            query, params = error_documents_query(limit, org_id, cursor)
+            rows, next_cursor = split_page(
+                session.execute(text(query), params),
+                limit,
+                error_documents_scope(org_id),
             )
-
             return {
-                "total_error_documents": len(error_docs),
-                "doc_type_distribution": dict(doc_type_counts),
-                "doc_source_distribution": dict(doc_source_counts),
-                "recent_errors": error_docs[:10],  # Show first 10 for details
-                "timestamp": datetime.now().isoformat(),
+                "documents": [format_error_document(row) for row in rows],
+                "next_cursor": next_cursor,
             }
         finally:
             session.close()
 
+    def iter_error_documents(
+        self, page_size: int = 500, org_id: str = None
+    ) -> Iterator[Dict]:
+        """Every error document, newest first, one keyset page per query."""
+        cursor = None
+        while True:
+            page = self.get_error_documents_page(page_size, org_id, cursor)
+            yield from page["documents"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    @shared_cache("document_monitor.recent_status_changes", ttl=60, method=True)
     def get_recent_status_changes(self, hours: int = 24, org_id: str = None) -> Dict:
         """Get documents with recent status changes."""
         session = SessionLocal()
         try:
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-
-            query = """
-            SELECT
-                id,
-                status,
-                doc_type,
-                filename,
-                created_on,
-                last_modified_on
-            FROM documents
-            WHERE last_modified_on >= :cutoff_time
-            AND is_deleted = false
-            """
-
-            params = {"cutoff_time": cutoff_time}
-            if org_id:
-                query += " AND org_id = :org_id"
-                params["org_id"] = org_id
-
-            query += " ORDER BY last_modified_on DESC"
-
+            query, params = recent_changes_query(hours, org_id)
             result = session.execute(text(query), params)
-            recent_changes = []
-
-            for row in result:
-                recent_changes.append(
-                    {
-                        "id": str(row.id),
-                        "status": row.status,
-                        "doc_type": row.doc_type,
-                        "filename": row.filename,
-                        "created_on": (
-                            row.created_on.isoformat() if row.created_on else None
-                        ),
-                        "last_modified_on": (
-                            row.last_modified_on.isoformat()
-                            if row.last_modified_on
-                            else None
-                        ),
-                    }
-                )
-
-            # Analyze status distribution
-            status_counts = Counter(doc["status"] for doc in recent_changes)
-
-            return {
-                "total_recent_changes": len(recent_changes),
-                "status_distribution": dict(status_counts),
-                "recent_changes": recent_changes[:20],  # Show first 20
-                "hours_analyzed": hours,
-                "timestamp": datetime.now().isoformat(),
-            }
+            return format_recent_changes(result, hours)
         finally:
             session.close()
 
 
 def main():
     """Main monitoring function."""
+    parser = argparse.ArgumentParser(description="Document status monitor")
+    parser.add_argument("document_ids", nargs="*", help="restarted documents")
+    parser.add_argument("--error-limit", type=int, default=50)
+    parser.add_argument("--cursor", help="continue the error listing from here")
+    parser.add_argument(
+        "--export", metavar="FILE", help="write a columnar snapshot and exit"
+    )
+    parser.add_argument("--status", action="append", help="export filter")
+    parser.add_argument("--org", help="export filter")
+    parser.add_argument("--hours", type=int, help="export filter")
+    args = parser.parse_args()
+
+    if args.export:
+        from document_snapshot import export_snapshot
+
+        print("=== Document Snapshot Export ===")
+        result = export_snapshot(
+            args.export, statuses=args.status, org_id=args.org, hours=args.hours
+        )
+        if "error" in result:
+            print(f"Error: {result['error']}")
+        else:
+            print(f"Exported {result['rows']} documents to {result['path']}")
+        return result
+
     monitor = DocumentMonitor()
 
     print("=== Document Status Monitor ===")
@@ -269,7 +363,7 @@ def main():
 
     # Overall status counts
     print("=== Overall Status Distribution ===")
-    status_counts = monitor.get_document_status_counts()
+    status_counts = monitor.get_document_status_counts(cached=True)
     for status, count in status_counts.items():
         print(f"{status}: {count}")
     print()
@@ -285,7 +379,12 @@ def main():
 
     # Error document analysis
     print("=== Error Document Analysis ===")
-    error_analysis = monitor.analyze_error_documents(limit=50)
+    try:
+        error_analysis = monitor.analyze_error_documents(
+            limit=args.error_limit, cursor=args.cursor
+        )
+    except InvalidCursor as e:
+        parser.error(f"--cursor: {e}")
     print(f"Total error documents: {error_analysis['total_error_documents']}")
     print("Doc type distribution:")
     for doc_type, count in error_analysis["doc_type_distribution"].items():
@@ -293,11 +392,13 @@ def main():
     print("Doc source distribution:")
     for doc_source, count in error_analysis["doc_source_distribution"].items():
         print(f"  {doc_source}: {count}")
+    if error_analysis["next_cursor"]:
+        print(f"Older errors: --cursor {error_analysis['next_cursor']}")
     print()
 
     # Check for specific restarted documents if provided as arguments
-    if len(sys.argv) > 1:
-        document_ids = sys.argv[1:]
+    if args.document_ids:
+        document_ids = args.document_ids
         print(f"=== Checking Specific Documents ({len(document_ids)} IDs) ===")
         restart_progress = monitor.check_restarted_documents_progression(document_ids)
 
@@ -317,4 +418,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Document Snapshot
+Export id, org, status, doc_type, doc_source and timestamps of a filtered
+set of documents into a compact columnar file, so incident analysis can be
+rerun locally as often as needed instead of against production.
+
+Rows are streamed from a server-side cursor in FETCH_CHUNK_SIZE chunks and
+appended column by column, so memory stays flat however many documents
+match. The file is Parquet when pyarrow is installed; otherwise a packed
+format of the same columns built from ``array`` buffers:
+
+    ids          16-byte UUIDs
+    categories   uint32 codes into a per-column dictionary
+                 (org_id, status, doc_type, doc_source)
+    timestamps   int64 microseconds since the epoch, NULL_TIME for NULL
+
+load_snapshot() memory-maps either format and hands out the columns
+without copying them, ready for NumPy (numpy.frombuffer) or plain loops.
+
+Usage:
+    python document_snapshot.py export FILE [--status S ...] [--org ORG_ID]
+                                [--hours N] [--format parquet|packed]
+    python document_snapshot.py info FILE
+"""
+
+import sys
+import os
+import json
+import mmap
+import uuid
+import shutil
+import struct
+import argparse
+import tempfile
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+from sqlalchemy import bindparam, text
+from database.database import SessionLocal
+from query_explainer import explain_mode_active
+from logger import get_logger
+
+logger = get_logger()
+
+FETCH_CHUNK_SIZE = 50000
+
+CATEGORY_COLUMNS = ("org_id", "status", "doc_type", "doc_source")
+TIME_COLUMNS = ("created_on", "last_modified_on")
+COLUMNS = ("id",) + CATEGORY_COLUMNS + TIME_COLUMNS
+
+# Packed format: MAGIC, 8-byte aligned column blocks, JSON footer,
+# footer length (uint64 LE), MAGIC
+MAGIC = b"DOCSNAP1"
+FORMAT_VERSION = 1
+NULL_TIME = -(2**63)
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _micros(value) -> int:
+    """Microseconds since the epoch; naive timestamps are taken as stored."""
+    if value is None:
+        return NULL_TIME
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _uuid_bytes(value) -> bytes:
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    return uuid.UUID(str(value)).bytes
+
+
+def from_micros(value: int) -> Optional[datetime]:
+    return None if value == NULL_TIME else _EPOCH + value * _MICROSECOND
+
+
+def snapshot_query(
+    statuses: List[str] = None, org_id: str = None, hours: int = None
+) -> Tuple:
+    """The export SELECT for the given filters and its parameters."""
+    query = f"""
+        SELECT {', '.join(COLUMNS)}
+        FROM documents
+        WHERE is_deleted = false
+    """
+    params = {}
+    if statuses:
+        query += " AND status IN :statuses"
+        params["statuses"] = list(statuses)
+    if org_id:
+        query += " AND org_id = :org_id"
+        params["org_id"] = org_id
+    if hours:
+        query += " AND last_modified_on >= :since"
+        params["since"] = datetime.now() - timedelta(hours=hours)
+
+    statement = text(query)
+    if statuses:
+        statement = statement.bindparams(bindparam("statuses", expanding=True))
+    return statement, params
+
+
+def stream_documents(
+    statuses: List[str] = None,
+    org_id: str = None,
+    hours: int = None,
+    chunk_size: int = FETCH_CHUNK_SIZE,
+) -> Iterator[List]:
+    """Chunks of export rows from a server-side cursor."""
+    session = SessionLocal()
+    try:
+        statement, params = snapshot_query(statuses, org_id, hours)
+        result = session.execute(
+            statement.execution_options(stream_results=True), params
+        )
+        for rows in result.partitions(chunk_size):
+            yield rows
+    finally:
+        session.close()
+
+
+class PackedWriter:
+    """Appends chunks to one spool file per column, assembled on close()."""
+
+    def __init__(self, path: str, metadata: Dict):
+        self.path = path
+        self.metadata = metadata
+        self.rows = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        self._spools = {name: tempfile.TemporaryFile(dir=directory) for name in COLUMNS}
+        self._dictionaries: Dict[str, Dict] = {name: {} for name in CATEGORY_COLUMNS}
+
+    def _codes(self, name: str, values) -> array:
+        dictionary = self._dictionaries[name]
+        codes = array("I")
+        for value in values:
+            code = dictionary.get(value)
+            if code is None:
+                code = dictionary[value] = len(dictionary)
+            codes.append(code)
+        return codes
+
+    def write(self, rows: List):
+        self._spools["id"].write(b"".join(_uuid_bytes(row.id) for row in rows))
+        for name in CATEGORY_COLUMNS:
+            self._codes(name, [getattr(row, name) for row in rows]).tofile(
+                self._spools[name]
+            )
+        for name in TIME_COLUMNS:
+            array("q", [_micros(getattr(row, name)) for row in rows]).tofile(
+                self._spools[name]
+            )
+        self.rows += len(rows)
+
+    def close(self):
+        columns = {}
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as out:
+            out.write(MAGIC)
+            for name in COLUMNS:
+                out.write(b"\0" * (-out.tell() % 8))
+                spool = self._spools[name]
+                length = spool.tell()
+                spool.seek(0)
+                offset = out.tell()
+                shutil.copyfileobj(spool, out)
+                spool.close()
+                column = {"offset": offset, "length": length}
+                if name == "id":
+                    column.update(kind="uuid", typecode="B")
+                elif name in CATEGORY_COLUMNS:
+                    column.update(
+                        kind="category",
+                        typecode="I",
+                        dictionary=list(self._dictionaries[name]),
+                    )
+                else:
+                    column.update(kind="timestamp", typecode="q")
+                columns[name] = column
+
+            footer = json.dumps(
+                {
+                    "version": FORMAT_VERSION,
+                    "byteorder": sys.byteorder,
+                    "rows": self.rows,
+                    "metadata": self.metadata,
+                    "columns": columns,
+                },
+                default=str,
+            ).encode()
+            out.write(footer)
+            out.write(struct.pack("<Q", len(footer)))
+            out.write(MAGIC)
+        os.replace(temporary, self.path)
+
+
+class ParquetWriter:
+    """Streams chunks into Parquet row groups (dictionary-encoded, zstd)."""
+
+    def __init__(self, path: str, metadata: Dict):
+        self.path = path
+        self.rows = 0
+        self.schema = pa.schema(
+            [("id", pa.string())]
+            + [(name, pa.string()) for name in CATEGORY_COLUMNS]
+            + [(name, pa.timestamp("us")) for name in TIME_COLUMNS],
+            metadata={"document_snapshot": json.dumps(metadata, default=str)},
+        )
+        self._temporary = f"{path}.tmp"
+        self._writer = pq.ParquetWriter(
+            self._temporary, self.schema, compression="zstd", use_dictionary=True
+        )
+
+    def write(self, rows: List):
+        arrays = [pa.array([str(row.id) for row in rows], pa.string())]
+        for name in CATEGORY_COLUMNS:
+            arrays.append(pa.array([getattr(row, name) for row in rows], pa.string()))
+        for name in TIME_COLUMNS:
+            micros = [_micros(getattr(row, name)) for row in rows]
+            arrays.append(
+                pa.array(
+                    [None if m == NULL_TIME else m for m in micros], pa.int64()
+                ).cast(pa.timestamp("us"))
+            )
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self._temporary, self.path)
+
+
+def export_snapshot(
+    path: str,
+    statuses: List[str] = None,
+    org_id: str = None,
+    hours: int = None,
+    fmt: str = None,
+    chunk_size: int = FETCH_CHUNK_SIZE,
+) -> Dict:
+    """Write the filtered documents to ``path``; returns rows and file size."""
+    fmt = fmt or ("parquet" if pq is not None else "packed")
+    if fmt == "parquet" and pq is None:
+        return {"error": "Parquet export needs pyarrow; use --format packed"}
+
+    metadata = {
+        "exported_at": datetime.now().isoformat(),
+        "filters": {"statuses": statuses, "org_id": org_id, "hours": hours},
+    }
+    if explain_mode_active():
+        # Plan the export query without writing a file
+        for _ in stream_documents(statuses, org_id, hours, chunk_size):
+            break
+        return {"path": path, "format": fmt, "rows": 0, "explain": True}
+
+    writer = (ParquetWriter if fmt == "parquet" else PackedWriter)(path, metadata)
+    for rows in stream_documents(statuses, org_id, hours, chunk_size):
+        writer.write(rows)
+    writer.close()
+    logger.add_log(
+        "info", "all", f"DOCUMENT_SNAPSHOT: exported {writer.rows} documents to {path}"
+    )
+    return {
+        "path": path,
+        "format": fmt,
+        "rows": writer.rows,
+        "bytes": os.path.getsize(path),
+    }
+
+
+class PackedSnapshot:
+    """Memory-mapped packed snapshot; columns are zero-copy memoryviews."""
+
+    format = "packed"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if view[:8] != MAGIC or view[-8:] != MAGIC:
+            view.release()
+            self.close()
+            raise ValueError(f"{path}: not a document snapshot")
+        (footer_length,) = struct.unpack("<Q", view[-16:-8])
+        footer = json.loads(bytes(view[-16 - footer_length : -16]))
+        self.rows = footer["rows"]
+        self.metadata = footer["metadata"]
+        self._columns = footer["columns"]
+        self._swap = footer["byteorder"] != sys.byteorder
+        self._view = view
+
+    def _raw(self, name: str) -> memoryview:
+        column = self._columns[name]
+        block = self._view[column["offset"] : column["offset"] + column["length"]]
+        if self._swap and column["typecode"] != "B":
+            # Written on a machine of the other endianness: copy once
+            swapped = array(column["typecode"], block.tobytes())
+            swapped.byteswap()
+            return memoryview(swapped)
+        return block.cast(column["typecode"])
+
+    def category(self, name: str) -> Tuple[memoryview, List]:
+        """(codes, dictionary): row i has value dictionary[codes[i]]."""
+        return self._raw(name), self._columns[name]["dictionary"]
+
+    def timestamps(self, name: str) -> memoryview:
+        """int64 microseconds since the epoch, NULL_TIME where NULL."""
+        return self._raw(name)
+
+    def ids(self) -> List[str]:
+        raw = self._raw("id")
+        return [
+            str(uuid.UUID(bytes=bytes(raw[i : i + 16]))) for i in range(0, len(raw), 16)
+        ]
+
+    def close(self):
+        self._view = None
+        try:
+            self._map.close()
+        except BufferError:
+            # Columns handed out are still referenced; the mapping is
+            # released together with the last of them
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetSnapshot:
+    """Parquet snapshot read through a memory map, same accessors as packed."""
+
+    format = "parquet"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.table = pq.read_table(path, memory_map=True)
+        self.rows = self.table.num_rows
+        described = (self.table.schema.metadata or {}).get(b"document_snapshot")
+        self.metadata = json.loads(described) if described else {}
+
+    def category(self, name: str) -> Tuple[memoryview, List]:
+        encoded = (
+            self.table.column(name)
+            .combine_chunks()
+            .dictionary_encode(null_encoding="encode")
+        )
+        indices = encoded.indices.cast(pa.uint32())
+        if not len(indices):
+            return memoryview(array("I")), encoded.dictionary.to_pylist()
+        codes = memoryview(indices.buffers()[1]).cast("I")
+        return (
+            codes[indices.offset : indices.offset + len(indices)],
+            encoded.dictionary.to_pylist(),
+        )
+
+    def timestamps(self, name: str) -> memoryview:
+        values = (
+            self.table.column(name)
+            .combine_chunks()
+            .cast(pa.int64())
+            .fill_null(NULL_TIME)
+        )
+        if not len(values):
+            return memoryview(array("q"))
+        micros = memoryview(values.buffers()[1]).cast("q")
+        return micros[values.offset : values.offset + len(values)]
+
+    def ids(self) -> List[str]:
+        return self.table.column("id").to_pylist()
+
+    def close(self):
+        self.table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_snapshot(path: str):
+    """Open a snapshot written by export_snapshot(), whichever format."""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head == MAGIC:
+        return PackedSnapshot(path)
+    if head[:4] == b"PAR1":
+        if pq is None:
+            raise ValueError(f"{path}: reading Parquet snapshots needs pyarrow")
+        return ParquetSnapshot(path)
+    raise ValueError(f"{path}: not a document snapshot")
+
+
+def records(snapshot) -> Iterator[Dict]:
+    """Rows as dicts, for ad-hoc inspection rather than bulk analysis."""
+    categories = {name: snapshot.category(name) for name in CATEGORY_COLUMNS}
+    times = {name: snapshot.timestamps(name) for name in TIME_COLUMNS}
+    for i, doc_id in enumerate(snapshot.ids()):
+        record = {"id": doc_id}
+        for name, (codes, dictionary) in categories.items():
+            record[name] = dictionary[codes[i]]
+        for name, micros in times.items():
+            record[name] = from_micros(micros[i])
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar document snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export documents to FILE")
+    export.add_argument("file")
+    export.add_argument("--status", action="append", help="repeatable")
+    export.add_argument("--org", help="only this org_id")
+    export.add_argument("--hours", type=int, help="modified within N hours")
+    export.add_argument("--format", choices=["parquet", "packed"])
+    export.add_argument("--chunk-size", type=int, default=FETCH_CHUNK_SIZE)
+    info = commands.add_parser("info", help="summarise a snapshot FILE")
+    info.add_argument("file")
+    args = parser.parse_args()
+
+    print("=== Document Snapshot ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+
+    if args.command == "export":
+        result = export_snapshot(
+            args.file,
+            statuses=args.status,
+            org_id=args.org,
+            hours=args.hours,
+            fmt=args.format,
+            chunk_size=args.chunk_size,
+        )
+        if "error" in result:
+            print(f"❌ {result['error']}")
+        elif result.get("explain"):
+            print("⏭️  Explain mode: no snapshot written")
+        else:
+            print(
+                f"✅ {result['rows']} documents written to {result['path']} "
+                f"({result['format']}, {result['bytes']} bytes)"
+            )
+        return result
+
+    with load_snapshot(args.file) as snapshot:
+        print(f"Format: {snapshot.format}")
+        print(f"Documents: {snapshot.rows}")
+        print(f"Exported: {snapshot.metadata.get('exported_at')}")
+        print(f"Filters: {snapshot.metadata.get('filters')}")
+        for name in CATEGORY_COLUMNS:
+            _, dictionary = snapshot.category(name)
+            print(f"{name}: {len(dictionary)} distinct values")
+    return {"rows": snapshot.rows}
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
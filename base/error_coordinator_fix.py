@@ -14,7 +14,19 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import text
 from database.database import SessionLocal
 from constants import DocumentStatus, DocumentStatusProcessing
-from logger import get_logger
+from query_explainer import explain_mode_active
+from recovery_checkpoints import plan_resume
+from trigger_gate import request_trigger
+from processing_deadline import (
+    StageTracker,
+    cancel_task,
+    deadline_for,
+    read_progress,
+    record_cutoff,
+    stage_budgets,
+)
+from task_reconciler import IN_FLIGHT_STATUSES
+from ops_logging import get_logger
 
 logger = get_logger()
 
@@ -71,6 +83,7 @@ class ErrorCoordinatorFix:
                     analysis["time_logs"] = extracted_data.get("time_logs", [])
                     analysis["doc_type"] = extracted_data.get("doc_type")
                     analysis["extraction_type"] = extracted_data.get("extraction_type")
+                    analysis["resume_plan"] = plan_resume(extracted_data)
 
                     # Check if there are any error indicators
                     if "error" in extracted_data:
@@ -144,12 +157,32 @@ class ErrorCoordinatorFix:
 
     def trigger_processing(self):
         """Trigger processing for the reset document"""
+        if explain_mode_active():
+            return {
+                "success": True,
+                "task_id": None,
+                "message": "Skipped (explain mode)",
+            }
+
         try:
             # Use Celery task queue to trigger processing
             from ctasks.trigger_restarted_documents import trigger_restarted_documents
 
-            # Queue the task using .delay() for proper execution
-            result = trigger_restarted_documents.delay()
+            # Queue the task using .delay(), unless a run is already active or
+            # queued or the workers are saturated; the document then stays
+            # RESTARTED for the next scheduled run
+            gate = request_trigger(trigger_restarted_documents.delay)
+            if not gate["enqueued"]:
+                logger.add_log(
+                    "info",
+                    "all",
+                    f"ERROR_COORDINATOR_FIX: Not queueing trigger for document {self.target_document_id}: {gate['reason']}",
+                )
+                return {
+                    "success": True,
+                    "task_id": None,
+                    "message": f"Left for the scheduled trigger ({gate['reason']})",
+                }
 
             logger.add_log(
                 "info",
@@ -159,7 +192,7 @@ class ErrorCoordinatorFix:
 
             return {
                 "success": True,
-                "task_id": result.id,
+                "task_id": gate["task_id"],
                 "message": "Processing task queued successfully",
             }
 
@@ -167,57 +200,112 @@ class ErrorCoordinatorFix:
             logger.add_log("error", "all", f"Failed to trigger processing: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def monitor_progress(self, timeout_seconds=120):
-        """Monitor document progress after restart"""
-        session = SessionLocal()
-        start_time = datetime.now()
+    def monitor_progress(
+        self,
+        plan=None,
+        timeout_seconds=None,
+        cancel_on_timeout=True,
+        queued=True,
+        previous_task_token=None,
+    ):
+        """Monitor document progress after restart
+
+        Each stage still to run has its own budget within an overall
+        deadline (``timeout_seconds``, by default the sum of the budgets).
+        A document that overruns is cut off instead of being left running:
+        its Celery task is revoked and it is set to error with the stage
+        recorded, keeping the stages it completed for the next resume.
+        ``previous_task_token`` (the token before the restart) is never
+        revoked. Nothing is polled when no processing was ``queued``.
+        """
+        if not queued and not explain_mode_active():
+            progress = read_progress(self.target_document_id)
+            return {
+                "success": False,
+                "final_status": progress["status"] if progress else "unknown",
+                "message": "Not monitored: nothing was queued, left for the scheduled trigger",
+            }
 
-        try:
-            while (datetime.now() - start_time).total_seconds() < timeout_seconds:
-                query = """
-                SELECT status, last_modified_on
-                FROM documents
-                WHERE id = :doc_id
-                """
-
-                result = session.execute(
-                    text(query), {"doc_id": self.target_document_id}
+        plan = plan or plan_resume(None)
+        budgets = stage_budgets(plan)
+        deadline = deadline_for(budgets, timeout_seconds)
+        tracker = StageTracker(plan, budgets, deadline)
+        progress = None
+
+        while True:
+            progress = read_progress(self.target_document_id)
+
+            if progress:
+                status = progress["status"]
+                print(
+                    f"Status: {status} | Last Modified: {progress['last_modified_on']}"
+                    f" | Stage: {tracker.stage or 'queued'}"
                 )
-                doc = result.fetchone()
 
-                if doc:
-                    status = doc.status
-                    last_modified = doc.last_modified_on
+                if status == "ready_for_validation":
+                    return {
+                        "success": True,
+                        "final_status": status,
+                        "message": "Document successfully processed to ready_for_validation",
+                    }
+                elif status == "error":
+                    return {
+                        "success": False,
+                        "final_status": status,
+                        "message": "Document failed again during processing",
+                    }
+
+                exceeded = tracker.observe(status, progress["processed"])
+                if exceeded:
+                    return self._cut_off(
+                        progress, exceeded, cancel_on_timeout, previous_task_token
+                    )
+            elif deadline.expired():
+                break
 
-                    print(f"Status: {status} | Last Modified: {last_modified}")
+            if explain_mode_active():
+                # One poll is enough to capture the query plan
+                break
 
-                    if status == "ready_for_validation":
-                        return {
-                            "success": True,
-                            "final_status": status,
-                            "message": "Document successfully processed to ready_for_validation",
-                        }
-                    elif status == "error":
-                        return {
-                            "success": False,
-                            "final_status": status,
-                            "message": "Document failed again during processing",
-                        }
+            # Wait before next check
+            import time
 
-                # Wait before next check
-                import time
+            time.sleep(max(0.0, deadline.within(10)))
 
-                time.sleep(10)
+        return {
+            "success": False,
+            "message": f"Monitoring stopped after {deadline.seconds:.0f} seconds",
+            "final_status": progress["status"] if progress else "unknown",
+        }
 
-            # Timeout reached
+    def _cut_off(self, progress, exceeded, cancel_on_timeout, previous_task_token):
+        """Stop a document that overran its budget and record where"""
+        token = progress["celery_task_token"]
+        # Only a task this restart started: a document still queued has no
+        # task of ours yet, and an older token may now be someone else's
+        owned = (
+            progress["status"] in IN_FLIGHT_STATUSES
+            and token
+            and str(token) != str(previous_task_token or "")
+        )
+        if not cancel_on_timeout or not owned:
             return {
                 "success": False,
-                "message": f"Monitoring timeout after {timeout_seconds} seconds",
-                "final_status": doc.status if doc else "unknown",
+                "final_status": progress["status"],
+                "message": f"Monitoring timeout: {exceeded}",
+                "cut_off": exceeded.record(),
             }
 
-        finally:
-            session.close()
+        # Revoke first so the worker stops before the status is rewritten
+        revoked = cancel_task(token)
+        recorded = record_cutoff(self.target_document_id, exceeded)
+        return {
+            "success": False,
+            "final_status": "error" if recorded else progress["status"],
+            "message": f"Cut off in {exceeded.stage}: {exceeded}",
+            "cut_off": exceeded.record(),
+            "task_revoked": revoked,
+        }
 
     def execute_full_recovery(self):
         """Execute full recovery process"""
@@ -237,6 +325,13 @@ class ErrorCoordinatorFix:
         print(f"✅ Current Status: {analysis['current_status']}")
         print(f"✅ Filename: {analysis['filename']}")
         print(f"✅ Processing Modules: {analysis.get('processing_modules', [])}")
+        if "resume_plan" in analysis:
+            plan = analysis["resume_plan"]
+            print(
+                f"   Resumable at {plan['resume_stage']} "
+                f"({plan['skipped_fraction']:.0%} of a full run already done); "
+                f"see final_document_recovery.py"
+            )
         print()
 
         # Step 2: Reset status
@@ -258,14 +353,23 @@ class ErrorCoordinatorFix:
             print(f"❌ Trigger failed: {trigger_result.get('error', 'Unknown error')}")
             return trigger_result
 
-        print("✅ Processing triggered successfully")
+        print(
+            f"✅ {trigger_result.get('message', 'Processing triggered successfully')}"
+        )
         print()
 
         # Step 4: Monitor progress
-        print("Step 4: Monitoring document progress (120 seconds)...")
-        monitor_result = self.monitor_progress(120)
-
-        print(f"✅ Monitoring complete: {monitor_result['message']}")
+        print("Step 4: Monitoring document progress (per-stage budgets)...")
+        monitor_result = self.monitor_progress(
+            analysis.get("resume_plan"),
+            queued=bool(trigger_result.get("task_id")),
+            previous_task_token=analysis.get("celery_task_token"),
+        )
+
+        if monitor_result.get("cut_off"):
+            print(f"⚠️  {monitor_result['message']}")
+        else:
+            print(f"✅ Monitoring complete: {monitor_result['message']}")
 
         return {
             "success": monitor_result.get("success", False),
@@ -295,4 +399,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
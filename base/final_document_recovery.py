@@ -6,7 +6,7 @@ Use the proper document processing workflow to restart the failed document
 
 import sys
 import os
-import asyncio
+import argparse
 from datetime import datetime
 
 # Add project root to Python path
@@ -19,7 +19,17 @@ from database.models import Documents
 from authenticator import UserAuthentication
 from module.document_process import process_document_async
 from constants import DocumentStatus, DocumentStatusProcessing
-from logger import get_logger
+from query_explainer import explain_mode_active
+from recovery_checkpoints import plan_resume
+from processing_deadline import (
+    DeadlineExceeded,
+    deadline_for,
+    record_cutoff,
+    run_with_deadline,
+    stage_budgets,
+)
+from task_context import MockUserAuthentication
+from ops_logging import get_logger
 
 logger = get_logger()
 
@@ -27,8 +37,12 @@ logger = get_logger()
 class FinalDocumentRecovery:
     """Final document recovery using proper processing workflow"""
 
-    def __init__(self):
+    def __init__(self, force_full: bool = False, deadline_seconds: float = None):
         self.target_document_id = "0a05caa9-bbfb-471c-b364-93fc44f9c8b2"
+        # Re-run every stage instead of resuming from the recorded progress
+        self.force_full = force_full
+        # Cap on the whole processing run; stage budgets apply within it
+        self.deadline_seconds = deadline_seconds
 
     def reset_document_to_restarted(self):
         """Reset document back to RESTARTED status"""
@@ -84,6 +98,10 @@ class FinalDocumentRecovery:
 
     async def process_document_properly(self):
         """Process document using the proper async workflow"""
+        if explain_mode_active():
+            # The processing pipeline writes through the ORM, not raw SQL
+            return {"success": False, "error": "Skipped (explain mode)"}
+
         try:
             # Get document record
             doc_rec = DocumentsDAL.get_first_by_filters(
@@ -93,20 +111,7 @@ class FinalDocumentRecovery:
             if not doc_rec:
                 return {"success": False, "error": "Document not found"}
 
-            # Create a proper UserAuthentication object using the document's created_by
-            # This is needed for the processing workflow
-            class MockUserAuthentication:
-                def __init__(self, user_id, org_id):
-                    self.id = user_id
-                    self.user_id = user_id
-                    self.org_id = org_id
-
-                def get_org_id(self):
-                    return self.org_id
-
-                def get_user_id(self):
-                    return self.user_id
-
+            # Run the workflow as the document's creator; see MockUserAuthentication
             mock_user = MockUserAuthentication(
                 user_id=doc_rec.created_by or "system", org_id=doc_rec.org_id
             )
@@ -115,6 +120,30 @@ class FinalDocumentRecovery:
                 f"🚀 Processing document {self.target_document_id[:8]}... with filename: {doc_rec.filename}"
             )
 
+            plan = plan_resume(doc_rec.extracted_data, force_full=self.force_full)
+            print(
+                f"   Resuming at checkpoint {plan['checkpoint']} ({plan['resume_stage']}): "
+                f"{plan['reason']}"
+            )
+            if plan["skipped_stages"]:
+                print(
+                    f"   Skipping {', '.join(plan['skipped_stages'])} "
+                    f"(~{plan['estimated_skipped_seconds']}s, "
+                    f"{plan['skipped_fraction']:.0%} of a full run)"
+                )
+
+            budgets = stage_budgets(plan)
+            deadline = deadline_for(budgets, self.deadline_seconds)
+            print(
+                f"   Deadline {deadline.seconds:.0f}s; stage budgets: "
+                + (
+                    ", ".join(
+                        f"{stage} {budget:.0f}s" for stage, budget in budgets.items()
+                    )
+                    or "none (stages not configured)"
+                )
+            )
+
             # Set status to running
             doc_rec.status = DocumentStatusProcessing.RUNNING
             DocumentsDAL.save(doc_rec)
@@ -122,11 +151,30 @@ class FinalDocumentRecovery:
             logger.add_log(
                 "info",
                 "all",
-                f"FINAL_RECOVERY: Started processing document {self.target_document_id}",
+                f"FINAL_RECOVERY: Started processing document {self.target_document_id} "
+                f"at checkpoint {plan['checkpoint']} ({plan['reason']})",
             )
 
-            # Process the document using the main async processor
-            result = await process_document_async(mock_user, doc_rec, checkpoint=0)
+            # Process the document using the main async processor, cancelled
+            # if a stage overruns its budget or the deadline passes
+            try:
+                result = await run_with_deadline(
+                    process_document_async(
+                        mock_user, doc_rec, checkpoint=plan["checkpoint"]
+                    ),
+                    self.target_document_id,
+                    plan,
+                    deadline=deadline,
+                    budgets=budgets,
+                )
+            except DeadlineExceeded as e:
+                record_cutoff(self.target_document_id, e)
+                return {
+                    "success": False,
+                    "error": f"Processing cut off: {e}",
+                    "cut_off": e.record(),
+                    "resume_plan": plan,
+                }
 
             if result:
                 logger.add_log(
@@ -134,7 +182,7 @@ class FinalDocumentRecovery:
                     "all",
                     f"FINAL_RECOVERY: Document processing completed for {self.target_document_id}",
                 )
-                return {"success": True, "result": result}
+                return {"success": True, "result": result, "resume_plan": plan}
             else:
                 logger.add_log(
                     "error",
@@ -238,7 +286,15 @@ class FinalDocumentRecovery:
 
 async def main():
     """Main async function"""
-    recovery = FinalDocumentRecovery()
+    parser = argparse.ArgumentParser(description="Final document recovery")
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument(
+        "--deadline", type=float, help="seconds the processing run may take"
+    )
+    args, _ = parser.parse_known_args()
+    recovery = FinalDocumentRecovery(
+        force_full=args.full, deadline_seconds=args.deadline
+    )
     result = await recovery.execute_final_recovery()
 
     print("\n=== FINAL RECOVERY RESULTS ===")
@@ -249,6 +305,12 @@ async def main():
         print("❌ RECOVERY FAILED")
         if "final_status" in result:
             print(f"Final Status: {result.get('final_status')}")
+        cut_off = result.get("process_result", {}).get("cut_off")
+        if cut_off:
+            print(
+                f"Cut off in {cut_off['stage']} ({cut_off['reason']}); "
+                f"completed: {', '.join(cut_off['completed_stages']) or 'none'}"
+            )
         if "error" in result:
             print(f"Error: {result['error']}")
 
@@ -256,5 +318,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
     # Run the async main function
-    asyncio.run(main())
+    main_with_explain_flag(main)
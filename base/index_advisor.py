@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Index Advisor
+Catalogue of the documents / celery_taskmeta access patterns used by the ops
+scripts, the partial/composite indexes that serve them, and a before/after
+benchmark against a seeded local Postgres.
+
+Usage:
+    python index_advisor.py                      # report existing vs missing indexes
+    python index_advisor.py --ddl                # print DDL for the missing ones
+    python index_advisor.py --benchmark URL [--rows N]
+"""
+
+import re
+import sys
+import os
+import argparse
+from datetime import datetime
+from typing import Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, create_engine
+from query_explainer import summarize_plan
+from load_generator import seed
+from logger import get_logger
+
+logger = get_logger()
+
+
+RECOMMENDED_INDEXES = [
+    {
+        # Its (status, last_modified_on) prefix serves the status filters and
+        # windows, so no separate narrower index is kept
+        "name": "ix_documents_status_last_modified_id_live",
+        "table": "documents",
+        "columns": ["status", "last_modified_on", "id"],
+        "where": "is_deleted = false",
+        "reason": "status filters with last_modified_on ordering or windows; keyset pages seek on (last_modified_on, id)",
+    },
+    {
+        "name": "ix_documents_org_status_live",
+        "table": "documents",
+        "columns": ["org_id", "status"],
+        "where": "is_deleted = false",
+        "reason": "per-org status counts and per-org error listings",
+    },
+    {
+        "name": "ix_documents_last_modified_live",
+        "table": "documents",
+        "columns": ["last_modified_on"],
+        "where": "is_deleted = false",
+        "reason": "recent-changes time windows across all statuses",
+    },
+    {
+        "name": "ix_documents_restarted_org_last_modified",
+        "table": "documents",
+        "columns": ["org_id", "last_modified_on"],
+        "where": "status IN ('RESTARTED', 'restarted') AND is_deleted = false",
+        "reason": "fair restart scheduler picks the oldest RESTARTED per org",
+    },
+    {
+        "name": "ix_celery_taskmeta_date_done",
+        "table": "celery_taskmeta",
+        "columns": ["date_done"],
+        "where": None,
+        "reason": "recent task statistics by date_done window",
+    },
+    {
+        "name": "ix_celery_taskmeta_status_date_done",
+        "table": "celery_taskmeta",
+        "columns": ["status", "date_done"],
+        "where": None,
+        "reason": "recent FAILURE listing ordered by date_done",
+    },
+]
+
+
+# Representative queries, one per access pattern, with the index expected to serve it
+ACCESS_PATTERNS = [
+    {
+        "name": "status_counts",
+        "used_by": "DocumentMonitor.get_document_status_counts",
+        "index": "ix_documents_status_last_modified_id_live",
+        "query": """
+            SELECT status, COUNT(*) AS count
+            FROM documents
+            WHERE is_deleted = false
+            GROUP BY status
+        """,
+        "params": {},
+    },
+    {
+        "name": "status_counts_by_org",
+        "used_by": "DocumentMonitor.get_document_status_counts(org_id)",
+        "index": "ix_documents_org_status_live",
+        "query": """
+            SELECT status, COUNT(*) AS count
+            FROM documents
+            WHERE is_deleted = false AND org_id = :org_id
+            GROUP BY status
+        """,
+        "params": {"org_id": "org-0001"},
+    },
+    {
+        "name": "recent_errors",
+        "used_by": "DocumentMonitor.analyze_error_documents, celery_diagnostic.analyze_error_patterns",
+        "index": "ix_documents_status_last_modified_id_live",
+        "query": """
+            SELECT id, doc_type, doc_source, last_modified_on
+            FROM documents
+            WHERE status = 'error' AND is_deleted = false
+            ORDER BY last_modified_on DESC, id DESC
+            LIMIT 50
+        """,
+        "params": {},
+    },
+    {
+        "name": "error_documents_page",
+        "used_by": "DocumentMonitor.get_error_documents_page, celery_diagnostic.analyze_error_patterns (cursor)",
+        "index": "ix_documents_status_last_modified_id_live",
+        "query": """
+            SELECT id, doc_type, doc_source, last_modified_on
+            FROM documents
+            WHERE status = 'error' AND is_deleted = false
+            AND last_modified_on IS NOT NULL
+            AND (last_modified_on, id) < (NOW() - INTERVAL '1 hour', :after_id)
+            ORDER BY last_modified_on DESC, id DESC
+            LIMIT 51
+        """,
+        "params": {"after_id": "00000000-0000-0000-0000-000000000000"},
+    },
+    {
+        "name": "recent_restarted",
+        "used_by": "check_restarted_docs.get_recent_restarted_documents",
+        "index": "ix_documents_status_last_modified_id_live",
+        "query": """
+            SELECT id, status, last_modified_on
+            FROM documents
+            WHERE status = 'RESTARTED' AND is_deleted = false
+            ORDER BY last_modified_on DESC, id DESC
+            LIMIT 10
+        """,
+        "params": {},
+    },
+    {
+        "name": "stuck_in_processing",
+        "used_by": "check_restarted_docs.check_processing_progression, celery_diagnostic.check_document_processing_pipeline",
+        "index": "ix_documents_status_last_modified_id_live",
+        "query": """
+            SELECT status, COUNT(*) AS count
+            FROM documents
+            WHERE last_modified_on < NOW() - INTERVAL '30 minutes'
+            AND status IN ('RESTARTED', 'running', 'validating', 'processing')
+            AND is_deleted = false
+            GROUP BY status
+        """,
+        "params": {},
+    },
+    {
+        "name": "recent_changes_window",
+        "used_by": "DocumentMonitor.get_recent_status_changes",
+        "index": "ix_documents_last_modified_live",
+        "query": """
+            SELECT id, status, last_modified_on
+            FROM documents
+            WHERE last_modified_on >= NOW() - INTERVAL '1 hour'
+            AND is_deleted = false
+            ORDER BY last_modified_on DESC
+        """,
+        "params": {},
+    },
+    {
+        "name": "restart_candidates_per_org",
+        "used_by": "restart_scheduler.fetch_restart_candidates",
+        "index": "ix_documents_restarted_org_last_modified",
+        "query": """
+            SELECT id, org_id, last_modified_on
+            FROM (
+                SELECT id, org_id, last_modified_on,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY org_id ORDER BY last_modified_on ASC
+                    ) AS org_rank
+                FROM documents
+                WHERE (status = 'restarted' OR status = 'RESTARTED')
+                AND is_deleted = false
+            ) ranked
+            WHERE org_rank <= 10
+        """,
+        "params": {},
+    },
+    {
+        "name": "recent_task_counts",
+        "used_by": "celery_diagnostic.check_celery_task_status",
+        "index": "ix_celery_taskmeta_date_done",
+        "query": """
+            SELECT status, COUNT(*) AS count
+            FROM celery_taskmeta
+            WHERE date_done >= NOW() - INTERVAL '1 hour'
+            GROUP BY status
+        """,
+        "params": {},
+    },
+    {
+        "name": "recent_failed_tasks",
+        "used_by": "celery_diagnostic.check_celery_task_status",
+        "index": "ix_celery_taskmeta_status_date_done",
+        "query": """
+            SELECT task_id, name, status, date_done
+            FROM celery_taskmeta
+            WHERE status = 'FAILURE' AND date_done >= NOW() - INTERVAL '1 hour'
+            ORDER BY date_done DESC
+            LIMIT 10
+        """,
+        "params": {},
+    },
+]
+
+
+def index_ddl(index: Dict, concurrently: bool = True) -> str:
+    """CREATE INDEX statement for a recommended index."""
+    ddl = (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{index['name']} ON {index['table']} ({', '.join(index['columns'])})"
+    )
+    if index["where"]:
+        ddl += f" WHERE {index['where']}"
+    return ddl + ";"
+
+
+def get_existing_indexes(conn) -> Dict[str, List[str]]:
+    """Existing index definitions per table, lower-cased."""
+    result = conn.execute(text("""
+            SELECT tablename, indexname, indexdef
+            FROM pg_indexes
+            WHERE schemaname = 'public'
+            AND tablename IN ('documents', 'celery_taskmeta')
+            """))
+    existing: Dict[str, List[str]] = {}
+    for row in result:
+        existing.setdefault(row.tablename, []).append(
+            f"{row.indexname} {row.indexdef}".lower()
+        )
+    return existing
+
+
+def normalize_predicate(predicate: str) -> str:
+    """Partial-index predicate in a form comparable with pg_indexes output.
+
+    Postgres stores ``col IN (a, b)`` as ``col = ANY (ARRAY[a, b])`` with
+    casts and extra parentheses; all of that is folded away on both sides.
+    """
+    predicate = predicate.lower()
+    predicate = re.sub(r"(\w+) in \(([^)]*)\)", r"\1 = any (array[\2])", predicate)
+    predicate = re.sub(r"::(character varying|[a-z_]+)(\[\])?", "", predicate)
+    return re.sub(r"[()\s]", "", predicate)
+
+
+def index_columns(definition: str) -> List[str]:
+    """Key columns of a pg_indexes definition, in order."""
+    match = re.search(r" using \w+ \(([^)]*)\)", definition)
+    if not match:
+        return []
+    return [column.strip().strip('"') for column in match.group(1).split(",")]
+
+
+def is_covered(index: Dict, existing: Dict[str, List[str]]) -> bool:
+    """True if an index with the same name, or one whose leading columns are
+    these and whose predicate is at least as wide, already exists."""
+    columns = index["columns"]
+    for definition in existing.get(index["table"], []):
+        if definition.startswith(index["name"] + " "):
+            return True
+        body, _, where = definition.partition(" where ")
+        if index_columns(body)[: len(columns)] != columns:
+            continue
+        # A full index serves any predicate; a partial one only its own
+        if not where or (
+            index["where"]
+            and normalize_predicate(where) == normalize_predicate(index["where"])
+        ):
+            return True
+    return False
+
+
+def check_indexes(conn) -> List[Dict]:
+    existing = get_existing_indexes(conn)
+    return [
+        {**index, "exists": is_covered(index, existing), "ddl": index_ddl(index)}
+        for index in RECOMMENDED_INDEXES
+    ]
+
+
+def _explain_time(conn, pattern: Dict) -> Dict:
+    raw = conn.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {pattern['query']}"),
+        pattern["params"],
+    ).scalar()
+    summary = summarize_plan(raw)
+    return {
+        "execution_time_ms": summary["execution_time_ms"],
+        "top_node": summary["nodes"][0]["node_type"],
+        "uses_seq_scan": any(n["node_type"] == "Seq Scan" for n in summary["nodes"]),
+    }
+
+
+def benchmark(
+    database_url: str, rows: int = 0, keep_indexes: bool = False
+) -> List[Dict]:
+    """Time every access pattern before and after its recommended index.
+
+    Runs against ``database_url`` only (never the application engine).
+    Each index the benchmark creates is dropped right after its pattern is
+    measured, so every "before" sees only the indexes the database already
+    had; with ``keep_indexes`` they are created again at the end.
+    """
+    engine = create_engine(database_url)
+    indexes = {index["name"]: index for index in RECOMMENDED_INDEXES}
+    results = []
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if rows:
+            print(f"Seeding {rows} documents and task results...")
+            seed(conn, rows)
+
+        existing = get_existing_indexes(conn)
+        created = []
+        for pattern in ACCESS_PATTERNS:
+            index = indexes[pattern["index"]]
+            before = _explain_time(conn, pattern)
+            create = not is_covered(index, existing)
+            if create:
+                conn.execute(text(index_ddl(index, concurrently=False)))
+                conn.execute(text(f"ANALYZE {index['table']}"))
+                if index not in created:
+                    created.append(index)
+            after = _explain_time(conn, pattern)
+            if create:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+            results.append(
+                {
+                    "pattern": pattern["name"],
+                    "index": index["name"],
+                    "before": before,
+                    "after": after,
+                }
+            )
+
+        if keep_indexes:
+            for index in created:
+                conn.execute(text(index_ddl(index, concurrently=False)))
+
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index advisor for documents access patterns"
+    )
+    parser.add_argument(
+        "--ddl", action="store_true", help="print DDL for missing indexes"
+    )
+    parser.add_argument(
+        "--benchmark",
+        metavar="DATABASE_URL",
+        help="local Postgres to benchmark against",
+    )
+    parser.add_argument(
+        "--rows", type=int, default=0, help="seed this many documents first"
+    )
+    parser.add_argument(
+        "--keep-indexes",
+        action="store_true",
+        help="keep indexes created by the benchmark",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print("=== Index Benchmark (before → after) ===")
+        print(f"Timestamp: {datetime.now().isoformat()}")
+        for result in benchmark(args.benchmark, args.rows, args.keep_indexes):
+            before, after = result["before"], result["after"]
+            print(
+                f"  {result['pattern']:28s} {before['execution_time_ms']:9.2f} ms "
+                f"({before['top_node']}) → {after['execution_time_ms']:9.2f} ms "
+                f"({after['top_node']}) via {result['index']}"
+            )
+        return
+
+    from database.database import engine
+
+    with engine.connect() as conn:
+        report = check_indexes(conn)
+
+    if args.ddl:
+        for index in report:
+            if not index["exists"]:
+                print(index["ddl"])
+        return
+
+    print("=== Index Advisor ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print()
+    for index in report:
+        marker = "✅" if index["exists"] else "❌"
+        print(f"{marker} {index['name']} on {index['table']} - {index['reason']}")
+        if not index["exists"]:
+            print(f"     {index['ddl']}")
+    print()
+    print("Access patterns:")
+    for pattern in ACCESS_PATTERNS:
+        print(f"  {pattern['name']:28s} → {pattern['index']} ({pattern['used_by']})")
+
+
+if __name__ == "__main__":
+    main()
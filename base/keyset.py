@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination
+Seek pagination over documents listings ordered by
+``last_modified_on DESC, id DESC``. Instead of OFFSET, each page continues
+strictly after the last row of the previous one, so page 1000 costs the
+same index range scan as page 1 and rows changing between requests never
+cause skipped or repeated entries within the ordering.
+
+The continuation token is opaque to callers (URL-safe base64 of the last
+row's key). It is bound to the listing it came from, so a token from the
+RESTARTED listing, or from another org's error listing, is rejected rather
+than silently seeking into the wrong result set. Rows without a
+last_modified_on have no place in the ordering and are left out.
+"""
+
+import json
+import base64
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_VERSION = 1
+MAX_PAGE_SIZE = 1000
+
+ORDER_BY = "ORDER BY last_modified_on DESC, id DESC"
+
+
+class InvalidCursor(ValueError):
+    """A continuation token that is malformed or belongs to another listing."""
+
+
+def listing_scope(name: str, **filters) -> str:
+    """Short fingerprint of a listing and its filters, embedded in tokens."""
+    described = json.dumps([name, filters], sort_keys=True, default=str)
+    return hashlib.sha1(described.encode()).hexdigest()[:12]
+
+
+def encode_cursor(last_modified_on, doc_id, scope: str) -> str:
+    if isinstance(last_modified_on, datetime):
+        last_modified_on = last_modified_on.isoformat()
+    payload = {
+        "v": TOKEN_VERSION,
+        "s": scope,
+        "t": last_modified_on,
+        "id": str(doc_id),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, scope: str) -> Tuple[datetime, str]:
+    """(last_modified_on, id) of the row the token continues after."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["v"] != TOKEN_VERSION:
+            raise InvalidCursor(f"unsupported cursor version {payload['v']}")
+        if payload["s"] != scope:
+            raise InvalidCursor("cursor belongs to a different listing")
+        return datetime.fromisoformat(payload["t"]), payload["id"]
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"malformed cursor: {e}") from None
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def seek(cursor: Optional[str], scope: str, limit: int) -> Tuple[str, Dict]:
+    """SQL tail (seek predicate, ORDER BY, LIMIT) and its parameters.
+
+    The predicate is a row-value comparison so Postgres can start the
+    (status, last_modified_on, id) index range scan right after the cursor.
+    One extra row is fetched to tell whether another page follows.
+    """
+    clause = " AND last_modified_on IS NOT NULL"
+    params = {"page_limit": page_size(limit) + 1}
+    if cursor:
+        after_modified, after_id = decode_cursor(cursor, scope)
+        clause += " AND (last_modified_on, id) < (:after_modified, :after_id)"
+        params.update(after_modified=after_modified, after_id=after_id)
+    return f"{clause} {ORDER_BY} LIMIT :page_limit", params
+
+
+def split_page(rows, limit: int, scope: str) -> Tuple[List, Optional[str]]:
+    """The page's rows and the token for the next page (None on the last)."""
+    rows = list(rows)
+    limit = page_size(limit)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.last_modified_on, last.id, scope)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Load Generator
+Seed a local Postgres with realistic documents / celery_taskmeta data for
+benchmarking the ops toolkit (1M+ rows, skewed orgs, varied JSONB sizes).
+
+Usage:
+    python load_generator.py DATABASE_URL [--rows N] [--orgs N] [--seed F]
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, create_engine
+
+# Rows inserted per statement; keeps each transaction and WAL burst bounded
+CHUNK_SIZE = 250000
+
+DOCUMENTS_DDL = """
+CREATE TABLE IF NOT EXISTS documents (
+    id uuid PRIMARY KEY,
+    status varchar(64),
+    is_deleted boolean DEFAULT false,
+    org_id varchar(64),
+    doc_type varchar(64),
+    doc_source varchar(64),
+    filename varchar(255),
+    created_by varchar(64),
+    celery_task_token varchar(255),
+    extracted_data jsonb,
+    created_on timestamp,
+    last_modified_on timestamp,
+    timestamp_for_validation timestamp,
+    restart_allowed boolean
+)
+"""
+
+TASKMETA_DDL = """
+CREATE TABLE IF NOT EXISTS celery_taskmeta (
+    id serial PRIMARY KEY,
+    task_id varchar(155) UNIQUE,
+    status varchar(50),
+    result bytea,
+    date_done timestamp,
+    traceback text,
+    name varchar(155)
+)
+"""
+
+# Rough production status mix: mostly finished, with a long tail of
+# error / RESTARTED / running documents the toolkit actually looks at
+STATUS_CASE = """
+CASE
+    WHEN r < 0.78 THEN 'finished'
+    WHEN r < 0.88 THEN 'ready_for_validation'
+    WHEN r < 0.94 THEN 'error'
+    WHEN r < 0.97 THEN 'RESTARTED'
+    WHEN r < 0.99 THEN 'running'
+    ELSE 'validating'
+END
+"""
+
+# Documents and their task results are written in one statement; documents
+# still "running" or RESTARTED get no task row so the reconciler sees
+# realistic orphans
+INSERT_CHUNK = f"""
+WITH inserted AS (
+INSERT INTO documents (
+    id, status, is_deleted, org_id, doc_type, doc_source, filename, created_by,
+    celery_task_token, extracted_data, created_on, last_modified_on,
+    restart_allowed
+)
+SELECT
+    md5(:seed_text || g::text)::uuid,
+    {STATUS_CASE},
+    random() < 0.05,
+    -- Zipf-like skew: a few orgs own most documents
+    'org-' || lpad((floor(power(random(), 3) * :orgs))::int::text, 4, '0'),
+    (ARRAY['invoice', 'order', 'delivery_note', 'credit_note'])[1 + floor(random() * 4)::int],
+    (ARRAY['email', 'email', 'upload', 'api'])[1 + floor(random() * 4)::int],
+    'file-' || g || '.pdf',
+    'user-' || floor(random() * 500)::int,
+    md5('task' || :seed_text || g::text),
+    CASE WHEN random() < 0.15 THEN NULL ELSE jsonb_build_object(
+        'doc_type', 'invoice',
+        'processed_modules_list', to_jsonb(
+            (ARRAY['ocr', 'classification', 'extraction', 'validation'])[1:1 + floor(random() * 4)::int]
+        ),
+        -- Long-tailed payload size, mostly small, occasionally ~32KB
+        'payload', repeat('x', (power(random(), 6) * 32000)::int)
+    ) END,
+    ts - (random() * INTERVAL '2 days'),
+    ts,
+    true
+FROM (
+    SELECT
+        g,
+        random() AS r,
+        NOW() - (power(random(), 2) * INTERVAL '180 days') AS ts
+    FROM generate_series(:start, :stop) g
+) s
+RETURNING celery_task_token, status, last_modified_on
+)
+INSERT INTO celery_taskmeta (task_id, status, result, date_done, traceback, name)
+SELECT
+    celery_task_token,
+    CASE WHEN status = 'error' THEN 'FAILURE' ELSE 'SUCCESS' END,
+    convert_to(repeat('r', (power(random(), 4) * 8000)::int), 'UTF8'),
+    last_modified_on,
+    CASE WHEN status = 'error' THEN 'Traceback (most recent call last): ...' END,
+    'module.document_process.process_document'
+FROM inserted
+WHERE status NOT IN ('running', 'RESTARTED')
+ON CONFLICT (task_id) DO NOTHING
+"""
+
+
+def seed(
+    conn, rows: int, orgs: int = 50, seed_value: float = 0.42, verbose: bool = True
+):
+    """Create the tables if needed and append ``rows`` documents.
+
+    ``conn`` must be in autocommit mode; each chunk commits on its own so a
+    10M-row seed makes steady progress and can be interrupted safely.
+    """
+    conn.execute(text(DOCUMENTS_DDL))
+    conn.execute(text(TASKMETA_DDL))
+    conn.execute(text("SELECT setseed(:seed)"), {"seed": seed_value})
+
+    seed_text = f"{seed_value}-{datetime.now().timestamp()}-"
+    started = time.time()
+    for start in range(1, rows + 1, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE - 1, rows)
+        conn.execute(
+            text(INSERT_CHUNK),
+            {"seed_text": seed_text, "orgs": orgs, "start": start, "stop": stop},
+        )
+        if verbose:
+            print(f"  seeded {stop}/{rows} documents ({time.time() - started:.1f}s)")
+
+    conn.execute(text("ANALYZE documents"))
+    conn.execute(text("ANALYZE celery_taskmeta"))
+
+
+def table_counts(conn) -> dict:
+    return {
+        "documents": conn.execute(text("SELECT COUNT(*) FROM documents")).scalar(),
+        "celery_taskmeta": conn.execute(
+            text("SELECT COUNT(*) FROM celery_taskmeta")
+        ).scalar(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local benchmark database")
+    parser.add_argument("database_url", help="local Postgres URL (never production)")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--orgs", type=int, default=50)
+    parser.add_argument("--seed", type=float, default=0.42)
+    args = parser.parse_args()
+
+    print("=== Load Generator ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    engine = create_engine(args.database_url)
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        seed(conn, args.rows, args.orgs, args.seed)
+        print(f"Table counts: {table_counts(conn)}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
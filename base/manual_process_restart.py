@@ -11,14 +11,45 @@ from datetime import datetime
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from database.database import SessionLocal
-from database import db_helper as dbh
-from logger import get_logger
+from restart_scheduler import select_fair_restart_batch
+from recovery_guard import default_guard
+from query_explainer import explain_mode_active
+from ops_logging import get_logger
 
 logger = get_logger()
 
 
+def set_status(doc_ids, status, only_if=None):
+    """Set ``status`` on documents, optionally only those still in ``only_if``.
+
+    Opens its own session so it can run on the guard's worker threads.
+    """
+    session = SessionLocal()
+    try:
+        query = """
+        UPDATE documents
+        SET
+            status = :status,
+            last_modified_on = NOW()
+        WHERE id IN :doc_ids
+        """
+        params = {"status": status, "doc_ids": list(doc_ids)}
+        if only_if:
+            query += " AND status = :only_if"
+            params["only_if"] = only_if
+        session.execute(
+            text(query).bindparams(bindparam("doc_ids", expanding=True)), params
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 def manual_process_restarted_documents():
     """Manually process restarted documents by calling core processing logic directly"""
     try:
@@ -26,109 +57,110 @@ def manual_process_restarted_documents():
         print(f"Timestamp: {datetime.now().isoformat()}")
         print()
 
-        session = SessionLocal()
-        try:
-            # Find documents in restarted status
-            query = """
-                SELECT
-                    id,
-                    status,
-                    filename,
-                    org_id,
-                    created_by,
-                    celery_task_token,
-                    created_on,
-                    last_modified_on
-                FROM documents
-                WHERE
-                    (status = 'restarted' OR status = 'RESTARTED')
-                    AND is_deleted = false
-                ORDER BY last_modified_on ASC
-                LIMIT 10
-            """
-
-            restarted_documents = dbh.execute_query(query, return_json=False)
-
-            print(f"📊 Found {len(restarted_documents)} documents in RESTARTED status")
-
-            if len(restarted_documents) == 0:
-                print("✅ No documents in RESTARTED status to process")
-                return {"success": True, "documents_processed": 0}
-
-            documents_processed = 0
-
-            for doc_row in restarted_documents:
-                doc_id = str(doc_row["id"])
-                filename = doc_row.get("filename", "unknown")
-                org_id = doc_row["org_id"]
-
-                print(f"🚀 Processing DocID: {doc_id[:8]}..., Filename: {filename}")
-
-                try:
-                    # Import the document processor
-                    from module.document_process import document_processor
-
-                    # Set document status to running before processing
-                    update_query = """
-                    UPDATE documents
-                    SET
-                        status = 'running',
-                        last_modified_on = NOW()
-                    WHERE id = :doc_id
-                    """
-
-                    session.execute(text(update_query), {"doc_id": doc_id})
-                    session.commit()
-
-                    print(f"  ✅ Set status to running for {doc_id[:8]}...")
-
-                    # Process the document using the document processor
-                    # This is the core processing logic that handles document workflow
-                    result = document_processor.process_document(
-                        doc_id=doc_id, org_id=org_id, force_restart=True
-                    )
-
-                    if result and result.get("success"):
-                        print(f"  ✅ Successfully processed {doc_id[:8]}...")
-                        documents_processed += 1
-                    else:
-                        print(f"  ❌ Processing failed for {doc_id[:8]}...")
-                        print(f"     Error: {result.get('error', 'Unknown error')}")
-
-                except Exception as e:
-                    print(f"  ❌ Exception processing {doc_id[:8]}...: {str(e)}")
-                    logger.add_log(
-                        "error", "all", f"Failed to process document {doc_id}: {str(e)}"
-                    )
-
-                    # Set status back to error on failure
-                    try:
-                        error_query = """
-                        UPDATE documents
-                        SET
-                            status = 'error',
-                            last_modified_on = NOW()
-                        WHERE id = :doc_id
-                        """
-
-                        session.execute(text(error_query), {"doc_id": doc_id})
-                        session.commit()
-                    except Exception as update_error:
-                        print(
-                            f"  ❌ Failed to update error status: {str(update_error)}"
-                        )
-
-            print(f"\n=== PROCESSING COMPLETE ===")
-            print(f"Documents processed: {documents_processed}")
+        # Find documents in restarted status, round-robin across orgs so a
+        # single bulk upload cannot starve other tenants
+        restarted_documents = select_fair_restart_batch(batch_size=10)
+
+        print(f"📊 Found {len(restarted_documents)} documents in RESTARTED status")
+
+        if len(restarted_documents) == 0:
+            print("✅ No documents in RESTARTED status to process")
+            return {"success": True, "documents_processed": 0}
 
+        if explain_mode_active():
+            # Plan the per-document UPDATE each dispatch runs
+            set_status([str(restarted_documents[0]["id"])], "running")
+            print(
+                f"  ⏭️  Explain mode: not processing {len(restarted_documents)} documents"
+            )
             return {
                 "success": True,
-                "documents_processed": documents_processed,
+                "documents_processed": 0,
                 "total_found": len(restarted_documents),
             }
 
-        finally:
-            session.close()
+        # Import the document processor
+        from module.document_process import document_processor
+
+        def process(doc_row):
+            # Set document status to running as it is dispatched, so
+            # documents never started are not left in running
+            set_status([str(doc_row["id"])], "running")
+            # Process the document using the document processor
+            # This is the core processing logic that handles document workflow
+            return document_processor.process_document(
+                doc_id=str(doc_row["id"]),
+                org_id=doc_row["org_id"],
+                force_restart=True,
+            )
+
+        # Concurrency adapts to processor latency; documents from a
+        # failing doc_source, or while one error dominates, are skipped
+        guard = default_guard()
+        outcomes = guard.run(restarted_documents, process)
+
+        documents_processed = 0
+        errored_ids = []
+        failed_ids = []
+        skipped_ids = []
+        for outcome in outcomes:
+            doc_row = outcome["item"]
+            doc_id = str(doc_row["id"])
+            filename = doc_row.get("filename", "unknown")
+            status = outcome["status"]
+
+            if status == "succeeded":
+                print(f"  ✅ Successfully processed {doc_id[:8]}... ({filename})")
+                documents_processed += 1
+            elif status == "failed":
+                print(f"  ❌ Processing failed for {doc_id[:8]}... ({filename})")
+                print(f"     Error: {outcome['error']}")
+                failed_ids.append(doc_id)
+            elif status == "exception":
+                print(f"  ❌ Exception processing {doc_id[:8]}...: {outcome['error']}")
+                logger.add_log(
+                    "error",
+                    "all",
+                    f"Failed to process document {doc_id}: {outcome['error']}",
+                )
+                errored_ids.append(doc_id)
+            else:
+                print(f"  ⏸️  Skipped {doc_id[:8]}...: {outcome['error']}")
+                skipped_ids.append(doc_id)
+
+        # Set status back to error on failure. A failed result only
+        # moves documents the processor left in running; skipped ones
+        # were never dispatched and stay RESTARTED for a later run
+        for ids, status, only_if in (
+            (errored_ids, "error", None),
+            (failed_ids, "error", "running"),
+        ):
+            if not ids:
+                continue
+            try:
+                set_status(ids, status, only_if)
+            except Exception as update_error:
+                print(f"  ❌ Failed to update {status} status: {str(update_error)}")
+
+        guard_state = guard.snapshot()
+        print(f"\n=== PROCESSING COMPLETE ===")
+        print(f"Documents processed: {documents_processed}")
+        print(f"Concurrency limit: {guard_state['concurrency_limit']}")
+        if skipped_ids:
+            print(f"⚠️  Skipped by open circuit breakers: {len(skipped_ids)}")
+            for name in guard_state["open_sources"] + guard_state["open_signatures"]:
+                print(f"   open: {name}")
+
+        return {
+            "success": True,
+            "documents_processed": documents_processed,
+            "total_found": len(restarted_documents),
+            "skipped": len(skipped_ids),
+            "circuit_open": bool(
+                guard_state["open_sources"] or guard_state["open_signatures"]
+            ),
+            "guard": guard_state,
+        }
 
     except Exception as e:
         logger.add_log("error", "all", f"Manual process failed: {str(e)}")
@@ -141,38 +173,12 @@ def manual_process_restarted_documents():
 
 def check_status_before_and_after():
     """Check document status before and after manual processing"""
-    from document_monitor import DocumentMonitor
+    from status_transitions import compare_around
 
-    monitor = DocumentMonitor()
-
-    print("=== STATUS BEFORE MANUAL PROCESSING ===")
-    before_status = monitor.get_document_status_counts()
-    for status, count in before_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
-
-    # Execute manual processing
-    result = manual_process_restarted_documents()
-
-    print("\n=== STATUS AFTER MANUAL PROCESSING ===")
-    after_status = monitor.get_document_status_counts()
-    for status, count in after_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
-
-    # Calculate changes
-    print("=== STATUS CHANGES ===")
-    for status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-        before_count = before_status.get(status, 0)
-        after_count = after_status.get(status, 0)
-        change = after_count - before_count
-        if change != 0:
-            print(f"{status}: {before_count} → {after_count} (change: {change:+d})")
-
-    return result
+    return compare_around(manual_process_restarted_documents, "MANUAL PROCESSING")
 
 
 if __name__ == "__main__":
-    check_status_before_and_after()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(check_status_before_and_after)
@@ -11,6 +11,8 @@ from datetime import datetime
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from query_explainer import explain_mode_active
+from trigger_gate import run_gated
 from logger import get_logger
 
 logger = get_logger()
@@ -23,23 +25,35 @@ def manual_trigger_restarted_documents():
         print(f"Timestamp: {datetime.now().isoformat()}")
         print()
 
+        if explain_mode_active():
+            # The task enqueues work; only the monitor queries are explained
+            print("⏭️  Explain mode: skipping trigger_restarted_documents_enhanced")
+            return {"status": "skipped", "reason": "explain mode"}
+
         # Import and run the task using apply() to run synchronously
         from ctasks.trigger_restarted_documents import (
             trigger_restarted_documents_enhanced,
         )
 
-        # Execute the task synchronously using .apply()
-        result = trigger_restarted_documents_enhanced.apply()
+        def run(batch_size):
+            # Execute the task synchronously using .apply()
+            result = trigger_restarted_documents_enhanced.apply()
+
+            # Get the actual result
+            if hasattr(result, "result"):
+                return result.result
+            if hasattr(result, "get"):
+                return result.get()
+            return result
 
-        # Get the actual result
-        if hasattr(result, "result"):
-            result = result.result
-        elif hasattr(result, "get"):
-            result = result.get()
+        # Under the trigger lock, and skipped while the workers are saturated
+        result = run_gated(run)
 
         print("=== MANUAL TRIGGER RESULTS ===")
         if isinstance(result, dict):
             print(f"Status: {result.get('status', 'Unknown')}")
+            if result.get("status") == "skipped":
+                print(f"Reason: {result.get('reason')}")
             print(f"Documents processed: {result.get('documents_processed', 0)}")
             print(f"Documents queued: {result.get('documents_queued', 0)}")
             print(f"Errors: {result.get('errors', 0)}")
@@ -61,38 +75,12 @@ def manual_trigger_restarted_documents():
 
 def check_status_before_and_after():
     """Check document status before and after manual trigger."""
-    from document_monitor import DocumentMonitor
-
-    monitor = DocumentMonitor()
-
-    print("=== STATUS BEFORE MANUAL TRIGGER ===")
-    before_status = monitor.get_document_status_counts()
-    for status, count in before_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
+    from status_transitions import compare_around
 
-    # Execute manual trigger
-    result = manual_trigger_restarted_documents()
-
-    print("\n=== STATUS AFTER MANUAL TRIGGER ===")
-    after_status = monitor.get_document_status_counts()
-    for status, count in after_status.items():
-        if status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-            print(f"{status}: {count}")
-    print()
-
-    # Calculate changes
-    print("=== STATUS CHANGES ===")
-    for status in ["RESTARTED", "error", "running", "ready_for_validation"]:
-        before_count = before_status.get(status, 0)
-        after_count = after_status.get(status, 0)
-        change = after_count - before_count
-        if change != 0:
-            print(f"{status}: {before_count} → {after_count} (change: {change:+d})")
-
-    return result
+    return compare_around(manual_trigger_restarted_documents, "MANUAL TRIGGER")
 
 
 if __name__ == "__main__":
-    check_status_before_and_after()
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(check_status_before_and_after)
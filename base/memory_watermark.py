@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Memory Watermark Recycling
+Worker-side container memory monitoring for Celery prefork workers: recycle
+idle child processes at the soft watermark and stop consuming new tasks at
+the hard watermark, so the pod is never OOM-killed mid-document.
+
+Nothing runs until the app's Celery module installs it; the worker command
+the chart renders does not do so on its own:
+    from memory_watermark import install
+    install(app)
+
+Thresholds come from CELERY_MEMORY_WATERMARK_SOFT / _HARD (fractions of the
+container memory limit), which the base chart sets from the worker profile
+once celery.memoryWatermarkHook is true.
+Usage is the working set as kubelet computes it (cgroup usage minus
+inactive file cache), since reclaimable page cache may never be released
+and would otherwise keep the worker drained.
+
+Run directly to print the current readings and the decision.
+"""
+
+import os
+import time
+from typing import Optional, Tuple
+
+DEFAULT_SOFT_RATIO = 0.75
+DEFAULT_HARD_RATIO = 0.90
+DEFAULT_CHECK_INTERVAL = 5.0
+# Between the watermarks, recycle once on entering the band and then at
+# most once per cooldown; dropping RECYCLE_REARM_MARGIN under soft re-arms
+DEFAULT_RECYCLE_COOLDOWN = 60.0
+RECYCLE_REARM_MARGIN = 0.05
+
+# Values cgroups use for "no limit"
+_UNLIMITED = 1 << 60
+
+# (usage, limit, stat file, inactive file cache key in the stat file)
+CGROUP_V2_FILES = (
+    "/sys/fs/cgroup/memory.current",
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory.stat",
+    "inactive_file",
+)
+CGROUP_V1_FILES = (
+    "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    "/sys/fs/cgroup/memory/memory.stat",
+    "total_inactive_file",
+)
+
+OK = "ok"
+RECYCLE = "recycle"
+DRAIN = "drain"
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _read_stat(path: str, key: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def read_container_memory() -> Tuple[Optional[int], Optional[int]]:
+    """(working_set_bytes, limit_bytes) of this container's cgroup.
+
+    Working set = usage - inactive_file, the figure kubelet evicts and
+    reports on; None where unknown.
+    """
+    for usage_file, limit_file, stat_file, inactive_key in (
+        CGROUP_V2_FILES,
+        CGROUP_V1_FILES,
+    ):
+        usage = _read_int(usage_file)
+        if usage is not None:
+            limit = _read_int(limit_file)
+            if limit is not None and limit >= _UNLIMITED:
+                limit = None
+            return max(0, usage - _read_stat(stat_file, inactive_key)), limit
+    return None, None
+
+
+class WatermarkPolicy:
+    """Decide what to do for a given container memory usage.
+
+    Between soft and hard the worker keeps consuming but recycles an idle
+    child, returning fragmented heap to the OS: once on entering the band,
+    then at most once per ``recycle_cooldown`` while usage stays there.
+    Above hard it stops consuming until usage falls back under soft
+    (hysteresis), letting in-flight documents finish instead of being
+    OOM-killed.
+    """
+
+    def __init__(
+        self,
+        soft_ratio: float = DEFAULT_SOFT_RATIO,
+        hard_ratio: float = DEFAULT_HARD_RATIO,
+        recycle_cooldown: float = DEFAULT_RECYCLE_COOLDOWN,
+    ):
+        if not 0 < soft_ratio < hard_ratio <= 1:
+            raise ValueError("expected 0 < soft_ratio < hard_ratio <= 1")
+        self.soft_ratio = soft_ratio
+        self.hard_ratio = hard_ratio
+        self.recycle_cooldown = recycle_cooldown
+        self.draining = False
+        self.recycle_armed = True
+        self.last_recycle = None
+
+    @classmethod
+    def from_env(cls) -> "WatermarkPolicy":
+        return cls(
+            float(os.getenv("CELERY_MEMORY_WATERMARK_SOFT", DEFAULT_SOFT_RATIO)),
+            float(os.getenv("CELERY_MEMORY_WATERMARK_HARD", DEFAULT_HARD_RATIO)),
+            float(
+                os.getenv("CELERY_MEMORY_RECYCLE_COOLDOWN", DEFAULT_RECYCLE_COOLDOWN)
+            ),
+        )
+
+    def decide(
+        self, usage: Optional[int], limit: Optional[int], now: float = None
+    ) -> str:
+        if not usage or not limit:
+            return OK
+        now = time.monotonic() if now is None else now
+        ratio = usage / limit
+        if ratio >= self.hard_ratio or (self.draining and ratio >= self.soft_ratio):
+            self.draining = True
+            return DRAIN
+        self.draining = False
+        if ratio >= self.soft_ratio:
+            if self.recycle_armed or now - self.last_recycle >= self.recycle_cooldown:
+                self.recycle_armed = False
+                self.last_recycle = now
+                return RECYCLE
+            return OK
+        if ratio < self.soft_ratio - RECYCLE_REARM_MARGIN:
+            self.recycle_armed = True
+        return OK
+
+
+def install(app, interval: float = None):
+    """Register the watermark bootstep on a Celery app's workers."""
+    from celery import bootsteps
+
+    check_interval = interval or float(
+        os.getenv("CELERY_MEMORY_WATERMARK_INTERVAL", DEFAULT_CHECK_INTERVAL)
+    )
+
+    class MemoryWatermarkStep(bootsteps.StartStopStep):
+        requires = {"celery.worker.components:Pool", "celery.worker.components:Timer"}
+
+        def __init__(self, worker, **kwargs):
+            self.policy = WatermarkPolicy.from_env()
+            self.cancelled_queues = []
+            self.tref = None
+
+        def start(self, worker):
+            self.tref = worker.timer.call_repeatedly(
+                check_interval, self.check, (worker,), priority=10
+            )
+
+        def stop(self, worker):
+            if self.tref:
+                self.tref.cancel()
+                self.tref = None
+
+        def check(self, worker):
+            usage, limit = read_container_memory()
+            decision = self.policy.decide(usage, limit)
+            consumer = worker.consumer
+
+            if decision == DRAIN:
+                if not self.cancelled_queues and consumer and consumer.task_consumer:
+                    self.cancelled_queues = [
+                        q.name for q in consumer.task_consumer.queues
+                    ]
+                    for queue in self.cancelled_queues:
+                        consumer.cancel_task_queue(queue)
+                    worker_logger().warning(
+                        "Memory %.0f%% of limit: stopped consuming %s until below %.0f%%",
+                        100.0 * usage / limit,
+                        ",".join(self.cancelled_queues),
+                        100.0 * self.policy.soft_ratio,
+                    )
+                self._recycle_idle_child(worker)
+                return
+
+            if self.cancelled_queues and consumer:
+                for queue in self.cancelled_queues:
+                    consumer.add_task_queue(queue)
+                worker_logger().warning(
+                    "Memory back under watermark: resumed consuming %s",
+                    ",".join(self.cancelled_queues),
+                )
+                self.cancelled_queues = []
+
+            if decision == RECYCLE:
+                self._recycle_idle_child(worker)
+
+        def _recycle_idle_child(self, worker):
+            # shrink() only terminates idle processes; grow() replaces it with
+            # a fresh one, so in-flight tasks are never interrupted
+            pool = worker.pool
+            if not hasattr(pool, "shrink") or pool.num_processes <= 1:
+                return
+            try:
+                pool.shrink(1)
+                pool.grow(1)
+            except ValueError:
+                # No idle child right now; try again on the next check
+                pass
+
+    app.steps["worker"].add(MemoryWatermarkStep)
+    return MemoryWatermarkStep
+
+
+def worker_logger():
+    from celery.utils.log import get_logger as get_celery_logger
+
+    return get_celery_logger("memory_watermark")
+
+
+def main():
+    usage, limit = read_container_memory()
+    policy = WatermarkPolicy.from_env()
+    print("=== Container Memory Watermarks ===")
+    if usage is None:
+        print("No cgroup memory accounting found (not running in a container?)")
+        return
+    print(f"Working set: {usage / 2**20:.1f} MiB")
+    print(f"Limit: {limit / 2**20:.1f} MiB" if limit else "Limit: none")
+    print(f"Soft/hard watermark: {policy.soft_ratio:.0%} / {policy.hard_ratio:.0%}")
+    print(f"Decision: {policy.decide(usage, limit)}")
+
+
+if __name__ == "__main__":
+    main()
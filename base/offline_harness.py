@@ -0,0 +1,728 @@
+#!/usr/bin/env python3
+"""
+Offline Harness
+In-process stand-ins (broker, document processor, SQLite database, task and
+user context) so the restart tools can be exercised and benchmarked on a
+laptop without Postgres, Redis or Celery workers.
+
+Usage:
+    python offline_harness.py [--documents N] [--latency S] [--failure-rate F]
+"""
+
+import sys
+import os
+import io
+import time
+import types
+import uuid
+import hashlib
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_context import MockRequest, MockTaskSelf, MockUserAuthentication  # noqa: F401
+
+
+class InMemoryBroker:
+    """Thread-safe named queues with reserve/ack semantics like a broker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: Dict[str, deque] = {}
+        self._reserved: Dict[str, Dict] = {}
+        self.published = 0
+
+    def send_task(
+        self, name: str, kwargs: Dict = None, queue: str = "celery", eta: float = None
+    ) -> str:
+        task_id = str(uuid.uuid4())
+        message = {
+            "id": task_id,
+            "name": name,
+            "kwargs": kwargs or {},
+            "eta": eta or 0,
+            "retries": 0,
+        }
+        with self._lock:
+            self._queues.setdefault(queue, deque()).append(message)
+            self.published += 1
+        return task_id
+
+    def requeue(self, message: Dict, queue: str = "celery", countdown: float = 0):
+        message = dict(
+            message, eta=time.monotonic() + countdown, retries=message["retries"] + 1
+        )
+        with self._lock:
+            self._reserved.pop(message["id"], None)
+            self._queues.setdefault(queue, deque()).append(message)
+
+    def reserve(self, queue: str = "celery"):
+        """Pop the first message whose ETA has passed, or None."""
+        now = time.monotonic()
+        with self._lock:
+            pending = self._queues.get(queue)
+            if not pending:
+                return None
+            for _ in range(len(pending)):
+                message = pending.popleft()
+                if message["eta"] <= now:
+                    self._reserved[message["id"]] = message
+                    return message
+                pending.append(message)
+        return None
+
+    def ack(self, message: Dict):
+        with self._lock:
+            self._reserved.pop(message["id"], None)
+
+    def depth(self, queue: str = "celery") -> int:
+        with self._lock:
+            return len(self._queues.get(queue, ()))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._reserved)
+
+
+class UnknownScript(ValueError):
+    """A Lua script InMemoryRedis has no emulation for."""
+
+    def __init__(self, script: str):
+        self.sha = hashlib.sha1(script.encode()).hexdigest()
+        first_line = next(
+            (line.strip() for line in script.splitlines() if line.strip()), ""
+        )
+        super().__init__(
+            f"InMemoryRedis cannot run script {self.sha} ({first_line!r}); it "
+            "emulates diagnostics_cache.RELEASE_LOCK_SCRIPT and "
+            "trigger_gate.REFRESH_LOCK_SCRIPT only"
+        )
+
+
+class InMemoryRedis:
+    """Enough of a redis-py client for diagnostics_cache and trigger_gate.
+
+    Setting ``available`` to False makes every call raise ConnectionError,
+    as an unreachable server would.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, tuple] = {}
+        self.available = True
+        self.calls = 0
+
+    def _check(self):
+        self.calls += 1
+        if not self.available:
+            raise ConnectionError("redis unavailable")
+
+    def _live(self, name: str):
+        value, expires = self._data.get(name, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            return None
+        return value
+
+    def get(self, name: str):
+        with self._lock:
+            self._check()
+            return self._live(name)
+
+    def set(self, name: str, value, ex=None, px=None, nx=False):
+        with self._lock:
+            self._check()
+            if nx and self._live(name) is not None:
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            expires = time.monotonic() + ttl if ttl is not None else None
+            if isinstance(value, str):
+                value = value.encode()
+            self._data[name] = (value, expires)
+            return True
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            self._check()
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def register_script(self, script: str):
+        from diagnostics_cache import RELEASE_LOCK_SCRIPT
+        from trigger_gate import REFRESH_LOCK_SCRIPT
+
+        if script not in (RELEASE_LOCK_SCRIPT, REFRESH_LOCK_SCRIPT):
+            raise UnknownScript(script)
+
+        def run(keys, args):
+            with self._lock:
+                self._check()
+                token = args[0].encode() if isinstance(args[0], str) else args[0]
+                if self._live(keys[0]) != token:
+                    return 0
+                if script == RELEASE_LOCK_SCRIPT:
+                    del self._data[keys[0]]
+                else:
+                    expires = time.monotonic() + int(args[1]) / 1000
+                    self._data[keys[0]] = (token, expires)
+                return 1
+
+        return run
+
+
+class InMemoryProbe:
+    """trigger_gate probe reading an InMemoryBroker and a fixed pool size."""
+
+    def __init__(self, broker: InMemoryBroker, capacity: int, queue: str = "celery"):
+        self.broker = broker
+        self.capacity = capacity
+        self.queue = queue
+
+    def queue_depth(self) -> int:
+        return self.broker.depth(self.queue)
+
+    def worker_load(self):
+        return self.broker.in_flight(), self.capacity
+
+
+class FakeDocumentProcessor:
+    """document_processor stand-in with configurable latency and failures.
+
+    Exposes both ``process_document`` (manual restart path) and
+    ``process_document_async`` (recovery path) and records concurrency.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        failure_rate: float = 0.0,
+        seed: int = 7,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.active = 0
+        self.peak_concurrency = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+            delay = self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        return max(delay, 0), failed
+
+    def _done(self):
+        with self._lock:
+            self.active -= 1
+
+    def process_document(self, doc_id, org_id=None, force_restart=False):
+        delay, failed = self._draw()
+        try:
+            time.sleep(delay)
+        finally:
+            self._done()
+        if failed:
+            return {
+                "success": False,
+                "error": "FakeDocumentProcessor: injected failure",
+            }
+        return {"success": True, "doc_id": doc_id}
+
+    async def process_document_async(self, user, doc_rec, checkpoint=0):
+        delay, failed = self._draw()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._done()
+        if failed:
+            raise RuntimeError("FakeDocumentProcessor: injected failure")
+        return {"success": True, "doc_id": str(getattr(doc_rec, "id", doc_rec))}
+
+
+class _PrintLogger:
+    def add_log(self, level, scope, message):
+        if level in ("error", "warning"):
+            print(f"[{level}] {message}")
+
+
+def create_sqlite_standin(documents: int = 1000, orgs: int = 5, seed: int = 7):
+    """In-memory SQLite database with a documents table shaped like production.
+
+    Registers NOW() so the restart scripts' UPDATE statements run unchanged;
+    Postgres-only diagnostics (INTERVAL, EXTRACT) still need a real Postgres.
+    """
+    from sqlalchemy import create_engine, event, text
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function(
+            "NOW", 0, lambda: datetime.now().isoformat(sep=" ")
+        )
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for i in range(documents):
+        # First org owns half of everything, like a bulk-uploading tenant
+        org = (
+            "org-0000" if rng.random() < 0.5 else f"org-{rng.randint(1, orgs - 1):04d}"
+        )
+        modified = now - timedelta(minutes=rng.randint(0, 24 * 60))
+        rows.append(
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "status": "RESTARTED",
+                "org_id": org,
+                "doc_type": rng.choice(["invoice", "order", "delivery_note"]),
+                "doc_source": rng.choice(["email", "upload", "api"]),
+                "filename": f"file-{i}.pdf",
+                "created_by": "system",
+                "celery_task_token": None,
+                "created_on": modified - timedelta(minutes=5),
+                "last_modified_on": modified,
+            }
+        )
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+                CREATE TABLE documents (
+                    id TEXT PRIMARY KEY,
+                    status TEXT,
+                    is_deleted BOOLEAN DEFAULT 0,
+                    org_id TEXT,
+                    doc_type TEXT,
+                    doc_source TEXT,
+                    filename TEXT,
+                    created_by TEXT,
+                    celery_task_token TEXT,
+                    extracted_data TEXT,
+                    created_on TIMESTAMP,
+                    last_modified_on TIMESTAMP,
+                    timestamp_for_validation TIMESTAMP,
+                    restart_allowed BOOLEAN
+                )
+                """))
+        if rows:
+            conn.execute(
+                text("""
+                    INSERT INTO documents (
+                        id, status, org_id, doc_type, doc_source, filename,
+                        created_by, celery_task_token, created_on, last_modified_on
+                    ) VALUES (
+                        :id, :status, :org_id, :doc_type, :doc_source, :filename,
+                        :created_by, :celery_task_token, :created_on, :last_modified_on
+                    )
+                    """),
+                rows,
+            )
+
+    return engine, sessionmaker(bind=engine)
+
+
+@contextmanager
+def _module_overrides(overrides: Dict[str, types.ModuleType]):
+    saved = {name: sys.modules.get(name) for name in overrides}
+    sys.modules.update(overrides)
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def _stub_module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    if "." not in name:
+        module.__path__ = []
+    return module
+
+
+@contextmanager
+def offline_environment(
+    processor: FakeDocumentProcessor = None, documents: int = 1000, orgs: int = 5
+):
+    """Run the toolkit against the SQLite stand-in and fake processor.
+
+    The app's own packages are used when importable (with their sessions
+    swapped); otherwise minimal ``database`` / ``logger`` modules are
+    provided so the scripts import on a bare laptop.
+    """
+    processor = processor or FakeDocumentProcessor()
+    engine, session_factory = create_sqlite_standin(documents, orgs)
+
+    overrides = {
+        "module.document_process": _stub_module(
+            "module.document_process",
+            document_processor=processor,
+            process_document_async=processor.process_document_async,
+        )
+    }
+    try:
+        import module  # noqa: F401
+    except ImportError:
+        overrides["module"] = _stub_module("module")
+    try:
+        import logger  # noqa: F401
+    except ImportError:
+        overrides["logger"] = _stub_module("logger", get_logger=lambda: _PrintLogger())
+
+    try:
+        import database.database  # noqa: F401
+
+        have_database = True
+    except ImportError:
+        have_database = False
+        overrides["database"] = _stub_module("database")
+        overrides["database.database"] = _stub_module(
+            "database.database", engine=engine, SessionLocal=session_factory
+        )
+
+    with _module_overrides(overrides):
+        if have_database:
+            from session_override import override_sessions
+
+            with override_sessions(session_factory, engine=engine):
+                yield engine, processor
+        else:
+            yield engine, processor
+    engine.dispose()
+
+
+def run_worker_pool(
+    broker: InMemoryBroker,
+    processor: FakeDocumentProcessor,
+    concurrency: int,
+    max_retries: int = 3,
+    backoff_base: float = 0.05,
+    queue: str = "celery",
+) -> Dict:
+    """Drain ``queue`` with ``concurrency`` threads, retrying with exponential backoff."""
+    stats = {"succeeded": 0, "gave_up": 0, "retries": 0}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            message = broker.reserve(queue)
+            if message is None:
+                if broker.depth(queue) == 0 and broker.in_flight() == 0:
+                    return
+                time.sleep(0.001)
+                continue
+            result = processor.process_document(**message["kwargs"])
+            with lock:
+                if result.get("success"):
+                    stats["succeeded"] += 1
+                elif message["retries"] < max_retries:
+                    stats["retries"] += 1
+                else:
+                    stats["gave_up"] += 1
+            if not result.get("success") and message["retries"] < max_retries:
+                broker.requeue(
+                    message, queue, countdown=backoff_base * 2 ** message["retries"]
+                )
+            else:
+                broker.ack(message)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+    return dict(
+        stats,
+        elapsed_seconds=round(elapsed, 3),
+        docs_per_second=round(stats["succeeded"] / elapsed, 2) if elapsed else 0.0,
+    )
+
+
+def benchmark_manual_restart(
+    documents: int, latency: float, failure_rate: float
+) -> Dict:
+    """Drain every RESTARTED document through manual_process_restart.
+
+    The script handles one batch per call, so it is called until nothing
+    is left, or until open circuit breakers skip a whole batch; its
+    per-document output is suppressed.
+    """
+    processor = FakeDocumentProcessor(latency=latency, failure_rate=failure_rate)
+    processed = 0
+    batches = 0
+    skipped = 0
+    with offline_environment(processor, documents=documents):
+        import manual_process_restart
+
+        guard = manual_process_restart.default_guard(reset=True)
+        started = time.perf_counter()
+        while True:
+            with redirect_stdout(io.StringIO()):
+                result = manual_process_restart.manual_process_restarted_documents()
+            if not result.get("success") or not result.get("total_found"):
+                break
+            processed += result["documents_processed"]
+            batches += 1
+            if result.get("skipped") == result["total_found"]:
+                skipped = result["skipped"]
+                break
+        elapsed = time.perf_counter() - started
+
+    return {
+        "documents_processed": processed,
+        "processor_calls": processor.calls,
+        "batches": batches,
+        "left_behind_open_breakers": skipped,
+        "peak_concurrency_limit": guard.snapshot()["peak_concurrency_limit"],
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_second": round(processor.calls / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def benchmark_worker_concurrency(
+    documents: int, latency: float, failure_rate: float, levels: List[int] = None
+) -> Dict[int, Dict]:
+    """Throughput and retry counts of a fake worker pool per concurrency level."""
+    results = {}
+    for concurrency in levels or [1, 2, 4, 8]:
+        broker = InMemoryBroker()
+        processor = FakeDocumentProcessor(latency=latency, failure_rate=failure_rate)
+        for i in range(documents):
+            broker.send_task(
+                "process_document",
+                kwargs={
+                    "doc_id": f"doc-{i}",
+                    "org_id": "org-0000",
+                    "force_restart": True,
+                },
+            )
+        results[concurrency] = dict(
+            run_worker_pool(broker, processor, concurrency),
+            peak_concurrency=processor.peak_concurrency,
+        )
+    return results
+
+
+def benchmark_shared_cache(callers: int = 20, latency: float = 0.2) -> Dict:
+    """Concurrent callers of one cached diagnostic, with Redis up and down.
+
+    With the stand-in Redis reachable, a cold key should be queried once
+    however many callers arrive together; with it unreachable every caller
+    falls back to querying itself and the breaker opens.
+    """
+    runs = []
+
+    def slow_query(org_id: str) -> Dict:
+        runs.append(org_id)
+        time.sleep(latency)
+        return {"org_id": org_id, "generated": datetime.now()}
+
+    results = {}
+    redis = InMemoryRedis()
+    with offline_environment(documents=0):
+        from diagnostics_cache import DiagnosticsCache, set_default_cache, shared_cache
+
+        cached_query = shared_cache("offline_harness.slow_query", ttl=30)(slow_query)
+        for scenario in ("redis_up", "redis_down"):
+            redis.available = scenario == "redis_up"
+            cache = DiagnosticsCache(redis)
+            set_default_cache(cache)
+            runs.clear()
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=callers) as pool:
+                list(pool.map(lambda _: cached_query("org-0000"), range(callers)))
+            results[scenario] = {
+                "callers": callers,
+                "query_runs": len(runs),
+                "elapsed_seconds": round(time.monotonic() - started, 3),
+                "breaker": cache.breaker.state,
+                **cache.stats,
+            }
+        set_default_cache(None)
+    return results
+
+
+def benchmark_trigger_gate(
+    ticks: int = 30, batch_size: int = 50, concurrency: int = 4, callers: int = 20
+) -> Dict:
+    """trigger_restarted_documents runs with and without trigger_gate.
+
+    Each tick one trigger run offers ``batch_size`` documents and the
+    workers finish ``concurrency`` tasks. Ungated the queue grows every
+    tick; gated it stays within the backlog the workers can absorb. The
+    same stand-ins check that concurrent extra-run requests enqueue once
+    and that overlapping runs execute once.
+    """
+    results = {}
+    with offline_environment(documents=0):
+        from trigger_gate import TriggerLock, request_trigger, run_gated
+
+        for scenario in ("ungated", "gated"):
+            broker = InMemoryBroker()
+            probe = InMemoryProbe(broker, concurrency)
+            redis = InMemoryRedis()
+            reserved, peak_depth, skipped = [], 0, 0
+
+            def enqueue(count: int) -> Dict:
+                for _ in range(count):
+                    broker.send_task("process_document")
+                return {"status": "success", "documents_queued": count}
+
+            for _ in range(ticks):
+                if scenario == "gated":
+                    result = run_gated(
+                        enqueue, batch_size, probe=probe, lock=TriggerLock(redis)
+                    )
+                    skipped += result["status"] == "skipped"
+                else:
+                    enqueue(batch_size)
+                peak_depth = max(peak_depth, broker.depth())
+                # Workers finish what they held and take the next tasks
+                for message in reserved:
+                    broker.ack(message)
+                reserved = [
+                    message
+                    for message in (broker.reserve() for _ in range(concurrency))
+                    if message
+                ]
+            results[scenario] = {
+                "ticks": ticks,
+                "published": broker.published,
+                "peak_queue_depth": peak_depth,
+                "final_queue_depth": broker.depth(),
+                "skipped_runs": skipped,
+            }
+
+        broker = InMemoryBroker()
+        probe = InMemoryProbe(broker, concurrency)
+        redis = InMemoryRedis()
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            requests = list(
+                pool.map(
+                    lambda _: request_trigger(
+                        lambda: broker.send_task("trigger_restarted_documents"),
+                        client=redis,
+                        probe=probe,
+                    ),
+                    range(callers),
+                )
+            )
+        runs = []
+
+        def slow_run(count: int) -> Dict:
+            runs.append(count)
+            time.sleep(0.1)
+            return {"status": "success"}
+
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            list(
+                pool.map(
+                    lambda _: run_gated(slow_run, probe=probe, lock=TriggerLock(redis)),
+                    range(callers),
+                )
+            )
+        results["dedupe"] = {
+            "callers": callers,
+            "enqueued": sum(request["enqueued"] for request in requests),
+            "overlapping_runs_executed": len(runs),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline restart benchmark")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print("=== Offline Restart Harness ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print(
+        f"Fake processor: latency {args.latency}s, failure rate {args.failure_rate:.0%}"
+    )
+    print()
+
+    print("=== Worker pool throughput (in-memory broker) ===")
+    results = benchmark_worker_concurrency(
+        args.documents, args.latency, args.failure_rate
+    )
+    for concurrency, stats in results.items():
+        print(
+            f"  concurrency {concurrency:2d}: {stats['docs_per_second']:8.2f} docs/s | "
+            f"retries: {stats['retries']:4d} | gave up: {stats['gave_up']:3d} | "
+            f"elapsed: {stats['elapsed_seconds']}s"
+        )
+    print()
+
+    print("=== manual_process_restart on SQLite stand-in ===")
+    stats = benchmark_manual_restart(args.documents, args.latency, args.failure_rate)
+    print(
+        f"  processed {stats['documents_processed']} of {stats['processor_calls']} "
+        f"attempted in {stats['batches']} batches, {stats['elapsed_seconds']}s "
+        f"({stats['docs_per_second']} docs/s, "
+        f"peak concurrency limit {stats['peak_concurrency_limit']})"
+    )
+    if stats["left_behind_open_breakers"]:
+        print(
+            f"  ⚠️  stopped with {stats['left_behind_open_breakers']} documents "
+            "held back by open circuit breakers"
+        )
+    print()
+
+    print("=== Shared diagnostics cache (in-memory Redis) ===")
+    for scenario, stats in benchmark_shared_cache().items():
+        print(
+            f"  {scenario:10s}: {stats['query_runs']:2d} query runs for {stats['callers']} "
+            f"concurrent callers in {stats['elapsed_seconds']}s | "
+            f"hits: {stats['hits']} | waited: {stats['waited']} | "
+            f"fallbacks: {stats['fallbacks']} | breaker: {stats['breaker']}"
+        )
+    print()
+
+    print("=== Trigger backpressure (in-memory broker and Redis) ===")
+    results = benchmark_trigger_gate()
+    for scenario in ("ungated", "gated"):
+        stats = results[scenario]
+        print(
+            f"  {scenario:8s}: published {stats['published']:4d} over {stats['ticks']} "
+            f"ticks | peak queue depth: {stats['peak_queue_depth']:4d} | "
+            f"final: {stats['final_queue_depth']:4d} | "
+            f"skipped runs: {stats['skipped_runs']}"
+        )
+    stats = results["dedupe"]
+    print(
+        f"  {stats['callers']} concurrent extra-run requests enqueued "
+        f"{stats['enqueued']}; {stats['callers']} overlapping runs executed "
+        f"{stats['overlapping_runs_executed']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
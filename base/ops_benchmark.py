@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Ops Toolkit Benchmark
+Time every diagnostic and recovery entry point against a seeded local
+database and store the results as JSON for comparison across releases.
+
+Usage:
+    python ops_benchmark.py DATABASE_URL [--seed-rows N] [--repeat N]
+                            [--output FILE] [--compare BASELINE.json]
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+from statistics import median
+from typing import Callable, Dict, List, Tuple
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from session_override import use_database
+from load_generator import seed, table_counts
+
+RESULTS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_results"
+)
+
+# A run is a regression when its median is this much slower than baseline
+DEFAULT_REGRESSION_THRESHOLD = 0.20
+
+
+def _sample_ids(engine, status: str, limit: int) -> List[str]:
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(
+                "SELECT id FROM documents WHERE status = :status "
+                "AND is_deleted = false LIMIT :limit"
+            ),
+            {"status": status, "limit": limit},
+        )
+        return [str(row.id) for row in result]
+
+
+def build_entry_points(engine) -> List[Tuple[str, Callable]]:
+    """Every toolkit entry point that can run against a plain database.
+
+    Imports happen here, inside use_database(), so the scripts bind the
+    benchmark session factory. The shared diagnostics cache is switched off
+    so every call measures the query rather than a Redis hit.
+    """
+    from diagnostics_cache import DiagnosticsCache, set_default_cache
+
+    set_default_cache(DiagnosticsCache(None))
+    from document_monitor import DocumentMonitor
+    import celery_diagnostic
+    import check_restarted_docs
+    import restart_scheduler
+    from error_coordinator_fix import ErrorCoordinatorFix
+
+    monitor = DocumentMonitor()
+    restarted_ids = _sample_ids(engine, "RESTARTED", 50)
+    error_ids = _sample_ids(engine, "error", 1)
+
+    coordinator = ErrorCoordinatorFix()
+    if error_ids:
+        coordinator.target_document_id = error_ids[0]
+
+    return [
+        ("document_monitor.status_counts", monitor.get_document_status_counts),
+        (
+            "document_monitor.status_counts_org",
+            lambda: monitor.get_document_status_counts(org_id="org-0000"),
+        ),
+        (
+            "document_monitor.restarted_progression",
+            lambda: monitor.check_restarted_documents_progression(restarted_ids),
+        ),
+        (
+            "document_monitor.error_documents",
+            lambda: monitor.analyze_error_documents(limit=50),
+        ),
+        (
+            "document_monitor.recent_changes_24h",
+            lambda: monitor.get_recent_status_changes(hours=24),
+        ),
+        ("celery_diagnostic.task_status", celery_diagnostic.check_celery_task_status),
+        (
+            "celery_diagnostic.pipeline",
+            celery_diagnostic.check_document_processing_pipeline,
+        ),
+        (
+            "celery_diagnostic.error_patterns",
+            celery_diagnostic.analyze_error_patterns,
+        ),
+        (
+            "check_restarted_docs.recent_restarted",
+            lambda: check_restarted_docs.get_recent_restarted_documents(10),
+        ),
+        (
+            "check_restarted_docs.stuck_counts",
+            check_restarted_docs.check_processing_progression,
+        ),
+        (
+            "restart_scheduler.fair_batch",
+            lambda: restart_scheduler.select_fair_restart_batch(batch_size=10),
+        ),
+        (
+            "error_coordinator_fix.analyze_failure",
+            coordinator.analyze_document_failure,
+        ),
+    ]
+
+
+def time_entry_point(func: Callable, repeat: int) -> Dict:
+    """Warm up once, then time ``repeat`` calls in milliseconds."""
+    func()
+    runs = []
+    error = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        runs.append((time.perf_counter() - started) * 1000)
+        if isinstance(result, dict) and "error" in result:
+            error = result["error"]
+
+    ordered = sorted(runs)
+    return {
+        "runs_ms": [round(r, 3) for r in runs],
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max_ms": round(ordered[-1], 3),
+        "error": error,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(database_url: str, repeat: int = 5, seed_rows: int = 0) -> Dict:
+    with use_database(database_url) as engine:
+        if seed_rows:
+            with engine.connect() as conn:
+                seed(conn.execution_options(isolation_level="AUTOCOMMIT"), seed_rows)
+
+        with engine.connect() as conn:
+            counts = table_counts(conn)
+
+        results = {}
+        for name, func in build_entry_points(engine):
+            print(f"  timing {name}...")
+            try:
+                results[name] = time_entry_point(func, repeat)
+            except Exception as e:
+                results[name] = {"error": str(e)}
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "table_counts": counts,
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Entry points whose median got slower than ``threshold`` vs baseline."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        if "median_ms" not in result or "median_ms" not in before:
+            continue
+        if before["median_ms"] and result["median_ms"] > before["median_ms"] * (
+            1 + threshold
+        ):
+            regressions.append(
+                {
+                    "entry_point": name,
+                    "baseline_ms": before["median_ms"],
+                    "current_ms": result["median_ms"],
+                    "change": round(result["median_ms"] / before["median_ms"] - 1, 3),
+                }
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ops toolkit")
+    parser.add_argument("database_url", help="local Postgres URL (never production)")
+    parser.add_argument("--seed-rows", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="result file (default: benchmark_results/)")
+    parser.add_argument("--compare", metavar="BASELINE", help="previous result file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    print("=== Ops Toolkit Benchmark ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    report = run_benchmark(args.database_url, args.repeat, args.seed_rows)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"ops_benchmark_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    print(f"Table counts: {report['table_counts']}")
+    for name, result in report["results"].items():
+        if "median_ms" in result:
+            print(
+                f"  {name:42s} median: {result['median_ms']:9.2f} ms | "
+                f"p95: {result['p95_ms']:9.2f} ms"
+                + (f" | error: {result['error']}" if result["error"] else "")
+            )
+        else:
+            print(f"  {name:42s} failed: {result['error']}")
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        print(f"\n=== Regressions vs {args.compare} (>{args.threshold:.0%}) ===")
+        for regression in regressions:
+            print(
+                f"  {regression['entry_point']}: {regression['baseline_ms']} ms → "
+                f"{regression['current_ms']} ms ({regression['change']:+.0%})"
+            )
+        if not regressions:
+            print("  none")
+        else:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
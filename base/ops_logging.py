@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Ops Logging
+Asynchronous structured logging for the ops toolkit. ``get_logger()`` is a
+drop-in for the app's ``logger.get_logger()`` (same ``add_log(level, scope,
+message)``), but a call only puts an event on a queue; a background thread
+writes JSON lines in batches, rotates files by size and forwards events to
+the app logger, so per-document loops never wait on log I/O.
+
+Repetitive info and debug messages are sampled in the JSON file: per
+signature (the message with ids and numbers masked) the first OPS_LOG_BURST
+events of each OPS_LOG_WINDOW seconds are written, the rest are counted and
+reported as one "suppressed" event when the window closes. Warnings and
+errors are never sampled, and forwarding to the app logger happens before
+sampling, so it sees every event as it did before.
+
+Environment:
+    OPS_LOG_DIR        directory for <script>.jsonl (default base/logs/ops)
+    OPS_LOG_MAX_BYTES  rotate at this size (default 10 MiB), OPS_LOG_BACKUPS
+    OPS_LOG_BURST / OPS_LOG_WINDOW    sampling (default 20 per 60s)
+    OPS_LOG_FORWARD    lowest level forwarded to the app logger (info)
+
+Usage:
+    python ops_logging.py --benchmark N     # per-call cost vs. a sync handler
+"""
+
+import sys
+import os
+import re
+import json
+import queue
+import atexit
+import socket
+import tempfile
+import threading
+import time
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "critical": 50}
+
+LOG_DIR = os.getenv(
+    "OPS_LOG_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "ops"),
+)
+MAX_BYTES = int(os.getenv("OPS_LOG_MAX_BYTES", 10 * 1024 * 1024))
+BACKUPS = int(os.getenv("OPS_LOG_BACKUPS", 5))
+BURST = int(os.getenv("OPS_LOG_BURST", 20))
+WINDOW_SECONDS = float(os.getenv("OPS_LOG_WINDOW", 60))
+FORWARD_LEVEL = os.getenv("OPS_LOG_FORWARD", "info")
+# Events at or above this level are always written, however repetitive
+UNSAMPLED_LEVEL = LEVELS["warning"]
+
+# Events per write and the longest an event waits for its batch
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5
+# Events buffered before new ones are dropped (and counted) rather than
+# blocking the caller
+QUEUE_SIZE = 50000
+
+_STOP = object()
+
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_HEX = re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{16,}\b")
+_NUMBER = re.compile(r"\d+(\.\d+)?")
+
+
+def message_signature(message: str) -> str:
+    """Group equivalent messages: ids, addresses and numbers are masked."""
+    message = message.lower()
+    message = _UUID.sub("<id>", message)
+    message = _HEX.sub("<hex>", message)
+    message = _NUMBER.sub("#", message)
+    return " ".join(message.split())[:120]
+
+
+class Sampler:
+    """Per-signature burst limit within fixed windows, below warning level."""
+
+    def __init__(self, burst: int = BURST, window: float = WINDOW_SECONDS):
+        self.burst = burst
+        self.window = window
+        self.window_started = time.monotonic()
+        self.seen: Dict[str, int] = {}
+        self.examples: Dict[str, Dict] = {}
+
+    def admit(self, event: Dict) -> bool:
+        if LEVELS.get(event["level"], 20) >= UNSAMPLED_LEVEL:
+            return True
+        signature = f"{event['level']}:{message_signature(event['message'])}"
+        count = self.seen.get(signature, 0) + 1
+        self.seen[signature] = count
+        if count <= self.burst:
+            return True
+        self.examples.setdefault(signature, event)
+        return False
+
+    def roll(self, now: float) -> List[Dict]:
+        """Summary events for the closing window, once it has elapsed."""
+        if now - self.window_started < self.window:
+            return []
+        summaries = []
+        for signature, example in self.examples.items():
+            summaries.append(
+                {
+                    "ts": time.time(),
+                    "level": example["level"],
+                    "scope": example["scope"],
+                    "event": "suppressed",
+                    "message": example["message"],
+                    "suppressed": self.seen[signature] - self.burst,
+                    "window_seconds": self.window,
+                }
+            )
+        self.seen.clear()
+        self.examples.clear()
+        self.window_started = now
+        return summaries
+
+
+class RotatingJsonFile:
+    """Append-only JSON lines file rotated to .1 … .N at ``max_bytes``."""
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES, backups: int = BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def write_batch(self, lines: List[str]):
+        data = "".join(lines)
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+
+    def close(self):
+        self._file.close()
+
+
+class AsyncJsonLogger:
+    """``add_log``-compatible logger backed by a queue and a writer thread."""
+
+    def __init__(
+        self,
+        path: str,
+        forward=None,
+        forward_level: str = FORWARD_LEVEL,
+        sampler: Sampler = None,
+    ):
+        self.path = path
+        self.forward = forward
+        self.forward_level = LEVELS.get(forward_level, 20)
+        self.sampler = sampler or Sampler()
+        self.context = {"host": socket.gethostname(), "script": _script_name()}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def add_log(self, level: str, scope: str, message, **fields):
+        event = {
+            "ts": time.time(),
+            "level": level,
+            "scope": scope,
+            "message": str(message),
+        }
+        if fields:
+            event.update(fields)
+        self._ensure_writer()
+        if self._queue.qsize() >= QUEUE_SIZE:
+            with self._lock:
+                self.dropped += 1
+            return
+        self._queue.put(event)
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far is written."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_writer(self):
+        # Started lazily, and again in a forked child where the parent's
+        # thread does not exist
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(
+                target=self._run, name="ops-logging", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        sink = RotatingJsonFile(self.path)
+        pending: List[Dict] = []
+        waiters: List[threading.Event] = []
+        stopping = False
+        try:
+            while not stopping:
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while len(pending) < BATCH_SIZE:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                        break
+                    pending.append(item)
+
+                self._write(sink, pending, stopping)
+                pending = []
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+        finally:
+            sink.close()
+
+    def _write(self, sink: RotatingJsonFile, events: List[Dict], final: bool):
+        lines = []
+        forwarded = []
+        for event in events:
+            if LEVELS.get(event["level"], 20) >= self.forward_level:
+                forwarded.append(event)
+            if self.sampler.admit(event):
+                lines.append(self._line(event))
+
+        now = time.monotonic()
+        summaries = self.sampler.roll(float("inf") if final else now)
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            summaries.append(
+                {
+                    "ts": time.time(),
+                    "level": "warning",
+                    "scope": "all",
+                    "event": "dropped",
+                    "message": f"ops log queue full, {dropped} events dropped",
+                }
+            )
+        lines.extend(self._line(summary) for summary in summaries)
+
+        if lines:
+            try:
+                sink.write_batch(lines)
+            except OSError as e:
+                print(f"ops_logging: write failed: {e}", file=sys.stderr)
+        if self.forward is not None:
+            for event in forwarded:
+                try:
+                    self.forward.add_log(
+                        event["level"], event["scope"], event["message"]
+                    )
+                except Exception:
+                    pass
+
+    def _line(self, event: Dict) -> str:
+        # Formatted here rather than in add_log, off the caller's thread
+        ts = datetime.fromtimestamp(event["ts"], timezone.utc)
+        record = {**self.context, **event, "ts": ts.isoformat(timespec="milliseconds")}
+        return json.dumps(record, default=str) + "\n"
+
+
+def _script_name() -> str:
+    name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    return os.path.splitext(name)[0] or "interactive"
+
+
+def _app_logger():
+    try:
+        from logger import get_logger as get_app_logger
+    except ImportError:
+        return None
+    return get_app_logger()
+
+
+_default_logger: Optional[AsyncJsonLogger] = None
+_default_lock = threading.Lock()
+
+
+def get_logger() -> AsyncJsonLogger:
+    """Process-wide toolkit logger writing to OPS_LOG_DIR/<script>.jsonl."""
+    global _default_logger
+    with _default_lock:
+        if _default_logger is None:
+            _default_logger = AsyncJsonLogger(
+                os.path.join(LOG_DIR, f"{_script_name()}.jsonl"),
+                forward=_app_logger(),
+            )
+            atexit.register(_default_logger.close)
+        return _default_logger
+
+
+def benchmark(events: int) -> Dict:
+    """Per-call cost of add_log against a synchronous logging.FileHandler."""
+    messages = [
+        (
+            f"Failed to process document {i:08x}-0000-0000-0000-000000000000: timeout"
+            if i % 10 == 0
+            else f"Processed document {i} in {i % 7}.{i % 100:02d}s"
+        )
+        for i in range(events)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        handler = logging.FileHandler(os.path.join(directory, "sync.log"))
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s [%(name)s] - %(message)s")
+        )
+        sync_logger = logging.getLogger("ops_logging.benchmark")
+        sync_logger.propagate = False
+        sync_logger.addHandler(handler)
+        sync_logger.setLevel(logging.INFO)
+        started = time.perf_counter()
+        for message in messages:
+            sync_logger.info(message)
+        sync_seconds = time.perf_counter() - started
+        sync_logger.removeHandler(handler)
+        handler.close()
+
+        async_logger = AsyncJsonLogger(os.path.join(directory, "async.jsonl"))
+        started = time.perf_counter()
+        for message in messages:
+            async_logger.add_log("info", "all", message)
+        async_seconds = time.perf_counter() - started
+        async_logger.close()
+        written = os.path.getsize(os.path.join(directory, "async.jsonl"))
+
+    return {
+        "events": events,
+        "sync_us_per_call": round(sync_seconds / events * 1e6, 2),
+        "async_us_per_call": round(async_seconds / events * 1e6, 2),
+        "async_bytes_written": written,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ops logging")
+    parser.add_argument("--benchmark", type=int, metavar="N", default=100000)
+    args = parser.parse_args()
+
+    print("=== Ops Logging Benchmark ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    result = benchmark(args.benchmark)
+    print(f"Events: {result['events']}")
+    print(f"Sync FileHandler: {result['sync_us_per_call']} µs per call")
+    print(
+        f"Async JSON:       {result['async_us_per_call']} µs per call "
+        f"({result['async_bytes_written']} bytes written after sampling)"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Pipeline SLO API
+Read-only HTTP API with the pipeline metrics the monitoring scripts compute
+separately (backlog, age buckets, error rates, processing latency), served
+from an in-process TTL cache. Concurrent requests for the same view share
+one query, so any number of dashboards cost one query per view per TTL.
+
+Endpoints:
+    GET /backlog        in-flight counts, stuck counts and ages per status
+    GET /age-buckets    in-flight documents per status and age bucket
+    GET /error-rates    error share per doc_source and doc_type (24h)
+    GET /task-latency   end-to-end latency percentiles and task outcomes (1h)
+    GET /summary        all of the above
+    GET /healthz        cache statistics
+
+Paged listings (not cached; each page is one keyset index range scan):
+    GET /error-documents?limit=N&org_id=ORG&cursor=TOKEN
+    GET /restarted-documents?limit=N&cursor=TOKEN
+Each response carries ``next_cursor``; pass it back as ``cursor`` for the
+next page until it is null.
+
+Usage:
+    python pipeline_api.py [--host HOST] [--port PORT]
+    python pipeline_api.py --once        # print every view and exit
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+from urllib.parse import parse_qs, urlparse
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import SessionLocal
+from query_explainer import explain_mode_active
+from keyset import InvalidCursor
+from logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_PORT = 8090
+
+# Statuses the pipeline still has to move forward, as in celery_diagnostic
+IN_FLIGHT_STATUSES = ("RESTARTED", "running", "validating", "processing")
+
+# One cutoff per metric instead of the 24h / 1h / 30min spread across scripts
+STUCK_AFTER_MINUTES = 30
+ERROR_WINDOW_HOURS = 24
+LATENCY_WINDOW_HOURS = 1
+
+# Upper bounds (minutes) of the age buckets; the last bucket is open-ended
+AGE_BUCKET_EDGES = (5, 30, 60, 240, 1440)
+
+# Seconds each view stays cached
+VIEW_TTLS = {
+    "backlog": 15,
+    "age-buckets": 30,
+    "error-rates": 60,
+    "task-latency": 30,
+}
+
+
+class CoalescingCache:
+    """TTL cache where concurrent misses on one key share a single load.
+
+    The first caller of an expired key runs the loader; callers arriving
+    meanwhile wait for its result instead of issuing their own query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, key: str, ttl: float, loader: Callable[[], Dict]) -> Dict:
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[1] > time.monotonic():
+                    self.stats["hits"] += 1
+                    return entry[0]
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+                self.stats["coalesced"] += 1
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    return entry[0]
+            # The load failed; retry as a regular miss
+
+        try:
+            value = loader()
+            with self._lock:
+                if "error" in value:
+                    self.stats["errors"] += 1
+                else:
+                    self._entries[key] = (value, time.monotonic() + ttl)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _read_only_session():
+    session = SessionLocal()
+    if not explain_mode_active():
+        session.execute(text("SET TRANSACTION READ ONLY"))
+    return session
+
+
+def query_backlog() -> Dict:
+    """In-flight documents per status with age and stuck counts, one scan."""
+    session = _read_only_session()
+    try:
+        query = text("""
+            SELECT
+                status,
+                COUNT(*) AS count,
+                COUNT(*) FILTER (WHERE last_modified_on < :stuck_cutoff) AS stuck,
+                AVG(EXTRACT(EPOCH FROM (NOW() - last_modified_on))) AS avg_age_seconds,
+                MAX(EXTRACT(EPOCH FROM (NOW() - last_modified_on))) AS max_age_seconds
+            FROM documents
+            WHERE status = ANY(:statuses)
+            AND is_deleted = false
+            GROUP BY status
+            """)
+        result = session.execute(
+            query,
+            {
+                "statuses": list(IN_FLIGHT_STATUSES),
+                "stuck_cutoff": datetime.now() - timedelta(minutes=STUCK_AFTER_MINUTES),
+            },
+        )
+        statuses = {
+            row.status: {
+                "count": row.count,
+                "stuck": row.stuck,
+                "avg_age_minutes": round((row.avg_age_seconds or 0) / 60, 1),
+                "max_age_minutes": round((row.max_age_seconds or 0) / 60, 1),
+            }
+            for row in result
+        }
+        return {
+            "statuses": statuses,
+            "total": sum(s["count"] for s in statuses.values()),
+            "stuck_total": sum(s["stuck"] for s in statuses.values()),
+            "stuck_after_minutes": STUCK_AFTER_MINUTES,
+        }
+    except Exception as e:
+        return {"error": f"Error reading backlog: {str(e)}"}
+    finally:
+        session.close()
+
+
+def query_age_buckets() -> Dict:
+    """In-flight documents per status and age bucket.
+
+    Rows without a last_modified_on have no age and are left out, as in
+    snapshot_analytics.
+    """
+    session = _read_only_session()
+    try:
+        labels = [f"<{edge}m" for edge in AGE_BUCKET_EDGES] + [
+            f">={AGE_BUCKET_EDGES[-1]}m"
+        ]
+        query = text("""
+            SELECT
+                status,
+                width_bucket(
+                    EXTRACT(EPOCH FROM (NOW() - last_modified_on)) / 60,
+                    CAST(:edges AS double precision[])
+                ) AS bucket,
+                COUNT(*) AS count
+            FROM documents
+            WHERE status = ANY(:statuses)
+            AND is_deleted = false
+            AND last_modified_on IS NOT NULL
+            GROUP BY status, bucket
+            """)
+        result = session.execute(
+            query,
+            {
+                "statuses": list(IN_FLIGHT_STATUSES),
+                "edges": [float(edge) for edge in AGE_BUCKET_EDGES],
+            },
+        )
+        buckets: Dict[str, Dict[str, int]] = {}
+        for row in result:
+            per_status = buckets.setdefault(row.status, {label: 0 for label in labels})
+            per_status[labels[min(row.bucket, len(labels) - 1)]] += row.count
+        return {"buckets": buckets, "labels": labels}
+    except Exception as e:
+        return {"error": f"Error reading age buckets: {str(e)}"}
+    finally:
+        session.close()
+
+
+def query_error_rates() -> Dict:
+    """Share of documents touched in the window that ended in error."""
+    session = _read_only_session()
+    try:
+        query = text("""
+            SELECT
+                COALESCE(doc_source, 'unknown') AS doc_source,
+                COALESCE(doc_type, 'unknown') AS doc_type,
+                -- GROUPING(col) = 1 when col is rolled up in this row
+                GROUPING(doc_source) AS by_type,
+                GROUPING(doc_type) AS by_source,
+                COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE status = 'error') AS errors
+            FROM documents
+            WHERE last_modified_on >= :cutoff
+            AND is_deleted = false
+            GROUP BY GROUPING SETS ((doc_source), (doc_type), ())
+            """)
+        result = session.execute(
+            query,
+            {"cutoff": datetime.now() - timedelta(hours=ERROR_WINDOW_HOURS)},
+        )
+        rates = {"by_source": {}, "by_type": {}, "overall": {}}
+        for row in result:
+            entry = {
+                "total": row.total,
+                "errors": row.errors,
+                "error_rate": round(row.errors / row.total, 4) if row.total else 0,
+            }
+            if row.by_source and row.by_type:
+                rates["overall"] = entry
+            elif row.by_source:
+                rates["by_source"][row.doc_source] = entry
+            else:
+                rates["by_type"][row.doc_type] = entry
+        rates["window_hours"] = ERROR_WINDOW_HOURS
+        return rates
+    except Exception as e:
+        return {"error": f"Error reading error rates: {str(e)}"}
+    finally:
+        session.close()
+
+
+def query_task_latency() -> Dict:
+    """Created-to-finished latency percentiles plus Celery task outcomes."""
+    session = _read_only_session()
+    try:
+        cutoff = datetime.now() - timedelta(hours=LATENCY_WINDOW_HOURS)
+        latency = session.execute(
+            text("""
+                SELECT
+                    COUNT(*) AS finished,
+                    percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (
+                        ORDER BY EXTRACT(EPOCH FROM (last_modified_on - created_on))
+                    ) AS percentiles
+                FROM documents
+                WHERE last_modified_on >= :cutoff
+                AND NOT (status = ANY(:statuses))
+                AND status <> 'error'
+                AND is_deleted = false
+                """),
+            {"cutoff": cutoff, "statuses": list(IN_FLIGHT_STATUSES)},
+        ).first()
+        tasks = session.execute(
+            text("""
+                SELECT status, COUNT(*) AS count
+                FROM celery_taskmeta
+                WHERE date_done >= :cutoff
+                GROUP BY status
+                """),
+            {"cutoff": cutoff},
+        )
+        p50, p95, p99 = (latency.percentiles if latency else None) or (
+            None,
+            None,
+            None,
+        )
+        return {
+            "documents_finished": latency.finished if latency else 0,
+            "latency_seconds": {"p50": p50, "p95": p95, "p99": p99},
+            "task_counts": {row.status: row.count for row in tasks},
+            "window_hours": LATENCY_WINDOW_HOURS,
+        }
+    except Exception as e:
+        return {"error": f"Error reading task latency: {str(e)}"}
+    finally:
+        session.close()
+
+
+VIEWS = {
+    "backlog": query_backlog,
+    "age-buckets": query_age_buckets,
+    "error-rates": query_error_rates,
+    "task-latency": query_task_latency,
+}
+
+cache = CoalescingCache()
+
+
+def list_error_documents(params: Dict) -> Dict:
+    from document_monitor import DocumentMonitor
+
+    return DocumentMonitor().get_error_documents_page(
+        int(params.get("limit", 50)), params.get("org_id"), params.get("cursor")
+    )
+
+
+def list_restarted_documents(params: Dict) -> Dict:
+    from check_restarted_docs import get_restarted_documents_page
+
+    return get_restarted_documents_page(
+        int(params.get("limit", 10)), params.get("cursor")
+    )
+
+
+LISTINGS = {
+    "error-documents": list_error_documents,
+    "restarted-documents": list_restarted_documents,
+}
+
+
+def get_view(name: str) -> Dict:
+    """A view, cached for its TTL, stamped with when it was computed."""
+
+    def load():
+        started = time.perf_counter()
+        data = VIEWS[name]()
+        if "error" in data:
+            logger.add_log("error", "all", f"PIPELINE_API: {name}: {data['error']}")
+            return data
+        return {
+            "data": data,
+            "computed_at": datetime.now().isoformat(),
+            "query_ms": round((time.perf_counter() - started) * 1000, 2),
+            "ttl_seconds": VIEW_TTLS[name],
+        }
+
+    return cache.get(name, VIEW_TTLS[name], load)
+
+
+class PipelineAPIHandler(BaseHTTPRequestHandler):
+    server_version = "PipelineAPI/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.strip("/")
+        if path in LISTINGS:
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                body = LISTINGS[path](params)
+            except (InvalidCursor, ValueError) as e:
+                self._send(400, {"error": str(e)})
+                return
+        elif path in VIEWS:
+            body = get_view(path)
+        elif path == "summary":
+            body = {name: get_view(name) for name in VIEWS}
+        elif path == "healthz":
+            body = {"status": "ok", "cache": dict(cache.stats)}
+        else:
+            self._send(404, {"error": f"unknown view {path!r}"})
+            return
+        self._send(500 if "error" in body else 200, body)
+
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Dashboards poll constantly; keep request lines out of the logs
+        pass
+
+
+def serve(host: str = "0.0.0.0", port: int = DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), PipelineAPIHandler)
+    server.daemon_threads = True
+    logger.add_log("info", "all", f"PIPELINE_API: listening on {host}:{port}")
+    print(f"🚀 Pipeline SLO API listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline SLO API")
+    parser.add_argument("--host", default=os.getenv("PIPELINE_API_HOST", "0.0.0.0"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("PIPELINE_API_PORT", DEFAULT_PORT))
+    )
+    parser.add_argument("--once", action="store_true", help="print every view and exit")
+    args = parser.parse_args()
+
+    if not args.once and not explain_mode_active():
+        serve(args.host, args.port)
+        return
+
+    print("=== Pipeline SLO Views ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    summary = {name: get_view(name) for name in VIEWS}
+    print(json.dumps(summary, indent=2, default=str))
+    return summary
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
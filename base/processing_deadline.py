@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Processing Deadline
+Deadlines and per-stage budgets for document processing started or watched
+by the recovery scripts. Without them, a document stuck in one stage holds
+its worker slot (or the operator's terminal) indefinitely and is left in
+running with no record of where it stopped.
+
+Each stage still to run gets a budget of STAGE_BUDGET_FACTOR × its expected
+cost from the resume plan (measured time_logs, else the defaults), at least
+MIN_STAGE_BUDGET_SECONDS. The whole run is capped by an overall Deadline.
+The stage a document is in is read from extracted_data.processed_modules_list
+as the pipeline records progress. When a stage overruns its budget, or the
+deadline passes, the processing is cancelled. The document is then set to
+error, with the cut-off stage recorded under extracted_data.deadline_exceeded.
+The stages it completed stay recorded, so the next recovery resumes at the
+stage that was cut off (see recovery_checkpoints).
+
+Stage budgets only apply when the pipeline stages are configured (see
+recovery_checkpoints) and the recorded module names match them; otherwise a
+document that never appears to leave its first stage would be cut off while
+healthy, so only the overall deadline is enforced.
+
+Usage:
+    python processing_deadline.py DOC_ID     # budgets and current stage
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import SessionLocal
+from recovery_checkpoints import plan_resume
+from task_reconciler import IN_FLIGHT_STATUSES
+from logger import get_logger
+
+logger = get_logger()
+
+STAGE_BUDGET_FACTOR = float(os.getenv("PROCESSING_STAGE_BUDGET_FACTOR", 3))
+MIN_STAGE_BUDGET_SECONDS = float(os.getenv("PROCESSING_MIN_STAGE_SECONDS", 30))
+# Hard cap on one document however generous its stage budgets add up to
+MAX_DEADLINE_SECONDS = float(os.getenv("PROCESSING_DEADLINE_SECONDS", 600))
+POLL_SECONDS = 2.0
+# How long a cancelled run gets to unwind before we stop waiting for it
+CANCEL_GRACE_SECONDS = 10.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Processing cut off in ``stage`` after ``elapsed`` of its ``budget``."""
+
+    def __init__(
+        self, stage: str, elapsed: float, budget: float, completed: List[str], reason
+    ):
+        super().__init__(
+            f"{reason} in {stage} after {elapsed:.0f}s (budget {budget:.0f}s)"
+        )
+        self.stage = stage
+        self.elapsed = elapsed
+        self.budget = budget
+        self.completed = completed
+        self.reason = reason
+
+    def record(self) -> Dict:
+        return {
+            "stage": self.stage,
+            "reason": self.reason,
+            "elapsed_seconds": round(self.elapsed, 1),
+            "budget_seconds": round(self.budget, 1),
+            "completed_stages": self.completed,
+            "cut_off_at": datetime.now().isoformat(),
+        }
+
+
+class Deadline:
+    """A point in (monotonic) time that nested work must finish by."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def within(self, budget: float) -> float:
+        """``budget`` seconds, or less if the deadline comes first."""
+        return min(budget, self.remaining())
+
+
+def stage_budgets(plan: Dict) -> Dict[str, float]:
+    """Seconds each stage still to run may take; none if stages are unknown."""
+    if not plan.get("stages_configured"):
+        return {}
+    costs = plan.get("stage_seconds", {})
+    return {
+        stage: max(MIN_STAGE_BUDGET_SECONDS, STAGE_BUDGET_FACTOR * costs.get(stage, 0))
+        for stage in plan["rerun_stages"]
+    }
+
+
+def deadline_for(budgets: Dict[str, float], cap: float = None) -> Deadline:
+    """Overall deadline: every stage at its budget, within the cap."""
+    cap = MAX_DEADLINE_SECONDS if cap is None else cap
+    return Deadline(min(sum(budgets.values()), cap) if budgets else cap)
+
+
+class StageTracker:
+    """Which stage a document is in and whether it has overrun.
+
+    Stage clocks only start once the document is in flight; time spent
+    queued counts against the overall deadline alone. Stage budgets stop
+    being enforced once the pipeline records modules and none of them is a
+    configured stage.
+    """
+
+    def __init__(self, plan: Dict, budgets: Dict[str, float], deadline: Deadline):
+        self.stages = list(plan["rerun_stages"])
+        self.known_stages = set(plan.get("stage_seconds") or self.stages)
+        self.budgets = budgets
+        self.deadline = deadline
+        self.enforce_stages = bool(budgets)
+        self.stage = None
+        self.stage_started = None
+        self.completed: List[str] = []
+
+    def observe(self, status: Optional[str], processed) -> Optional[DeadlineExceeded]:
+        processed = set(processed or [])
+        if self.enforce_stages and processed and not processed & self.known_stages:
+            self.enforce_stages = False
+            logger.add_log(
+                "warning",
+                "all",
+                f"PROCESSING_DEADLINE: recorded modules {sorted(processed)} match no "
+                "configured stage; enforcing the overall deadline only",
+            )
+        self.completed = [stage for stage in self.stages if stage in processed]
+        pending = [stage for stage in self.stages if stage not in processed]
+        stage = pending[0] if pending else self.stages[-1]
+
+        now = time.monotonic()
+        if status in IN_FLIGHT_STATUSES and stage != self.stage:
+            self.stage, self.stage_started = stage, now
+
+        if self.enforce_stages and self.stage is not None:
+            elapsed = now - self.stage_started
+            budget = self.budgets[self.stage]
+            if elapsed > budget:
+                return DeadlineExceeded(
+                    self.stage, elapsed, budget, self.completed, "stage budget"
+                )
+        if self.deadline.expired():
+            return DeadlineExceeded(
+                self.stage or stage,
+                self.deadline.seconds,
+                self.deadline.seconds,
+                self.completed,
+                "deadline",
+            )
+        return None
+
+
+def read_progress(doc_id: str) -> Optional[Dict]:
+    """Status and recorded stages of one document, without the payload."""
+    session = SessionLocal()
+    try:
+        row = session.execute(
+            text("""
+                SELECT
+                    status,
+                    last_modified_on,
+                    celery_task_token,
+                    extracted_data->'processed_modules_list' AS processed
+                FROM documents
+                WHERE id = :doc_id
+                """),
+            {"doc_id": doc_id},
+        ).fetchone()
+        if not row:
+            return None
+        processed = row.processed
+        if isinstance(processed, str):
+            processed = json.loads(processed)
+        return {
+            "status": row.status,
+            "last_modified_on": row.last_modified_on,
+            "celery_task_token": row.celery_task_token,
+            "processed": processed or [],
+        }
+    finally:
+        session.close()
+
+
+async def run_with_deadline(
+    work,
+    doc_id: str,
+    plan: Dict,
+    deadline: Deadline = None,
+    budgets: Dict[str, float] = None,
+    poll_seconds: float = POLL_SECONDS,
+):
+    """Await ``work`` for a document, cancelling it when a budget runs out.
+
+    Raises DeadlineExceeded (after the cancelled work has unwound, or
+    CANCEL_GRACE_SECONDS) naming the stage it was cut off in.
+    """
+    budgets = budgets or stage_budgets(plan)
+    deadline = deadline or deadline_for(budgets)
+    tracker = StageTracker(plan, budgets, deadline)
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {task}, timeout=max(0.01, deadline.within(poll_seconds))
+            )
+            if task in done:
+                return task.result()
+            progress = await asyncio.to_thread(read_progress, doc_id) or {}
+            exceeded = tracker.observe(
+                progress.get("status"), progress.get("processed")
+            )
+            if exceeded:
+                task.cancel()
+                await asyncio.wait({task}, timeout=CANCEL_GRACE_SECONDS)
+                raise exceeded
+    finally:
+        # Also covers our own caller being cancelled
+        if not task.done():
+            task.cancel()
+
+
+def record_cutoff(doc_id: str, exceeded: DeadlineExceeded) -> bool:
+    """Mark an in-flight document as error with the stage it was cut off in.
+
+    A document the pipeline already moved out of running is left alone.
+    """
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text("""
+                UPDATE documents
+                SET
+                    status = 'error',
+                    last_modified_on = NOW(),
+                    extracted_data = COALESCE(extracted_data, '{}'::jsonb)
+                        || jsonb_build_object('deadline_exceeded', CAST(:record AS jsonb))
+                WHERE id = :doc_id
+                AND status IN ('running', 'processing')
+                """),
+            {"doc_id": doc_id, "record": json.dumps(exceeded.record())},
+        )
+        session.commit()
+        recorded = bool(result.rowcount)
+        logger.add_log(
+            "warning",
+            "all",
+            f"PROCESSING_DEADLINE: Cut off document {doc_id} in {exceeded.stage} "
+            f"({exceeded}){'' if recorded else '; status already moved on'}",
+        )
+        return recorded
+    except Exception as e:
+        session.rollback()
+        logger.add_log("error", "all", f"PROCESSING_DEADLINE: record failed: {e}")
+        return False
+    finally:
+        session.close()
+
+
+def cancel_task(task_token: Optional[str]) -> bool:
+    """Revoke a document's Celery task so it stops holding a worker slot."""
+    if not task_token:
+        return False
+    try:
+        from celery_run import app as celery_app
+
+        celery_app.control.revoke(task_token, terminate=True)
+        return True
+    except Exception as e:
+        logger.add_log(
+            "warning", "all", f"PROCESSING_DEADLINE: revoke {task_token} failed: {e}"
+        )
+        return False
+
+
+def main():
+    print("=== Processing Deadline ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    if len(sys.argv) < 2:
+        print("Usage: python processing_deadline.py DOC_ID")
+        return {"error": "no document id"}
+
+    doc_id = sys.argv[1]
+    session = SessionLocal()
+    try:
+        row = session.execute(
+            text("SELECT extracted_data FROM documents WHERE id = :doc_id"),
+            {"doc_id": doc_id},
+        ).fetchone()
+    finally:
+        session.close()
+    if not row:
+        print(f"❌ {doc_id}: not found")
+        return {"error": "Document not found"}
+
+    plan = plan_resume(row.extracted_data)
+    budgets = stage_budgets(plan)
+    print(f"Deadline: {deadline_for(budgets).seconds:.0f}s")
+    if not budgets:
+        print("  No stage budgets: pipeline stages not configured")
+    for stage, budget in budgets.items():
+        print(f"  {stage}: {budget:.0f}s")
+    progress = read_progress(doc_id) or {}
+    print(f"Status: {progress.get('status')} | completed: {progress.get('processed')}")
+    return {"plan": plan, "budgets": budgets, "progress": progress}
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
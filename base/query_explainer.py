@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Query Explainer
+Dry-run planner for the ops toolkit: capture EXPLAIN (ANALYZE, BUFFERS) for
+every query a script would run and flag sequential scans on large tables.
+
+Any toolkit script accepts ``--explain``; see run_with_explain().
+"""
+
+import re
+import sys
+import os
+import asyncio
+import inspect
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+from session_override import override_sessions
+from logger import get_logger
+
+logger = get_logger()
+
+# Seq scans on tables with at least this many (estimated) rows are flagged
+LARGE_TABLE_ROWS = 100000
+
+WRITE_KEYWORDS = ("update", "delete", "insert")
+
+# WITH ... AS (DELETE/UPDATE/INSERT ...) modifies data as well
+_WRITE_CTE = re.compile(r"\(\s*(update|delete|insert)\b", re.IGNORECASE)
+
+# Collector of the run_with_explain() call in progress, if any
+_active_collector = None
+
+
+def explain_mode_active() -> bool:
+    """True while a script runs under --explain; skip side effects then."""
+    return _active_collector is not None
+
+
+def is_write_statement(sql: str) -> bool:
+    statement = sql.lstrip().lower()
+    if statement.startswith("with") and _WRITE_CTE.search(statement):
+        return True
+    return statement.startswith(WRITE_KEYWORDS)
+
+
+def _walk_plan(node: Dict, depth: int = 0) -> List[Dict]:
+    """Flatten an EXPLAIN (FORMAT JSON) plan tree into a list of nodes."""
+    loops = node.get("Actual Loops", 1) or 1
+    nodes = [
+        {
+            "depth": depth,
+            "node_type": node.get("Node Type"),
+            "relation": node.get("Relation Name"),
+            "index": node.get("Index Name"),
+            "estimated_rows": node.get("Plan Rows"),
+            "actual_rows": (
+                node["Actual Rows"] * loops if "Actual Rows" in node else None
+            ),
+            "shared_hit_blocks": node.get("Shared Hit Blocks", 0),
+            "shared_read_blocks": node.get("Shared Read Blocks", 0),
+            "actual_total_time_ms": node.get("Actual Total Time"),
+            "filter": node.get("Filter"),
+        }
+    ]
+    for child in node.get("Plans", []):
+        nodes.extend(_walk_plan(child, depth + 1))
+    return nodes
+
+
+def summarize_plan(explain_json, table_sizes: Dict[str, float] = None) -> Dict:
+    """Turn raw EXPLAIN JSON output into a compact report with warnings."""
+    table_sizes = table_sizes or {}
+    root = explain_json[0] if isinstance(explain_json, list) else explain_json
+    nodes = _walk_plan(root["Plan"])
+
+    warnings = []
+    for node in nodes:
+        relation = node["relation"]
+        if node["node_type"] == "Seq Scan" and relation:
+            size = table_sizes.get(relation, 0)
+            if size >= LARGE_TABLE_ROWS:
+                warnings.append(
+                    f"Seq Scan on large table {relation} (~{int(size)} rows)"
+                    + (f", filter: {node['filter']}" if node["filter"] else "")
+                )
+        estimated, actual = node["estimated_rows"], node["actual_rows"]
+        if estimated and actual is not None and actual > 0:
+            ratio = max(estimated, actual) / max(min(estimated, actual), 1)
+            if ratio >= 10:
+                warnings.append(
+                    f"{node['node_type']} row estimate off by {ratio:.0f}x "
+                    f"(estimated {estimated}, actual {actual})"
+                )
+
+    return {
+        "planning_time_ms": root.get("Planning Time"),
+        "execution_time_ms": root.get("Execution Time"),
+        "shared_hit_blocks": sum(n["shared_hit_blocks"] for n in nodes),
+        "shared_read_blocks": sum(n["shared_read_blocks"] for n in nodes),
+        "nodes": nodes,
+        "warnings": warnings,
+    }
+
+
+class ExplainCollector:
+    """Runs EXPLAIN for statements and keeps the reports in call order."""
+
+    def __init__(self, analyze: bool = True):
+        self.analyze = analyze
+        self.reports: List[Dict] = []
+        self._table_sizes: Dict[str, float] = {}
+
+    def _load_table_sizes(self, conn, relations: List[str]):
+        missing = [r for r in relations if r not in self._table_sizes]
+        if not missing:
+            return
+        result = conn.execute(
+            text(
+                "SELECT relname, reltuples FROM pg_class "
+                "WHERE relkind = 'r' AND relname = ANY(:names)"
+            ),
+            {"names": missing},
+        )
+        for row in result:
+            self._table_sizes[row.relname] = row.reltuples
+        for relation in missing:
+            self._table_sizes.setdefault(relation, 0)
+
+    def explain(
+        self,
+        bind,
+        sql: str,
+        params: Dict = None,
+        label: str = None,
+        bindparams: List = None,
+    ) -> Dict:
+        """EXPLAIN one statement on its own connection and always roll back.
+
+        ANALYZE really executes the statement, so writes are only ever
+        explained inside a transaction that is discarded. ``bindparams``
+        carries over typed/expanding parameters of the original text().
+        """
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if self.analyze else "FORMAT JSON"
+        report = {
+            "label": label,
+            "query": " ".join(sql.split()),
+            "write": is_write_statement(sql),
+        }
+
+        conn = bind.connect()
+        trans = conn.begin()
+        try:
+            statement = text(f"EXPLAIN ({options}) {sql}")
+            if bindparams:
+                statement = statement.bindparams(*bindparams)
+            raw = conn.execute(statement, params or {}).scalar()
+            root = raw[0] if isinstance(raw, list) else raw
+            relations = sorted(
+                {n["relation"] for n in _walk_plan(root["Plan"]) if n["relation"]}
+            )
+            self._load_table_sizes(conn, relations)
+            report.update(summarize_plan(raw, self._table_sizes))
+        except Exception as e:
+            report["error"] = str(e)
+            logger.add_log("warning", "all", f"EXPLAIN failed for {label}: {str(e)}")
+        finally:
+            trans.rollback()
+            conn.close()
+
+        self.reports.append(report)
+        return report
+
+    def print_report(self):
+        print("\n=== EXPLAIN Report ===")
+        print(f"Timestamp: {datetime.now().isoformat()}")
+        print(f"Queries captured: {len(self.reports)}")
+        for index, report in enumerate(self.reports, 1):
+            print()
+            print(
+                f"[{index}] {report['label']}{' (write, dry-run)' if report['write'] else ''}"
+            )
+            print(f"  SQL: {report['query'][:160]}")
+            if "error" in report:
+                print(f"  Error: {report['error']}")
+                continue
+            print(
+                f"  Planning: {report['planning_time_ms']} ms | "
+                f"Execution: {report['execution_time_ms']} ms | "
+                f"Buffers hit/read: {report['shared_hit_blocks']}/{report['shared_read_blocks']}"
+            )
+            for node in report["nodes"]:
+                target = node["relation"] or ""
+                if node["index"]:
+                    target += f" using {node['index']}"
+                print(
+                    f"  {'  ' * node['depth']}-> {node['node_type']} {target} "
+                    f"(est {node['estimated_rows']}, actual {node['actual_rows']})"
+                )
+            for warning in report["warnings"]:
+                print(f"  ⚠️  {warning}")
+
+        flagged = sum(1 for r in self.reports if r.get("warnings"))
+        print(f"\nQueries with warnings: {flagged}/{len(self.reports)}")
+
+
+class _DryRunResult:
+    """Empty stand-in for the result of a write skipped in explain mode."""
+
+    rowcount = 0
+
+    def __iter__(self):
+        return iter([])
+
+    def fetchone(self):
+        return None
+
+    def first(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def scalar(self):
+        return None
+
+
+class ExplainingSession:
+    """Session proxy that EXPLAINs each raw SQL statement before running it.
+
+    Reads still execute so the calling script can carry on; writes are
+    explained in a rolled-back transaction and otherwise skipped.
+    """
+
+    def __init__(self, session, collector: ExplainCollector):
+        self._session = session
+        self._collector = collector
+
+    def execute(self, statement, params=None, *args, **kwargs):
+        if isinstance(statement, TextClause):
+            sql = statement.text
+            label = sys._getframe(1).f_code.co_name
+            self._collector.explain(
+                self._session.get_bind(),
+                sql,
+                params,
+                label,
+                bindparams=list(statement._bindparams.values()),
+            )
+            if is_write_statement(sql):
+                return _DryRunResult()
+        return self._session.execute(statement, params, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def run_with_explain(entry_point: Callable, analyze: bool = True):
+    """Run a toolkit entry point with every SessionLocal() explained.
+
+    Sessions are swapped via override_sessions(); the report is printed
+    once the entry point returns.
+    """
+    global _active_collector
+    import database.database as database_module
+
+    collector = ExplainCollector(analyze=analyze)
+    original = database_module.SessionLocal
+
+    def explaining_session_factory(*args, **kwargs):
+        return ExplainingSession(original(*args, **kwargs), collector)
+
+    _active_collector = collector
+    try:
+        with override_sessions(explaining_session_factory):
+            result = entry_point()
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+    finally:
+        _active_collector = None
+        collector.print_report()
+
+    return result
+
+
+def main_with_explain_flag(entry_point: Callable):
+    """Standard ``__main__`` dispatch for toolkit scripts.
+
+    ``--explain`` runs the entry point under run_with_explain(); add
+    ``--no-analyze`` to only plan (no statement is executed by EXPLAIN).
+    """
+    if "--explain" not in sys.argv:
+        result = entry_point()
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        return result
+
+    analyze = "--no-analyze" not in sys.argv
+    for flag in ("--explain", "--no-analyze"):
+        while flag in sys.argv:
+            sys.argv.remove(flag)
+    return run_with_explain(entry_point, analyze=analyze)
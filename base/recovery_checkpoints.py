@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Recovery Checkpoints
+Work out where a recovery can resume the processing pipeline from the
+stages recorded in extracted_data.processed_modules_list, instead of always
+re-running it from checkpoint 0, and estimate the compute that saves.
+
+The checkpoint is handed to process_document_async, so resuming is only
+done once the pipeline's stages are configured (RECOVERY_PIPELINE_STAGES,
+or RECOVERY_STAGE_CHECKPOINTS for explicit checkpoint numbers). Until then
+every plan is a full re-run from checkpoint 0.
+
+Usage:
+    python recovery_checkpoints.py DOC_ID [DOC_ID ...]   # plan per document
+    python recovery_checkpoints.py --summary [--status S] [--limit N]
+"""
+
+import sys
+import os
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import SessionLocal
+from logger import get_logger
+
+logger = get_logger()
+
+# Stage names used for estimates only, while the real ones are not configured
+DEFAULT_PIPELINE_STAGES = ("ocr", "classification", "extraction", "validation")
+
+
+def _parse_stage_checkpoints(value: str) -> Dict[str, int]:
+    """``ocr=0,classification=1,...`` as {stage: checkpoint}."""
+    checkpoints = {}
+    for item in value.split(","):
+        stage, sep, number = item.partition("=")
+        if stage.strip() and sep:
+            checkpoints[stage.strip()] = int(number)
+    return checkpoints
+
+
+# Checkpoint number process_document_async resumes each stage at, e.g.
+# RECOVERY_STAGE_CHECKPOINTS=ocr=0,classification=1,extraction=2,validation=3
+STAGE_CHECKPOINTS = _parse_stage_checkpoints(
+    os.getenv("RECOVERY_STAGE_CHECKPOINTS", "")
+)
+
+# Pipeline order, as named in processed_modules_list. With only
+# RECOVERY_PIPELINE_STAGES=ocr,classification,... set, checkpoint N resumes
+# at its Nth stage
+_CONFIGURED_STAGES = tuple(
+    stage.strip()
+    for stage in os.getenv("RECOVERY_PIPELINE_STAGES", "").split(",")
+    if stage.strip()
+)
+PIPELINE_STAGES = (
+    _CONFIGURED_STAGES
+    or tuple(sorted(STAGE_CHECKPOINTS, key=STAGE_CHECKPOINTS.get))
+    or DEFAULT_PIPELINE_STAGES
+)
+STAGES_CONFIGURED = bool(_CONFIGURED_STAGES or STAGE_CHECKPOINTS)
+
+_logged_resume_disabled = False
+
+# Keys a completed stage must have left in extracted_data for later stages
+# to build on; a stage without them is re-run
+REQUIRED_OUTPUTS = {
+    "classification": ("doc_type",),
+}
+
+# Relative cost per stage when the document has no usable time_logs
+DEFAULT_STAGE_SECONDS = {
+    "ocr": 20.0,
+    "classification": 3.0,
+    "extraction": 12.0,
+    "validation": 3.0,
+}
+
+# Only the parts of extracted_data the planner reads, so a summary over
+# many documents does not pull the full payloads
+SLIM_EXTRACTED_DATA = """
+jsonb_build_object(
+    'processed_modules_list', extracted_data->'processed_modules_list',
+    'time_logs', extracted_data->'time_logs',
+    'doc_type', extracted_data->'doc_type'
+)
+"""
+
+
+def _stage_seconds(time_logs) -> Dict[str, float]:
+    """Measured seconds per stage from time_logs, where they can be read.
+
+    Accepts a list of {"module"/"name"/"stage": ..., "seconds"/"duration": ...}
+    entries or a {stage: seconds} mapping; anything else is ignored.
+    """
+    seconds: Dict[str, float] = {}
+    if isinstance(time_logs, dict):
+        entries = [{"module": k, "seconds": v} for k, v in time_logs.items()]
+    elif isinstance(time_logs, list):
+        entries = time_logs
+    else:
+        return seconds
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        stage = entry.get("module") or entry.get("name") or entry.get("stage")
+        duration = entry.get("seconds", entry.get("duration"))
+        try:
+            seconds[stage] = seconds.get(stage, 0.0) + float(duration)
+        except (TypeError, ValueError):
+            continue
+    return seconds
+
+
+def completed_stages(
+    extracted_data: Optional[Dict], stages: Sequence[str] = PIPELINE_STAGES
+) -> List[str]:
+    """Leading pipeline stages that finished and left their outputs behind.
+
+    Only a contiguous prefix counts: a later stage recorded after a missing
+    one cannot be trusted, since it ran on inputs we would now regenerate.
+    """
+    if not isinstance(extracted_data, dict):
+        return []
+    processed = set(extracted_data.get("processed_modules_list") or [])
+
+    done = []
+    for stage in stages:
+        if stage not in processed:
+            break
+        if any(not extracted_data.get(key) for key in REQUIRED_OUTPUTS.get(stage, ())):
+            break
+        done.append(stage)
+    return done
+
+
+def _resume_disabled():
+    global _logged_resume_disabled
+    if not _logged_resume_disabled:
+        _logged_resume_disabled = True
+        logger.add_log(
+            "warning",
+            "all",
+            "RECOVERY_CHECKPOINTS: resume disabled, pipeline stages not configured "
+            "(set RECOVERY_PIPELINE_STAGES or RECOVERY_STAGE_CHECKPOINTS); "
+            "recoveries re-run from checkpoint 0",
+        )
+
+
+def plan_resume(
+    extracted_data: Optional[Dict],
+    stages: Sequence[str] = PIPELINE_STAGES,
+    force_full: bool = False,
+    stages_configured: bool = None,
+) -> Dict:
+    """Checkpoint to resume from and the work that skips.
+
+    A fully processed document still re-runs its last stage, so recovery
+    always ends with the pipeline setting the final status. Without
+    configured stages the plan is always a full re-run.
+    """
+    if stages_configured is None:
+        stages_configured = STAGES_CONFIGURED
+    if not stages_configured and not force_full:
+        _resume_disabled()
+    resume = stages_configured and not force_full
+    done = completed_stages(extracted_data, stages) if resume else []
+    index = min(len(done), len(stages) - 1)
+
+    measured = _stage_seconds(
+        extracted_data.get("time_logs") if isinstance(extracted_data, dict) else None
+    )
+    cost = {
+        stage: measured.get(stage, DEFAULT_STAGE_SECONDS.get(stage, 1.0))
+        for stage in stages
+    }
+    skipped = list(stages[:index])
+    skipped_seconds = sum(cost[stage] for stage in skipped)
+    total_seconds = sum(cost.values())
+
+    if force_full:
+        reason = "full re-run requested"
+    elif not stages_configured:
+        reason = "resume disabled: pipeline stages not configured"
+    elif not done:
+        reason = "no completed stages recorded"
+    elif len(done) == len(stages):
+        reason = "all stages recorded; re-running the last one"
+    else:
+        reason = f"stages completed through {done[-1]}"
+
+    return {
+        "checkpoint": STAGE_CHECKPOINTS.get(stages[index], index),
+        "resume_stage": stages[index],
+        "skipped_stages": skipped,
+        "rerun_stages": list(stages[index:]),
+        "estimated_skipped_seconds": round(skipped_seconds, 1),
+        "skipped_fraction": (
+            round(skipped_seconds / total_seconds, 3) if total_seconds else 0
+        ),
+        "stage_seconds": {stage: round(cost[stage], 1) for stage in stages},
+        "cost_source": "time_logs" if measured else "defaults",
+        "stages_configured": stages_configured,
+        "reason": reason,
+    }
+
+
+def fetch_extracted_data(document_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text(f"""
+                SELECT id, {SLIM_EXTRACTED_DATA} AS extracted_data
+                FROM documents
+                WHERE id = ANY(CAST(:ids AS uuid[]))
+                """),
+            {"ids": list(document_ids)},
+        )
+        return {str(row.id): row.extracted_data for row in result}
+    finally:
+        session.close()
+
+
+def summarize_recovery_savings(status: str = "error", limit: int = 10000) -> Dict:
+    """Resume plans for the most recent documents in ``status``, aggregated."""
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text(f"""
+                SELECT {SLIM_EXTRACTED_DATA} AS extracted_data
+                FROM documents
+                WHERE status = :status
+                AND is_deleted = false
+                ORDER BY last_modified_on DESC
+                LIMIT :limit
+                """),
+            {"status": status, "limit": limit},
+        )
+        checkpoints = Counter()
+        skipped_seconds = 0.0
+        fractions = []
+        for row in result:
+            plan = plan_resume(row.extracted_data)
+            checkpoints[plan["resume_stage"]] += 1
+            skipped_seconds += plan["estimated_skipped_seconds"]
+            fractions.append(plan["skipped_fraction"])
+
+        return {
+            "status": status,
+            "documents": len(fractions),
+            "resume_stage_distribution": dict(checkpoints),
+            "estimated_skipped_hours": round(skipped_seconds / 3600, 2),
+            "mean_skipped_fraction": (
+                round(sum(fractions) / len(fractions), 3) if fractions else 0
+            ),
+            "timestamp": datetime.now().isoformat(),
+        }
+    except Exception as e:
+        logger.add_log("error", "all", f"RECOVERY_CHECKPOINTS: summary failed: {e}")
+        return {"error": str(e)}
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery checkpoint planner")
+    parser.add_argument("document_ids", nargs="*")
+    parser.add_argument("--summary", action="store_true")
+    parser.add_argument("--status", default="error")
+    parser.add_argument("--limit", type=int, default=10000)
+    args = parser.parse_args()
+
+    print("=== Recovery Checkpoints ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print(f"Pipeline: {' → '.join(PIPELINE_STAGES)}")
+    if not STAGES_CONFIGURED:
+        print(
+            "⚠️  Stages not configured (RECOVERY_PIPELINE_STAGES); "
+            "every recovery re-runs from checkpoint 0"
+        )
+    print()
+
+    if args.summary or not args.document_ids:
+        summary = summarize_recovery_savings(args.status, args.limit)
+        if "error" in summary:
+            print(f"❌ {summary['error']}")
+            return summary
+        print(f"{summary['documents']} '{args.status}' documents")
+        for stage, count in summary["resume_stage_distribution"].items():
+            print(f"  resume at {stage}: {count}")
+        print(
+            f"Estimated compute skipped: {summary['estimated_skipped_hours']} h "
+            f"({summary['mean_skipped_fraction']:.0%} of a full run on average)"
+        )
+        return summary
+
+    extracted = fetch_extracted_data(args.document_ids)
+    plans = {}
+    for doc_id in args.document_ids:
+        if doc_id not in extracted:
+            print(f"{doc_id}: not found")
+            continue
+        plan = plans[doc_id] = plan_resume(extracted[doc_id])
+        print(
+            f"{doc_id}: checkpoint {plan['checkpoint']} ({plan['resume_stage']}) - "
+            f"{plan['reason']}; skips {plan['skipped_fraction']:.0%} "
+            f"(~{plan['estimated_skipped_seconds']}s, {plan['cost_source']})"
+        )
+    return plans
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Recovery Guard
+Circuit breakers and adaptive (AIMD) concurrency for the restart and
+recovery paths, so mass recovery runs as fast as downstream dependencies
+allow and stops feeding documents into a dependency that is failing.
+
+- One breaker per doc_source: a source whose documents keep failing is
+  paused while the others continue.
+- One breaker per error signature (message with ids/numbers stripped): a
+  dominant error such as an unreachable OCR service pauses everything.
+- AIMDLimiter: +1 concurrency per window of completions, halved when
+  latency rises well above the observed baseline. Individual failures are
+  left to the breakers; a bad document is not a sign of congestion.
+"""
+
+import sys
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ops_logging import get_logger, message_signature
+
+logger = get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Signature breakers kept at most; the least recently seen is dropped
+MAX_SIGNATURES = 50
+
+
+def error_signature(error) -> str:
+    """Group equivalent errors: ids, addresses and numbers are masked."""
+    return message_signature(str(error or "unknown error"))
+
+
+class CircuitBreaker:
+    """Failure-ratio breaker over the last ``window`` outcomes.
+
+    Opens when at least ``min_calls`` outcomes are recorded and the failure
+    share reaches ``failure_ratio``; after ``cooldown`` seconds a single
+    probe is let through (half-open) and its outcome closes or re-opens it.
+    Not thread-safe on its own; RecoveryGuard serialises access.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, failed: bool):
+        if self.opened_at is not None:
+            if self.state == HALF_OPEN and self.probe_in_flight:
+                self.probe_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self.opened_at = None
+                    self.outcomes.clear()
+                    logger.add_log(
+                        "info", "all", f"RECOVERY_GUARD: breaker {self.name} closed"
+                    )
+            return
+
+        self.outcomes.append(failed)
+        failures = sum(self.outcomes)
+        if (
+            len(self.outcomes) >= self.min_calls
+            and failures / len(self.outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def _open(self):
+        self.opened_at = self.clock()
+        self.times_opened += 1
+        logger.add_log(
+            "warning",
+            "all",
+            f"RECOVERY_GUARD: breaker {self.name} opened for {self.cooldown}s",
+        )
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase, multiplicative decrease.
+
+    ``acquire()`` blocks while ``limit`` calls are in flight. Each completion
+    within ``latency_tolerance`` x the best smoothed latency seen adds
+    1/limit (so +1 per full window); a slower one multiplies the limit by
+    ``decrease_factor``, at most once per smoothed latency so a burst of
+    slow completions counts as one congestion signal.
+    """
+
+    def __init__(
+        self,
+        initial: float = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.clock = clock
+        self.in_flight = 0
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self.peak_limit = self.limit
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float):
+        with self._condition:
+            self.in_flight -= 1
+            self._update(latency)
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Give back a slot that was acquired but never used."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _update(self, latency: float):
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency
+        if self.baseline_latency is None:
+            self.baseline_latency = self.smoothed_latency
+        self.baseline_latency = min(self.baseline_latency, self.smoothed_latency)
+
+        if latency > self.baseline_latency * self.latency_tolerance:
+            now = self.clock()
+            if now - self._last_decrease >= self.smoothed_latency:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+
+class RecoveryGuard:
+    """Breakers per source and per error signature plus an AIMD limiter."""
+
+    def __init__(
+        self,
+        limiter: AIMDLimiter = None,
+        source_breaker_options: Dict = None,
+        signature_breaker_options: Dict = None,
+    ):
+        self.limiter = limiter or AIMDLimiter()
+        self.source_breaker_options = dict(
+            {"failure_ratio": 0.5, "min_calls": 10, "window": 20, "cooldown": 30.0},
+            **(source_breaker_options or {}),
+        )
+        # A signature must dominate a larger sample before pausing everything
+        self.signature_breaker_options = dict(
+            {"failure_ratio": 0.5, "min_calls": 20, "window": 40, "cooldown": 60.0},
+            **(signature_breaker_options or {}),
+        )
+        self.source_breakers: Dict[str, CircuitBreaker] = {}
+        self.signature_breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, source: Optional[str]) -> Optional[str]:
+        """None if a document from ``source`` may be processed, else the reason."""
+        with self._lock:
+            probes = []
+            reason = None
+            for signature, breaker in self.signature_breakers.items():
+                if breaker.state == CLOSED:
+                    continue
+                if not breaker.allow():
+                    reason = f"circuit open for error: {signature}"
+                    break
+                probes.append(breaker)
+            if reason is None:
+                breaker = self._source_breaker(source)
+                if breaker.allow():
+                    return None
+                reason = f"circuit open for doc_source {source or 'unknown'}"
+            # Blocked after all: hand back the probes granted on the way
+            for breaker in probes:
+                breaker.probe_in_flight = False
+            return reason
+
+    def record(self, source: Optional[str], ok: bool, error=None):
+        with self._lock:
+            self._source_breaker(source).record(not ok)
+
+            signature = None if ok else error_signature(error)
+            if signature is not None and signature not in self.signature_breakers:
+                self.signature_breakers[signature] = CircuitBreaker(
+                    f"error:{signature}", **self.signature_breaker_options
+                )
+                while len(self.signature_breakers) > MAX_SIGNATURES:
+                    self.signature_breakers.popitem(last=False)
+            if signature is not None:
+                self.signature_breakers.move_to_end(signature)
+            for breaker_signature, breaker in self.signature_breakers.items():
+                breaker.record(breaker_signature == signature)
+
+    def _source_breaker(self, source: Optional[str]) -> CircuitBreaker:
+        key = source or "unknown"
+        if key not in self.source_breakers:
+            self.source_breakers[key] = CircuitBreaker(
+                f"source:{key}", **self.source_breaker_options
+            )
+        return self.source_breakers[key]
+
+    def run(
+        self,
+        items: Iterable,
+        work: Callable,
+        source_of: Callable = lambda item: item.get("doc_source"),
+    ) -> List[Dict]:
+        """Call ``work(item)`` concurrently within the limiter and breakers.
+
+        ``work`` returns a dict with ``success`` (and ``error``) or raises.
+        Every item gets an outcome with ``status`` succeeded / failed /
+        exception / skipped, in the order the items were given.
+        """
+        items = list(items)
+        outcomes: List[Optional[Dict]] = [None] * len(items)
+
+        def call(index, item, source):
+            started = time.perf_counter()
+            outcome = {"item": item}
+            try:
+                result = work(item) or {}
+                ok = bool(result.get("success"))
+                outcome.update(
+                    status="succeeded" if ok else "failed",
+                    error=None if ok else result.get("error", "Unknown error"),
+                    result=result,
+                )
+            except Exception as e:
+                ok = False
+                outcome.update(status="exception", error=str(e))
+            latency = time.perf_counter() - started
+            outcome["latency"] = latency
+            try:
+                self.record(source, ok, outcome.get("error"))
+            except Exception as e:
+                logger.add_log("warning", "all", f"RECOVERY_GUARD: record failed: {e}")
+            finally:
+                outcomes[index] = outcome
+                self.limiter.release(latency)
+
+        with ThreadPoolExecutor(max_workers=self.limiter.max_limit) as pool:
+            for index, item in enumerate(items):
+                self.limiter.acquire()
+                source = source_of(item)
+                reason = self.allow(source)
+                if reason:
+                    self.limiter.cancel()
+                    outcomes[index] = {
+                        "item": item,
+                        "status": "skipped",
+                        "error": reason,
+                    }
+                    continue
+                pool.submit(call, index, item, source)
+        # Anything that died without an outcome is reported, not left as None
+        return [
+            outcome or {"item": item, "status": "exception", "error": "no outcome"}
+            for item, outcome in zip(items, outcomes)
+        ]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.limiter.limit, 2),
+                "peak_concurrency_limit": round(self.limiter.peak_limit, 2),
+                "baseline_latency": self.limiter.baseline_latency,
+                "open_sources": [
+                    name
+                    for name, breaker in self.source_breakers.items()
+                    if breaker.state != CLOSED
+                ],
+                "open_signatures": [
+                    signature
+                    for signature, breaker in self.signature_breakers.items()
+                    if breaker.state != CLOSED
+                ],
+            }
+
+
+_default_guard = None
+
+
+def default_guard(reset: bool = False) -> RecoveryGuard:
+    """Process-wide guard, so breaker state carries across batches.
+
+    Documents are processed one at a time unless RECOVERY_MAX_CONCURRENCY
+    is raised, which is only safe with a processor known to be thread-safe.
+    """
+    global _default_guard
+    if _default_guard is None or reset:
+        max_limit = int(os.getenv("RECOVERY_MAX_CONCURRENCY", 1))
+        _default_guard = RecoveryGuard(
+            AIMDLimiter(
+                initial=min(
+                    float(os.getenv("RECOVERY_INITIAL_CONCURRENCY", 1)), max_limit
+                ),
+                min_limit=int(os.getenv("RECOVERY_MIN_CONCURRENCY", 1)),
+                max_limit=max_limit,
+            )
+        )
+    return _default_guard
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Fair Restart Scheduler
+Deficit round-robin selection of RESTARTED documents across orgs, so one
+tenant's bulk upload cannot starve everyone else.
+"""
+
+import sys
+import os
+import random
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Lower number = served first within an org's queue
+DEFAULT_SOURCE_PRIORITY = {}
+
+
+class FairRestartScheduler:
+    """Deficit round-robin over per-org queues of restart candidates.
+
+    Each org gets ``quantum * weight`` credits per round and every document
+    costs one credit, so with equal weights the orgs are served alternately
+    regardless of how many documents each one has waiting. Within an org,
+    documents are ordered by ``doc_source`` priority and then by age.
+    """
+
+    def __init__(
+        self,
+        weights: Dict[str, float] = None,
+        default_weight: float = 1.0,
+        quantum: float = 1.0,
+        source_priority: Dict[str, int] = None,
+    ):
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.quantum = quantum
+        self.source_priority = (
+            DEFAULT_SOURCE_PRIORITY if source_priority is None else source_priority
+        )
+        self.queues: "OrderedDict[str, deque]" = OrderedDict()
+        self.deficits: Dict[str, float] = {}
+
+    def _sort_key(self, doc: Dict):
+        priority = self.source_priority.get(
+            doc.get("doc_source"), len(self.source_priority)
+        )
+        last_modified = doc.get("last_modified_on")
+        return (priority, last_modified is None, last_modified)
+
+    @staticmethod
+    def _group(documents: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        grouped: Dict[str, List[Dict]] = {}
+        for doc in documents:
+            grouped.setdefault(str(doc.get("org_id")), []).append(doc)
+        return grouped
+
+    def add_documents(self, documents: Iterable[Dict]):
+        """Queue candidate rows (dicts with at least ``org_id``)."""
+        for org_id, docs in self._group(documents).items():
+            queue = self.queues.setdefault(org_id, deque())
+            self.deficits.setdefault(org_id, 0.0)
+            merged = sorted(list(queue) + docs, key=self._sort_key)
+            queue.clear()
+            queue.extend(merged)
+
+    def replace_documents(self, documents: Iterable[Dict]):
+        """Swap in a freshly fetched candidate set.
+
+        Orgs still waiting keep their deficit and their place in the
+        rotation, so fairness carries over from one batch to the next.
+        """
+        grouped = self._group(documents)
+        queues: "OrderedDict[str, deque]" = OrderedDict()
+        for org_id in list(self.queues.keys()) + list(grouped.keys()):
+            if org_id in grouped and org_id not in queues:
+                queues[org_id] = deque(sorted(grouped[org_id], key=self._sort_key))
+        self.deficits = {org_id: self.deficits.get(org_id, 0.0) for org_id in queues}
+        self.queues = queues
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def next_batch(self, batch_size: int) -> List[Dict]:
+        """Pop up to ``batch_size`` documents in fair order."""
+        batch = []
+        while len(batch) < batch_size and self.queues:
+            if all(
+                self.quantum * self.weights.get(org_id, self.default_weight) <= 0
+                and self.deficits[org_id] < 1
+                for org_id in self.queues
+            ):
+                # No waiting org can ever earn a credit (weights ≤ 0)
+                break
+            for org_id in list(self.queues.keys()):
+                queue = self.queues[org_id]
+                self.deficits[org_id] += self.quantum * self.weights.get(
+                    org_id, self.default_weight
+                )
+                while queue and self.deficits[org_id] >= 1 and len(batch) < batch_size:
+                    batch.append(queue.popleft())
+                    self.deficits[org_id] -= 1
+
+                if not queue:
+                    # Idle orgs do not bank credit (standard DRR)
+                    del self.queues[org_id]
+                    self.deficits[org_id] = 0.0
+                if len(batch) >= batch_size:
+                    # Rotate so the next batch resumes after this org
+                    for served_org in list(self.queues.keys()):
+                        self.queues.move_to_end(served_org)
+                        if served_org == org_id:
+                            break
+                    break
+        return batch
+
+
+def fetch_restart_candidates(
+    per_org_limit: int = 10, total_limit: int = 500
+) -> List[Dict]:
+    """Fetch the oldest RESTARTED documents per org.
+
+    Uses a window function so a single org with thousands of RESTARTED
+    documents contributes at most ``per_org_limit`` candidates.
+    """
+    from sqlalchemy import text
+    from database.database import SessionLocal
+
+    query = """
+        SELECT
+            id,
+            status,
+            filename,
+            org_id,
+            doc_source,
+            created_by,
+            celery_task_token,
+            created_on,
+            last_modified_on
+        FROM (
+            SELECT
+                d.*,
+                ROW_NUMBER() OVER (
+                    PARTITION BY d.org_id ORDER BY d.last_modified_on ASC
+                ) AS org_rank
+            FROM documents d
+            WHERE
+                (d.status = 'restarted' OR d.status = 'RESTARTED')
+                AND d.is_deleted = false
+        ) ranked
+        WHERE org_rank <= :per_org_limit
+        ORDER BY last_modified_on ASC
+        LIMIT :total_limit
+    """
+
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text(query), {"per_org_limit": per_org_limit, "total_limit": total_limit}
+        )
+        return [dict(row._mapping) for row in result]
+    finally:
+        session.close()
+
+
+_scheduler: FairRestartScheduler = None
+
+
+def shared_scheduler(
+    weights: Dict[str, float] = None, source_priority: Dict[str, int] = None
+) -> FairRestartScheduler:
+    """The process-wide scheduler, kept for the whole run."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairRestartScheduler(
+            weights=weights, source_priority=source_priority
+        )
+    else:
+        if weights is not None:
+            _scheduler.weights = weights
+        if source_priority is not None:
+            _scheduler.source_priority = source_priority
+    return _scheduler
+
+
+def select_fair_restart_batch(
+    batch_size: int = 10,
+    weights: Dict[str, float] = None,
+    source_priority: Dict[str, int] = None,
+    per_org_limit: int = None,
+    scheduler: FairRestartScheduler = None,
+) -> List[Dict]:
+    """Pick the next restart batch fairly across orgs.
+
+    Intended for both the manual restart path and the periodic trigger task.
+    Successive calls share one scheduler, so deficits carry over between
+    batches instead of every batch starting the rotation afresh.
+    """
+    candidates = fetch_restart_candidates(per_org_limit=per_org_limit or batch_size)
+    scheduler = scheduler or shared_scheduler(weights, source_priority)
+    scheduler.replace_documents(candidates)
+    return scheduler.next_batch(batch_size)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def simulate(
+    org_arrivals: Dict[str, int] = None,
+    batch_size: int = 10,
+    ticks: int = 400,
+    seed: int = 42,
+    policy: str = "drr",
+    weights: Dict[str, float] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Simulate restart scheduling under skewed load.
+
+    Each tick every org enqueues on average ``org_arrivals[org]`` documents
+    and the scheduler drains ``batch_size`` of them. Returns per-org wait
+    time percentiles (in ticks) for the chosen ``policy`` ("fifo" or "drr").
+    """
+    org_arrivals = org_arrivals or {"bulk-org": 30, "org-a": 2, "org-b": 2, "org-c": 1}
+    rng = random.Random(seed)
+    waits: Dict[str, List[float]] = {org: [] for org in org_arrivals}
+    fifo: deque = deque()
+    scheduler = FairRestartScheduler(weights=weights)
+
+    for tick in range(ticks):
+        arrivals = []
+        for org_id, rate in org_arrivals.items():
+            # Bursty arrivals: the mean is ``rate`` per tick
+            for _ in range(rng.randint(0, 2 * rate)):
+                arrivals.append({"org_id": org_id, "last_modified_on": tick})
+        rng.shuffle(arrivals)
+
+        if policy == "fifo":
+            fifo.extend(arrivals)
+            served = [fifo.popleft() for _ in range(min(batch_size, len(fifo)))]
+        else:
+            scheduler.add_documents(arrivals)
+            served = scheduler.next_batch(batch_size)
+
+        for doc in served:
+            waits[doc["org_id"]].append(tick - doc["last_modified_on"])
+
+    return {
+        org_id: {
+            "served": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+        for org_id, values in waits.items()
+    }
+
+
+def main():
+    print("=== Restart Scheduling Simulation (skewed load) ===")
+    print(
+        "Wait time in scheduler ticks; bulk-org submits ~30 docs/tick, capacity 10/tick"
+    )
+    print()
+
+    for policy in ("fifo", "drr"):
+        print(f"Policy: {policy}")
+        results = simulate(policy=policy)
+        for org_id, stats in results.items():
+            print(
+                f"  {org_id:10s} served: {stats['served']:5d} | "
+                f"p50: {stats['p50']:6.1f} | p95: {stats['p95']:6.1f} | "
+                f"p99: {stats['p99']:6.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
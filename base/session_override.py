@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Session Override
+Point the ops scripts at a different session factory / engine for the
+duration of a block (explain mode, benchmarks, offline harness).
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from typing import Callable
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@contextmanager
+def override_sessions(session_factory: Callable, engine=None):
+    """Replace ``SessionLocal`` (and optionally ``engine``) everywhere.
+
+    The scripts bind ``SessionLocal`` with ``from database.database import
+    SessionLocal`` at import time, so besides the database module itself
+    every loaded module still holding the original object is patched too.
+    Modules imported inside the block pick up the replacement from the
+    database module.
+    """
+    import database.database as database_module
+
+    replacements = {"SessionLocal": session_factory}
+    if engine is not None:
+        replacements["engine"] = engine
+
+    patched = []
+    for name, replacement in replacements.items():
+        original = getattr(database_module, name)
+        for module in list(sys.modules.values()):
+            if getattr(module, name, None) is original:
+                setattr(module, name, replacement)
+                patched.append((module, name, original))
+
+    try:
+        yield session_factory
+    finally:
+        for module, name, original in patched:
+            setattr(module, name, original)
+
+
+@contextmanager
+def use_database(database_url: str, **engine_kwargs):
+    """Run the toolkit against ``database_url`` instead of the app database."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(database_url, **engine_kwargs)
+    session_factory = sessionmaker(bind=engine)
+    try:
+        with override_sessions(session_factory, engine=engine):
+            yield engine
+    finally:
+        engine.dispose()
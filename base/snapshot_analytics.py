@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Snapshot Analytics
+The distributions DocumentMonitor and celery_diagnostic build with Counters
+over per-row dicts (status, error doc_type / doc_source, in-flight age
+buckets, per-org error rates), computed over columns instead: a snapshot
+from document_snapshot.py (memory-mapped, nothing copied) or documents
+streamed from a server-side cursor into the same columnar layout.
+
+Reductions are bincounts over the dictionary codes with NumPy when it is
+installed; a pure-Python path over the same arrays gives identical
+numbers without it.
+
+Usage:
+    python snapshot_analytics.py FILE                 # analyse a snapshot
+    python snapshot_analytics.py --live [--status S ...] [--org ORG_ID] [--hours N]
+    python snapshot_analytics.py --benchmark N        # vs. the dict/Counter path
+"""
+
+import sys
+import os
+import time
+import uuid
+import random
+import argparse
+import tempfile
+from array import array
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional speed-up
+    np = None
+
+from document_snapshot import (
+    CATEGORY_COLUMNS,
+    FETCH_CHUNK_SIZE,
+    NULL_TIME,
+    PackedWriter,
+    TIME_COLUMNS,
+    _micros,
+    load_snapshot,
+    records,
+    stream_documents,
+)
+from pipeline_api import AGE_BUCKET_EDGES, IN_FLIGHT_STATUSES
+from logger import get_logger
+
+logger = get_logger()
+
+AGE_LABELS = [f"<{edge}m" for edge in AGE_BUCKET_EDGES] + [f">={AGE_BUCKET_EDGES[-1]}m"]
+_MINUTE_US = 60 * 1000000
+
+
+class CursorColumns:
+    """Documents streamed from the database into snapshot-shaped columns.
+
+    Offers the category() / timestamps() accessors of a loaded snapshot,
+    so the analyses run unchanged on live data.
+    """
+
+    format = "cursor"
+
+    def __init__(self):
+        self.rows = 0
+        self.metadata = {"exported_at": datetime.now().isoformat()}
+        self._codes = {name: array("I") for name in CATEGORY_COLUMNS}
+        self._dictionaries: Dict[str, Dict] = {name: {} for name in CATEGORY_COLUMNS}
+        self._times = {name: array("q") for name in TIME_COLUMNS}
+
+    def append(self, rows: List):
+        for name in CATEGORY_COLUMNS:
+            dictionary = self._dictionaries[name]
+            codes = self._codes[name]
+            for row in rows:
+                value = getattr(row, name)
+                code = dictionary.get(value)
+                if code is None:
+                    code = dictionary[value] = len(dictionary)
+                codes.append(code)
+        for name in TIME_COLUMNS:
+            self._times[name].extend(_micros(getattr(row, name)) for row in rows)
+        self.rows += len(rows)
+
+    def category(self, name: str):
+        return memoryview(self._codes[name]), list(self._dictionaries[name])
+
+    def timestamps(self, name: str):
+        return memoryview(self._times[name])
+
+
+def load_live(
+    statuses: List[str] = None,
+    org_id: str = None,
+    hours: int = None,
+    chunk_size: int = FETCH_CHUNK_SIZE,
+) -> CursorColumns:
+    columns = CursorColumns()
+    for rows in stream_documents(statuses, org_id, hours, chunk_size):
+        columns.append(rows)
+    return columns
+
+
+def _now_micros(columns) -> int:
+    exported = (columns.metadata or {}).get("exported_at")
+    return _micros(datetime.fromisoformat(exported) if exported else datetime.now())
+
+
+def _label(value) -> str:
+    return value if value else "unknown"
+
+
+def _ranked(counts: Dict) -> Dict:
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def _rates(totals: Dict, errors: Dict) -> Dict:
+    return {
+        org: {
+            "total": total,
+            "errors": errors.get(org, 0),
+            "error_rate": round(errors.get(org, 0) / total, 4),
+        }
+        for org, total in sorted(totals.items())
+    }
+
+
+def _merge(labels: List, counts) -> Dict:
+    """Counts per code → counts per label, skipping empty codes and labels."""
+    merged: Dict = {}
+    for label, count in zip(labels, counts):
+        if count and label:
+            merged[label] = merged.get(label, 0) + int(count)
+    return merged
+
+
+def _age_bucket(age_minutes: float) -> int:
+    for index, edge in enumerate(AGE_BUCKET_EDGES):
+        if age_minutes < edge:
+            return index
+    return len(AGE_BUCKET_EDGES)
+
+
+def analyze_numpy(columns, now_us: int) -> Dict:
+    """All distributions with bincounts over the code arrays."""
+    status, status_names = columns.category("status")
+    doc_type, type_names = columns.category("doc_type")
+    doc_source, source_names = columns.category("doc_source")
+    org, org_names = columns.category("org_id")
+    status = np.frombuffer(status, dtype=np.uint32)
+    doc_type = np.frombuffer(doc_type, dtype=np.uint32)
+    doc_source = np.frombuffer(doc_source, dtype=np.uint32)
+    org = np.frombuffer(org, dtype=np.uint32)
+    modified = np.frombuffer(columns.timestamps("last_modified_on"), dtype=np.int64)
+
+    status_counts = np.bincount(status, minlength=len(status_names))
+    is_error = np.zeros(len(status), dtype=bool)
+    if "error" in status_names:
+        is_error = status == status_names.index("error")
+
+    # Age buckets of in-flight documents, as pipeline_api's width_bucket
+    in_flight_codes = [
+        code for code, name in enumerate(status_names) if name in IN_FLIGHT_STATUSES
+    ]
+    in_flight = np.isin(status, in_flight_codes) & (modified != NULL_TIME)
+    ages = (now_us - modified[in_flight]) / _MINUTE_US
+    buckets = np.searchsorted(np.asarray(AGE_BUCKET_EDGES, float), ages, "right")
+    pairs = np.bincount(
+        status[in_flight].astype(np.int64) * len(AGE_LABELS) + buckets,
+        minlength=len(status_names) * len(AGE_LABELS),
+    ).reshape(len(status_names), len(AGE_LABELS))
+
+    org_totals = np.bincount(org, minlength=len(org_names))
+    org_errors = np.bincount(org[is_error], minlength=len(org_names))
+
+    age_buckets = {}
+    for code in in_flight_codes:
+        if pairs[code].any():
+            age_buckets[_label(status_names[code])] = dict(
+                zip(AGE_LABELS, pairs[code].tolist())
+            )
+    return {
+        "documents": len(status),
+        "status_distribution": _ranked(
+            _merge([_label(s) for s in status_names], status_counts)
+        ),
+        "error_doc_type_distribution": _ranked(
+            _merge(
+                type_names,
+                np.bincount(doc_type[is_error], minlength=len(type_names)),
+            )
+        ),
+        "error_doc_source_distribution": _ranked(
+            _merge(
+                source_names,
+                np.bincount(doc_source[is_error], minlength=len(source_names)),
+            )
+        ),
+        "age_buckets": age_buckets,
+        "org_error_rates": _rates(
+            _merge([_label(o) for o in org_names], org_totals),
+            _merge([_label(o) for o in org_names], org_errors),
+        ),
+    }
+
+
+def analyze_python(columns, now_us: int) -> Dict:
+    """Same results as analyze_numpy() with plain loops over the arrays."""
+    status, status_names = columns.category("status")
+    doc_type, type_names = columns.category("doc_type")
+    doc_source, source_names = columns.category("doc_source")
+    org, org_names = columns.category("org_id")
+    modified = columns.timestamps("last_modified_on")
+
+    error_code = status_names.index("error") if "error" in status_names else -1
+    in_flight = {
+        code for code, name in enumerate(status_names) if name in IN_FLIGHT_STATUSES
+    }
+    status_counts = [0] * len(status_names)
+    type_counts = [0] * len(type_names)
+    source_counts = [0] * len(source_names)
+    org_totals = [0] * len(org_names)
+    org_errors = [0] * len(org_names)
+    ages: Dict[int, List[int]] = {code: [0] * len(AGE_LABELS) for code in in_flight}
+
+    for i in range(len(status)):
+        code = status[i]
+        status_counts[code] += 1
+        org_totals[org[i]] += 1
+        if code == error_code:
+            type_counts[doc_type[i]] += 1
+            source_counts[doc_source[i]] += 1
+            org_errors[org[i]] += 1
+        elif code in in_flight and modified[i] != NULL_TIME:
+            ages[code][_age_bucket((now_us - modified[i]) / _MINUTE_US)] += 1
+
+    return {
+        "documents": len(status),
+        "status_distribution": _ranked(
+            _merge([_label(s) for s in status_names], status_counts)
+        ),
+        "error_doc_type_distribution": _ranked(_merge(type_names, type_counts)),
+        "error_doc_source_distribution": _ranked(_merge(source_names, source_counts)),
+        "age_buckets": {
+            _label(status_names[code]): dict(zip(AGE_LABELS, counts))
+            for code, counts in ages.items()
+            if any(counts)
+        },
+        "org_error_rates": _rates(
+            _merge([_label(o) for o in org_names], org_totals),
+            _merge([_label(o) for o in org_names], org_errors),
+        ),
+    }
+
+
+def analyze_records(documents: List[Dict], now: datetime) -> Dict:
+    """Reference: the dict/Counter style of DocumentMonitor, for comparison."""
+    errors = [doc for doc in documents if doc["status"] == "error"]
+    age_counts: Dict[str, Counter] = {}
+    for doc in documents:
+        if doc["status"] in IN_FLIGHT_STATUSES and doc["last_modified_on"]:
+            age = (now - doc["last_modified_on"]).total_seconds() / 60
+            age_counts.setdefault(doc["status"], Counter())[
+                AGE_LABELS[_age_bucket(age)]
+            ] += 1
+
+    return {
+        "documents": len(documents),
+        "status_distribution": _ranked(
+            Counter(_label(doc["status"]) for doc in documents)
+        ),
+        "error_doc_type_distribution": _ranked(
+            Counter(doc["doc_type"] for doc in errors if doc["doc_type"])
+        ),
+        "error_doc_source_distribution": _ranked(
+            Counter(doc["doc_source"] for doc in errors if doc["doc_source"])
+        ),
+        "age_buckets": {
+            status: {label: counts.get(label, 0) for label in AGE_LABELS}
+            for status, counts in age_counts.items()
+        },
+        "org_error_rates": _rates(
+            Counter(_label(doc["org_id"]) for doc in documents),
+            Counter(_label(doc["org_id"]) for doc in errors),
+        ),
+    }
+
+
+def analyze(columns, now_us: int = None) -> Dict:
+    now_us = _now_micros(columns) if now_us is None else now_us
+    if np is not None:
+        return analyze_numpy(columns, now_us)
+    return analyze_python(columns, now_us)
+
+
+_SyntheticRow = namedtuple("_SyntheticRow", ("id",) + CATEGORY_COLUMNS + TIME_COLUMNS)
+
+
+def write_synthetic_snapshot(path: str, documents: int, seed_value: int = 42):
+    """Random documents skewed like production: a few orgs own most rows."""
+    rng = random.Random(seed_value)
+    statuses = ["ready_for_validation"] * 6 + ["error"] * 2 + list(IN_FLIGHT_STATUSES)
+    orgs = [f"org-{i:04d}" for i in range(200)]
+    weights = [1 / (i + 1) for i in range(len(orgs))]
+    now = datetime.now()
+    writer = PackedWriter(path, {"exported_at": now.isoformat(), "synthetic": True})
+    for start in range(0, documents, FETCH_CHUNK_SIZE):
+        chunk = []
+        for _ in range(min(FETCH_CHUNK_SIZE, documents - start)):
+            modified = now - timedelta(seconds=rng.randint(0, 3 * 86400))
+            chunk.append(
+                _SyntheticRow(
+                    uuid.UUID(int=rng.getrandbits(128)),
+                    rng.choices(orgs, weights)[0],
+                    rng.choice(statuses),
+                    rng.choice(["invoice", "order", "delivery_note", None]),
+                    rng.choice(["email", "upload", "api"]),
+                    modified - timedelta(minutes=5),
+                    modified,
+                )
+            )
+        writer.write(chunk)
+    writer.close()
+
+
+def benchmark(documents: int) -> Dict:
+    """Columnar analyses vs. Counters over per-row dicts on one snapshot."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.docsnap")
+        write_synthetic_snapshot(path, documents)
+        timings = {"documents": documents, "bytes": os.path.getsize(path)}
+
+        with load_snapshot(path) as snapshot:
+            now_us = _now_micros(snapshot)
+            now = datetime.fromisoformat(snapshot.metadata["exported_at"])
+
+            started = time.perf_counter()
+            documents_list = list(records(snapshot))
+            timings["records_build_ms"] = round(
+                (time.perf_counter() - started) * 1000, 1
+            )
+            started = time.perf_counter()
+            reference = analyze_records(documents_list, now)
+            timings["counter_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            del documents_list
+
+            started = time.perf_counter()
+            python_result = analyze_python(snapshot, now_us)
+            timings["python_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            timings["results_match"] = python_result == reference
+
+            if np is not None:
+                started = time.perf_counter()
+                numpy_result = analyze_numpy(snapshot, now_us)
+                timings["numpy_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                timings["results_match"] &= numpy_result == reference
+    return timings
+
+
+def print_report(result: Dict, top: int = 10):
+    print(f"Documents: {result['documents']}")
+    print("\n=== Status Distribution ===")
+    for status, count in result["status_distribution"].items():
+        print(f"  {status}: {count}")
+    print("\n=== Error doc_type / doc_source ===")
+    print("  doc_type:", result["error_doc_type_distribution"])
+    print("  doc_source:", result["error_doc_source_distribution"])
+    print("\n=== In-flight Age Buckets ===")
+    for status, buckets in result["age_buckets"].items():
+        print(f"  {status}: {buckets}")
+    print(f"\n=== Highest Error Rates (top {top}, orgs with 20+ docs) ===")
+    rates = [
+        (org, entry)
+        for org, entry in result["org_error_rates"].items()
+        if entry["total"] >= 20
+    ]
+    rates.sort(key=lambda item: -item[1]["error_rate"])
+    for org, entry in rates[:top]:
+        print(
+            f"  {org}: {entry['error_rate']:.1%} "
+            f"({entry['errors']}/{entry['total']})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot analytics")
+    parser.add_argument("file", nargs="?", help="snapshot from document_snapshot.py")
+    parser.add_argument("--live", action="store_true", help="stream from the DB")
+    parser.add_argument("--status", action="append", help="live filter, repeatable")
+    parser.add_argument("--org", help="live filter")
+    parser.add_argument("--hours", type=int, help="live filter")
+    parser.add_argument("--benchmark", type=int, metavar="N")
+    args = parser.parse_args()
+
+    print("=== Snapshot Analytics ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print(f"Engine: {'numpy' if np is not None else 'pure python'}")
+    print()
+
+    if args.benchmark:
+        result = benchmark(args.benchmark)
+        print(f"Documents: {result['documents']} ({result['bytes']} bytes packed)")
+        print(
+            f"dict/Counter:  {result['counter_ms']} ms "
+            f"(+ {result['records_build_ms']} ms building the dicts)"
+        )
+        print(f"Column loops:  {result['python_ms']} ms")
+        if "numpy_ms" in result:
+            print(f"NumPy:         {result['numpy_ms']} ms")
+        print(f"Results match: {result['results_match']}")
+        return result
+
+    if args.live:
+        started = time.perf_counter()
+        columns = load_live(args.status, args.org, args.hours)
+        print(
+            f"Streamed {columns.rows} documents in {time.perf_counter() - started:.2f}s"
+        )
+        result = analyze(columns)
+    elif args.file:
+        with load_snapshot(args.file) as snapshot:
+            print(f"Snapshot: {args.file} ({snapshot.format})")
+            print(f"Exported: {snapshot.metadata.get('exported_at')}")
+            result = analyze(snapshot)
+    else:
+        parser.error("give a snapshot FILE, --live or --benchmark N")
+
+    print_report(result)
+    return result
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Start Beats Tasks Worker
-Start a Celery worker to handle beats-tasks queue (scheduled tasks)
+Start a Celery worker to handle the beats queue (scheduled tasks)
+using the "beats" worker profile from values.yaml
 """
 
 import subprocess
@@ -9,9 +10,11 @@ import sys
 import os
 from datetime import datetime
 
+from worker_profiles import build_worker_command
+
 
 def start_beats_worker():
-    """Start a Celery worker for beats-tasks queue."""
+    """Start a Celery worker for the beats queue."""
     print("🚀 STARTING BEATS TASKS WORKER")
     print(f"Timestamp: {datetime.now().isoformat()}")
     print()
@@ -19,22 +22,12 @@ def start_beats_worker():
     # Change to project directory
     os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    # Start Celery worker for beats-tasks queue
-    cmd = [
-        sys.executable,
-        "-m",
-        "celery",
-        "-A",
-        "celery_run",
-        "worker",
-        "-Q",
-        "beats-tasks",
-        "--loglevel=info",
-        "--concurrency=1",
-    ]
+    # Start Celery worker with the chart's "beats" profile (queue, pool,
+    # concurrency, prefetch) so local runs match the deployment
+    cmd = build_worker_command("beats", celery_bin=[sys.executable, "-m", "celery"])
 
     print(f"Command: {' '.join(cmd)}")
-    print("Starting worker for beats-tasks queue...")
+    print("Starting worker for beats queue...")
     print(
         "This worker will process scheduled tasks including trigger_restarted_documents"
     )
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Document Status Transitions
+Append-only log of document status changes, fed by a trigger on documents,
+and a cursor-based reader so tools consume only what changed since their
+last read instead of recounting the whole table.
+
+The reader orders by (txid, id) and only returns rows from transactions
+older than the current snapshot's xmin, so no transition is skipped when
+transactions commit out of order. compare_around instead takes a txid
+before and after the action and reads the transitions in between, which a
+long-running transaction elsewhere (holding xmin back) cannot distort.
+
+Usage:
+    python status_transitions.py --install           # create table + trigger
+    python status_transitions.py --uninstall
+    python status_transitions.py --tail CONSUMER     # read and advance a cursor
+    python status_transitions.py --since-minutes N   # summary of recent changes
+"""
+
+import sys
+import os
+import time
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import engine, SessionLocal
+from logger import get_logger
+
+logger = get_logger()
+
+TRANSITIONS_TABLE = "document_status_transitions"
+DEFAULT_BATCH_SIZE = 5000
+
+# Statuses the restart scripts print before/after a run
+TRACKED_STATUSES = ["RESTARTED", "error", "running", "ready_for_validation"]
+
+INSTALL_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {TRANSITIONS_TABLE} (
+        id bigserial PRIMARY KEY,
+        txid bigint NOT NULL DEFAULT txid_current(),
+        document_id uuid NOT NULL,
+        org_id varchar(64),
+        old_status varchar(64),
+        new_status varchar(64),
+        changed_on timestamp NOT NULL DEFAULT clock_timestamp()
+    )
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_{TRANSITIONS_TABLE}_txid_id
+    ON {TRANSITIONS_TABLE} (txid, id)
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_{TRANSITIONS_TABLE}_document_changed
+    ON {TRANSITIONS_TABLE} (document_id, changed_on)
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_{TRANSITIONS_TABLE}_changed_on
+    ON {TRANSITIONS_TABLE} (changed_on)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS status_transition_cursors (
+        consumer varchar(128) PRIMARY KEY,
+        last_txid bigint NOT NULL DEFAULT 0,
+        last_id bigint NOT NULL DEFAULT 0,
+        updated_on timestamp NOT NULL DEFAULT NOW()
+    )
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION log_document_status_transition()
+    RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {TRANSITIONS_TABLE} (document_id, org_id, old_status, new_status)
+        VALUES (
+            NEW.id,
+            NEW.org_id,
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+            NEW.status
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS documents_status_transition_update ON documents",
+    """
+    CREATE TRIGGER documents_status_transition_update
+    AFTER UPDATE OF status ON documents
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE PROCEDURE log_document_status_transition()
+    """,
+    "DROP TRIGGER IF EXISTS documents_status_transition_insert ON documents",
+    """
+    CREATE TRIGGER documents_status_transition_insert
+    AFTER INSERT ON documents
+    FOR EACH ROW
+    EXECUTE PROCEDURE log_document_status_transition()
+    """,
+]
+
+UNINSTALL_DDL = [
+    "DROP TRIGGER IF EXISTS documents_status_transition_update ON documents",
+    "DROP TRIGGER IF EXISTS documents_status_transition_insert ON documents",
+    "DROP FUNCTION IF EXISTS log_document_status_transition()",
+]
+
+# Every transaction below the snapshot xmin has finished, so nothing older
+# than this watermark can still appear
+READ_BATCH = f"""
+SELECT id, txid, document_id, org_id, old_status, new_status, changed_on
+FROM {TRANSITIONS_TABLE}
+WHERE (txid, id) > (:last_txid, :last_id)
+AND txid < txid_snapshot_xmin(txid_current_snapshot())
+ORDER BY txid, id
+LIMIT :batch_size
+"""
+
+# Transitions from transactions that got their txid between two marks,
+# i.e. from work started during the window
+READ_WINDOW = f"""
+SELECT id, txid, document_id, org_id, old_status, new_status, changed_on
+FROM {TRANSITIONS_TABLE}
+WHERE txid > :start_txid AND txid < :end_txid
+ORDER BY txid, id
+"""
+
+# Transactions from the window that have not finished yet
+OPEN_IN_WINDOW = """
+SELECT COUNT(*)
+FROM txid_snapshot_xip(txid_current_snapshot()) AS xip
+WHERE xip > :start_txid AND xip < :end_txid
+"""
+
+# How long compare_around waits for the window's transactions to finish
+WINDOW_SETTLE_SECONDS = 10.0
+
+Position = Tuple[int, int]
+
+
+def install():
+    """Create the transition table, cursor table and triggers (idempotent)."""
+    with engine.begin() as conn:
+        for ddl in INSTALL_DDL:
+            conn.execute(text(ddl))
+    logger.add_log("info", "all", "TRANSITIONS: trigger installed on documents")
+
+
+def uninstall(drop_log: bool = False):
+    """Remove the triggers; the log itself is kept unless ``drop_log``."""
+    with engine.begin() as conn:
+        for ddl in UNINSTALL_DDL:
+            conn.execute(text(ddl))
+        if drop_log:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TRANSITIONS_TABLE}"))
+            conn.execute(text("DROP TABLE IF EXISTS status_transition_cursors"))
+    logger.add_log("info", "all", "TRANSITIONS: trigger removed from documents")
+
+
+def is_installed() -> bool:
+    session = SessionLocal()
+    try:
+        return bool(session.execute(text("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_trigger
+                        WHERE tgname = 'documents_status_transition_update'
+                        AND NOT tgisinternal
+                    )
+                    """)).scalar())
+    except Exception:
+        return False
+    finally:
+        session.close()
+
+
+def txid_mark() -> int:
+    """A fresh txid: transactions that write later get larger ones."""
+    with engine.begin() as conn:
+        return conn.execute(text("SELECT txid_current()")).scalar()
+
+
+def read_window(
+    start_txid: int, end_txid: int, settle_seconds: float = WINDOW_SETTLE_SECONDS
+) -> Tuple[List[Dict], int]:
+    """Transitions written between two marks, and how many of the window's
+    transactions were still open after waiting ``settle_seconds``."""
+    params = {"start_txid": start_txid, "end_txid": end_txid}
+    deadline = time.monotonic() + settle_seconds
+    session = SessionLocal()
+    try:
+        while True:
+            still_open = session.execute(text(OPEN_IN_WINDOW), params).scalar()
+            session.rollback()
+            if not still_open or time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+        result = session.execute(text(READ_WINDOW), params)
+        return [dict(row._mapping) for row in result], still_open
+    finally:
+        session.close()
+
+
+def read_batch(position: Position, batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict]:
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text(READ_BATCH),
+            {
+                "last_txid": position[0],
+                "last_id": position[1],
+                "batch_size": batch_size,
+            },
+        )
+        return [dict(row._mapping) for row in result]
+    finally:
+        session.close()
+
+
+def read_since(
+    position: Position, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Dict]:
+    """Every complete transition after ``position``, in batches."""
+    while True:
+        batch = read_batch(position, batch_size)
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        position = (batch[-1]["txid"], batch[-1]["id"])
+
+
+class TransitionCursor:
+    """Named, persisted read position for one consumer of the log.
+
+    ``read()`` returns the next batch without moving the cursor; call
+    ``commit(batch)`` once the batch is processed so a crash re-delivers it.
+    """
+
+    def __init__(self, consumer: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.position = self._load()
+
+    def _load(self) -> Position:
+        session = SessionLocal()
+        try:
+            row = session.execute(
+                text("""
+                    SELECT last_txid, last_id
+                    FROM status_transition_cursors
+                    WHERE consumer = :consumer
+                    """),
+                {"consumer": self.consumer},
+            ).first()
+            return (row.last_txid, row.last_id) if row else (0, 0)
+        finally:
+            session.close()
+
+    def read(self) -> List[Dict]:
+        return read_batch(self.position, self.batch_size)
+
+    def commit(self, batch: List[Dict]):
+        if not batch:
+            return
+        position = (batch[-1]["txid"], batch[-1]["id"])
+        session = SessionLocal()
+        try:
+            session.execute(
+                text("""
+                    INSERT INTO status_transition_cursors
+                        (consumer, last_txid, last_id, updated_on)
+                    VALUES (:consumer, :last_txid, :last_id, NOW())
+                    ON CONFLICT (consumer) DO UPDATE SET
+                        last_txid = EXCLUDED.last_txid,
+                        last_id = EXCLUDED.last_id,
+                        updated_on = EXCLUDED.updated_on
+                    """),
+                {
+                    "consumer": self.consumer,
+                    "last_txid": position[0],
+                    "last_id": position[1],
+                },
+            )
+            session.commit()
+            self.position = position
+        finally:
+            session.close()
+
+    def __iter__(self) -> Iterator[List[Dict]]:
+        """Batches until caught up, committing each after it is consumed."""
+        while True:
+            batch = self.read()
+            if not batch:
+                return
+            yield batch
+            self.commit(batch)
+            if len(batch) < self.batch_size:
+                return
+
+
+def summarize_transitions(transitions: List[Dict]) -> Dict:
+    """Net per-status change, transition pairs and throughput of a delta."""
+    pairs = Counter()
+    net = Counter()
+    documents = set()
+    first = last = None
+    for transition in transitions:
+        old, new = transition["old_status"], transition["new_status"]
+        pairs[(old, new)] += 1
+        if old is not None:
+            net[old] -= 1
+        net[new] += 1
+        documents.add(transition["document_id"])
+        changed_on = transition["changed_on"]
+        first = changed_on if first is None else min(first, changed_on)
+        last = changed_on if last is None else max(last, changed_on)
+
+    span_seconds = (last - first).total_seconds() if first and last else 0
+    return {
+        "transitions": len(transitions),
+        "documents": len(documents),
+        "net_change": {status: delta for status, delta in net.items() if delta},
+        "pairs": {
+            f"{old or '∅'} → {new}": count for (old, new), count in pairs.items()
+        },
+        "per_minute": (
+            round(len(transitions) / span_seconds * 60, 1) if span_seconds else None
+        ),
+        "first": first.isoformat() if first else None,
+        "last": last.isoformat() if last else None,
+    }
+
+
+def _print_counts_diff(before: Dict[str, int], after: Dict[str, int]):
+    print("=== STATUS CHANGES ===")
+    for status in TRACKED_STATUSES:
+        before_count = before.get(status, 0)
+        after_count = after.get(status, 0)
+        change = after_count - before_count
+        if change != 0:
+            print(f"{status}: {before_count} → {after_count} (change: {change:+d})")
+
+
+def compare_around(
+    action: Callable, label: str, settle_seconds: float = 0
+) -> Optional[Dict]:
+    """Run ``action`` and report the status changes it caused.
+
+    Reads the transitions written between a txid taken before and one taken
+    after the action when the trigger is installed; otherwise falls back to
+    diffing two full status counts.
+    """
+    from document_monitor import DocumentMonitor
+
+    if is_installed():
+        start_txid = txid_mark()
+        result = action()
+        if settle_seconds:
+            time.sleep(settle_seconds)
+        end_txid = txid_mark()
+
+        transitions, still_open = read_window(start_txid, end_txid)
+        summary = summarize_transitions(transitions)
+        print(f"\n=== STATUS TRANSITIONS DURING {label} ===")
+        print(
+            f"{summary['transitions']} transitions on {summary['documents']} documents"
+            + (f" ({summary['per_minute']}/min)" if summary["per_minute"] else "")
+        )
+        if still_open:
+            print(
+                f"⚠️  {still_open} transactions started during the run were still "
+                "open; their transitions are not included"
+            )
+        for pair, count in sorted(summary["pairs"].items(), key=lambda p: -p[1]):
+            print(f"  {pair}: {count}")
+        print()
+        print("=== STATUS CHANGES ===")
+        for status, change in summary["net_change"].items():
+            print(f"{status}: {change:+d}")
+        return result
+
+    monitor = DocumentMonitor()
+
+    print(f"=== STATUS BEFORE {label} ===")
+    before_status = monitor.get_document_status_counts()
+    for status, count in before_status.items():
+        if status in TRACKED_STATUSES:
+            print(f"{status}: {count}")
+    print()
+
+    result = action()
+    if settle_seconds:
+        time.sleep(settle_seconds)
+
+    print(f"\n=== STATUS AFTER {label} ===")
+    after_status = monitor.get_document_status_counts()
+    for status, count in after_status.items():
+        if status in TRACKED_STATUSES:
+            print(f"{status}: {count}")
+    print()
+
+    _print_counts_diff(before_status, after_status)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document status transition log")
+    parser.add_argument("--install", action="store_true")
+    parser.add_argument("--uninstall", action="store_true")
+    parser.add_argument(
+        "--drop-log", action="store_true", help="with --uninstall, drop the tables"
+    )
+    parser.add_argument("--tail", metavar="CONSUMER", help="read and advance a cursor")
+    parser.add_argument("--since-minutes", type=int, default=60)
+    args = parser.parse_args()
+
+    print("=== Document Status Transitions ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print()
+
+    if args.install:
+        install()
+        print("✅ Transition trigger installed")
+        return
+    if args.uninstall:
+        uninstall(drop_log=args.drop_log)
+        print("✅ Transition trigger removed")
+        return
+    if not is_installed():
+        print("❌ Transition trigger not installed; run with --install")
+        return
+
+    if args.tail:
+        cursor = TransitionCursor(args.tail)
+        transitions = []
+        for batch in cursor:
+            transitions.extend(batch)
+        print(f"Consumer {args.tail} advanced to {cursor.position}")
+    else:
+        session = SessionLocal()
+        try:
+            result = session.execute(
+                text(f"""
+                    SELECT id, txid, document_id, org_id, old_status, new_status,
+                           changed_on
+                    FROM {TRANSITIONS_TABLE}
+                    WHERE changed_on >= :cutoff
+                    ORDER BY changed_on
+                    """),
+                {"cutoff": datetime.now() - timedelta(minutes=args.since_minutes)},
+            )
+            transitions = [dict(row._mapping) for row in result]
+        finally:
+            session.close()
+        print(f"Last {args.since_minutes} minutes:")
+
+    summary = summarize_transitions(transitions)
+    print(f"Transitions: {summary['transitions']} on {summary['documents']} documents")
+    if summary["per_minute"]:
+        print(f"Throughput: {summary['per_minute']}/min")
+    for pair, count in sorted(summary["pairs"].items(), key=lambda p: -p[1])[:20]:
+        print(f"  {pair}: {count}")
+    return summary
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
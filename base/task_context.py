@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Task Context
+Stand-ins for the Celery task and user context the app normally supplies,
+so the recovery scripts can call bound tasks and the processing pipeline
+directly. Shared by those scripts and the offline harness.
+"""
+
+from datetime import datetime
+
+
+class MockRequest:
+    """Celery ``self.request`` stand-in for calling bound tasks directly."""
+
+    def __init__(self, task_id: str = None, retries: int = 0):
+        self.id = (
+            task_id or f"direct-trigger-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        )
+        self.retries = retries
+
+
+class MockTaskSelf:
+    """Bound-task ``self`` stand-in: only ``request`` is used by our tasks."""
+
+    def __init__(self, task_id: str = None):
+        self.request = MockRequest(task_id)
+
+
+class MockUserAuthentication:
+    """Minimal UserAuthentication for running the pipeline as a document's owner."""
+
+    def __init__(self, user_id, org_id):
+        self.id = user_id
+        self.user_id = user_id
+        self.org_id = org_id
+
+    def get_org_id(self):
+        return self.org_id
+
+    def get_user_id(self):
+        return self.user_id
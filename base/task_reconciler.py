@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Task Reconciler
+Find documents stuck in 'running' whose Celery task is gone by joining
+documents.celery_task_token with celery_taskmeta (and, when reachable, the
+workers' active/reserved/scheduled tasks) in one pass, then bulk-requeue
+the orphans as RESTARTED.
+
+Usage:
+    python task_reconciler.py            # classify only
+    python task_reconciler.py --apply    # requeue orphans, mark failed tasks as error
+"""
+
+import sys
+import os
+from datetime import datetime
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, bindparam
+from database.database import SessionLocal
+from logger import get_logger
+
+logger = get_logger()
+
+IN_FLIGHT_STATUSES = ("running", "processing")
+
+# Celery states that mean the task will not touch the document again
+FINISHED_TASK_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+# Without any result row, how long before a running document is an orphan.
+# Without broker inspection we cannot see queued/started tasks, so wait
+# longer than the longest expected task.
+ORPHAN_AFTER_MINUTES = 30
+ORPHAN_AFTER_MINUTES_NO_BROKER = 180
+
+REQUEUE_CHUNK_SIZE = 500
+
+# Workers the deployment runs; fewer inspect replies than this means the
+# broker view is incomplete (0 = trust the workers that answer ping)
+EXPECTED_WORKERS = int(os.getenv("RECONCILER_EXPECTED_WORKERS", 0))
+
+LIVE = "live"
+FINISHED_NOT_UPDATED = "finished_not_updated"
+ORPHANED = "orphaned"
+
+
+def get_broker_task_ids() -> Optional[Set[str]]:
+    """Task ids the workers currently hold (active, reserved, scheduled).
+
+    Returns None when the workers cannot be inspected, or when any worker
+    that answers ping (or fewer than EXPECTED_WORKERS) is missing from a
+    reply: a partial view would make that worker's tasks look orphaned.
+    Callers then fall back to the conservative no-broker threshold.
+    """
+    try:
+        from celery_run import app as celery_app
+
+        inspector = celery_app.control.inspect(timeout=5)
+        workers = set(inspector.ping() or {})
+        if not workers or len(workers) < EXPECTED_WORKERS:
+            logger.add_log(
+                "warning",
+                "all",
+                f"RECONCILER: {len(workers)} workers answered ping "
+                f"(expected {EXPECTED_WORKERS or 'at least 1'}); not trusting the broker view",
+            )
+            return None
+
+        task_ids = set()
+        for method in (inspector.active, inspector.reserved, inspector.scheduled):
+            reply = method() or {}
+            missing = workers - set(reply)
+            if missing:
+                logger.add_log(
+                    "warning",
+                    "all",
+                    f"RECONCILER: no {method.__name__} reply from "
+                    f"{', '.join(sorted(missing))}; not trusting the broker view",
+                )
+                return None
+            for tasks in reply.values():
+                for task in tasks:
+                    # scheduled() wraps the task in a "request" entry
+                    task_ids.add((task.get("request") or task).get("id"))
+        return task_ids
+    except Exception as e:
+        logger.add_log("warning", "all", f"RECONCILER: broker inspection failed: {e}")
+        return None
+
+
+def fetch_in_flight_documents() -> List[Dict]:
+    """In-flight documents joined with their task result row, if any."""
+    session = SessionLocal()
+    try:
+        query = text("""
+            SELECT
+                d.id,
+                d.status,
+                d.org_id,
+                d.celery_task_token,
+                d.last_modified_on,
+                EXTRACT(EPOCH FROM (NOW() - d.last_modified_on)) / 60 AS age_minutes,
+                t.status AS task_status,
+                t.date_done AS task_date_done
+            FROM documents d
+            LEFT JOIN celery_taskmeta t ON t.task_id = d.celery_task_token
+            WHERE d.status IN :statuses
+            AND d.is_deleted = false
+            """).bindparams(bindparam("statuses", expanding=True))
+
+        result = session.execute(query, {"statuses": list(IN_FLIGHT_STATUSES)})
+        return [dict(row._mapping) for row in result]
+    finally:
+        session.close()
+
+
+def classify(
+    doc: Dict, broker_task_ids: Optional[Set[str]], orphan_after: float
+) -> str:
+    token = doc.get("celery_task_token")
+    task_status = doc.get("task_status")
+
+    if task_status in FINISHED_TASK_STATES:
+        return FINISHED_NOT_UPDATED
+    if broker_task_ids is not None and token and token in broker_task_ids:
+        return LIVE
+    if task_status in ("STARTED", "RETRY") and broker_task_ids is None:
+        return LIVE
+    if (doc.get("age_minutes") or 0) < orphan_after:
+        # Too recent to tell; the task may still be queued
+        return LIVE
+    return ORPHANED
+
+
+def reconcile(orphan_after: float = None) -> Dict:
+    """Classify every in-flight document in one pass."""
+    broker_task_ids = get_broker_task_ids()
+    if orphan_after is None:
+        orphan_after = (
+            ORPHAN_AFTER_MINUTES
+            if broker_task_ids is not None
+            else ORPHAN_AFTER_MINUTES_NO_BROKER
+        )
+
+    groups: Dict[str, List[Dict]] = {
+        LIVE: [],
+        FINISHED_NOT_UPDATED: [],
+        ORPHANED: [],
+    }
+    for doc in fetch_in_flight_documents():
+        groups[classify(doc, broker_task_ids, orphan_after)].append(doc)
+
+    return {
+        "broker_inspected": broker_task_ids is not None,
+        "orphan_after_minutes": orphan_after,
+        "counts": {name: len(docs) for name, docs in groups.items()},
+        "groups": groups,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def _bulk_update(docs: List[Dict], new_status: str, expected_statuses) -> int:
+    """Set ``new_status`` in chunks, only on rows unchanged since classification.
+
+    Each row must still be in an expected status and carry the
+    celery_task_token and last_modified_on it was classified with, so a
+    document re-dispatched in the meantime (new token, fresh timestamp) is
+    left to its new task.
+    """
+    if not docs:
+        return 0
+
+    session = SessionLocal()
+    updated = 0
+    try:
+        query = text("""
+            UPDATE documents d
+            SET
+                status = :new_status,
+                last_modified_on = NOW(),
+                restart_allowed = true
+            FROM (
+                SELECT
+                    unnest(CAST(:ids AS uuid[])) AS id,
+                    unnest(CAST(:tokens AS text[])) AS token,
+                    unnest(CAST(:modified AS timestamptz[])) AS last_modified_on
+            ) seen
+            WHERE d.id = seen.id
+            AND CAST(d.celery_task_token AS text) IS NOT DISTINCT FROM seen.token
+            AND d.last_modified_on IS NOT DISTINCT FROM seen.last_modified_on
+            AND d.status IN :expected
+            """).bindparams(bindparam("expected", expanding=True))
+        for start in range(0, len(docs), REQUEUE_CHUNK_SIZE):
+            chunk = docs[start : start + REQUEUE_CHUNK_SIZE]
+            result = session.execute(
+                query,
+                {
+                    "new_status": new_status,
+                    "ids": [str(doc["id"]) for doc in chunk],
+                    "tokens": [
+                        (
+                            str(doc["celery_task_token"])
+                            if doc.get("celery_task_token")
+                            else None
+                        )
+                        for doc in chunk
+                    ],
+                    "modified": [doc.get("last_modified_on") for doc in chunk],
+                    "expected": list(expected_statuses),
+                },
+            )
+            session.commit()
+            updated += result.rowcount or 0
+        return updated
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def requeue_orphans(orphans: List[Dict]) -> int:
+    """Move orphaned documents back to RESTARTED for the trigger to pick up."""
+    updated = _bulk_update(orphans, "RESTARTED", IN_FLIGHT_STATUSES)
+    logger.add_log("info", "all", f"RECONCILER: requeued {updated} orphaned documents")
+    return updated
+
+
+def mark_failed_tasks(finished: List[Dict]) -> int:
+    """Documents whose task ended in FAILURE/REVOKED go to error."""
+    failed = [
+        doc for doc in finished if doc.get("task_status") in ("FAILURE", "REVOKED")
+    ]
+    updated = _bulk_update(failed, "error", IN_FLIGHT_STATUSES)
+    logger.add_log(
+        "info",
+        "all",
+        f"RECONCILER: marked {updated} documents with failed tasks as error",
+    )
+    return updated
+
+
+def main():
+    apply_changes = "--apply" in sys.argv
+
+    print("=== Celery Task / Document Status Reconciler ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print()
+
+    report = reconcile()
+    print(
+        f"Broker inspected: {report['broker_inspected']} "
+        f"(orphan threshold: {report['orphan_after_minutes']} min)"
+    )
+    for name, count in report["counts"].items():
+        print(f"  {name}: {count}")
+
+    finished = report["groups"][FINISHED_NOT_UPDATED]
+    if finished:
+        task_states = Counter(doc["task_status"] for doc in finished)
+        print(f"\nFinished-but-not-updated by task state: {dict(task_states)}")
+
+    orphans = report["groups"][ORPHANED]
+    if orphans:
+        by_org = Counter(doc["org_id"] for doc in orphans)
+        print(f"Orphans by org: {dict(by_org.most_common(10))}")
+
+    if not apply_changes:
+        print("\nDry run; pass --apply to requeue orphans and mark failed tasks")
+        return report
+
+    print()
+    print(f"✅ Requeued {requeue_orphans(orphans)} orphaned documents as RESTARTED")
+    print(
+        f"✅ Marked {mark_failed_tasks(finished)} documents with failed tasks as error"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
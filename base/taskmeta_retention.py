@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Task Result Retention
+Keep celery_taskmeta small: delete task results older than the retention
+window and strip large result payloads from older rows, archiving a compact
+summary of each into celery_taskmeta_archive. Works in small, ordered,
+SKIP LOCKED batches so the result backend keeps serving workers meanwhile.
+
+Runs as a base-cronjob job (see values-dev-taskmeta-retention.yaml).
+
+Usage:
+    python taskmeta_retention.py                 # report what would be done
+    python taskmeta_retention.py --apply         # purge and compact
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import engine, SessionLocal
+from index_advisor import RECOMMENDED_INDEXES, index_ddl
+from query_explainer import explain_mode_active
+from logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_RETENTION_DAYS = 14
+DEFAULT_COMPACT_AFTER_HOURS = 24
+DEFAULT_COMPACT_MIN_BYTES = 4096
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_BATCHES = 500
+DEFAULT_PAUSE_SECONDS = 0.2
+
+# Per-batch statement timeout, so one slow batch cannot hold row locks the
+# workers' result writes are waiting on
+BATCH_STATEMENT_TIMEOUT = "30s"
+
+# How much of the original result / traceback the archive keeps
+RESULT_HEAD_BYTES = 256
+TRACEBACK_HEAD_CHARS = 2000
+
+ARCHIVE_DDL = """
+CREATE TABLE IF NOT EXISTS celery_taskmeta_archive (
+    task_id varchar(155) PRIMARY KEY,
+    name varchar(155),
+    status varchar(50),
+    date_done timestamp,
+    result_bytes integer,
+    result_head text,
+    traceback_head text,
+    archived_on timestamp NOT NULL DEFAULT NOW()
+)
+"""
+
+ARCHIVE_INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS ix_celery_taskmeta_archive_date_done
+ON celery_taskmeta_archive (date_done)
+"""
+
+# Task rows still referenced by an in-flight document are kept: the
+# reconciler (task_reconciler.py) needs them to tell finished tasks from
+# orphans
+_NOT_IN_FLIGHT = """
+    NOT EXISTS (
+        SELECT 1 FROM documents d
+        WHERE d.celery_task_token = t.task_id
+        AND d.status IN ('running', 'processing')
+        AND d.is_deleted = false
+    )
+"""
+
+# Shared by the batches and the --stats counts, so the report matches a run
+_PURGE_WHERE = f"t.date_done < :purge_cutoff AND {_NOT_IN_FLIGHT}"
+_COMPACT_WHERE = """
+    t.date_done < :compact_cutoff
+    AND t.date_done >= :purge_cutoff
+    AND octet_length(t.result) > :min_bytes
+"""
+
+# An interrupted CREATE INDEX CONCURRENTLY leaves an invalid index behind,
+# which IF NOT EXISTS would then accept
+INDEX_VALID = """
+SELECT i.indisvalid
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname = :name
+AND n.nspname = current_schema()
+"""
+
+_ARCHIVE_COLUMNS = """
+    task_id, name, status, date_done, result_bytes, result_head, traceback_head
+"""
+
+PURGE_BATCH = f"""
+WITH batch AS (
+    SELECT t.id
+    FROM celery_taskmeta t
+    WHERE {_PURGE_WHERE}
+    ORDER BY t.date_done
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), removed AS (
+    DELETE FROM celery_taskmeta t
+    USING batch
+    WHERE t.id = batch.id
+    RETURNING t.task_id, t.name, t.status, t.date_done, t.result, t.traceback
+), archived AS (
+    INSERT INTO celery_taskmeta_archive ({_ARCHIVE_COLUMNS})
+    SELECT
+        task_id,
+        name,
+        status,
+        date_done,
+        octet_length(result),
+        encode(substring(result FROM 1 FOR {RESULT_HEAD_BYTES}), 'escape'),
+        left(traceback, {TRACEBACK_HEAD_CHARS})
+    FROM removed
+    WHERE :archive
+    ON CONFLICT (task_id) DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT COUNT(*) FROM removed) AS rows,
+    (SELECT COALESCE(SUM(octet_length(result)), 0) FROM removed) AS bytes,
+    (SELECT COUNT(*) FROM archived) AS archived
+"""
+
+COMPACT_BATCH = f"""
+WITH batch AS (
+    SELECT
+        t.id,
+        t.task_id,
+        t.name,
+        t.status,
+        t.date_done,
+        octet_length(t.result) AS result_bytes,
+        encode(substring(t.result FROM 1 FOR {RESULT_HEAD_BYTES}), 'escape')
+            AS result_head,
+        left(t.traceback, {TRACEBACK_HEAD_CHARS}) AS traceback_head
+    FROM celery_taskmeta t
+    WHERE {_COMPACT_WHERE}
+    ORDER BY t.date_done
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), archived AS (
+    INSERT INTO celery_taskmeta_archive ({_ARCHIVE_COLUMNS})
+    SELECT {_ARCHIVE_COLUMNS} FROM batch
+    ON CONFLICT (task_id) DO NOTHING
+    RETURNING 1
+), compacted AS (
+    UPDATE celery_taskmeta t
+    SET result = NULL
+    FROM batch
+    WHERE t.id = batch.id
+    RETURNING batch.result_bytes
+)
+SELECT
+    (SELECT COUNT(*) FROM compacted) AS rows,
+    (SELECT COALESCE(SUM(result_bytes), 0) FROM compacted) AS bytes,
+    (SELECT COUNT(*) FROM archived) AS archived
+"""
+
+
+def _env_number(name: str, default, cast=int):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+def ensure_schema():
+    """Create the archive table and the date_done index the batches seek on."""
+    date_done_index = next(
+        index
+        for index in RECOMMENDED_INDEXES
+        if index["name"] == "ix_celery_taskmeta_date_done"
+    )
+    with engine.connect() as conn:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(ARCHIVE_DDL))
+        conn.execute(text(ARCHIVE_INDEX_DDL))
+        valid = conn.execute(
+            text(INDEX_VALID), {"name": date_done_index["name"]}
+        ).scalar()
+        if valid is False:
+            logger.add_log(
+                "warning",
+                "all",
+                f"RETENTION: rebuilding invalid index {date_done_index['name']}",
+            )
+            conn.execute(
+                text(f"DROP INDEX CONCURRENTLY IF EXISTS {date_done_index['name']}")
+            )
+        conn.execute(text(index_ddl(date_done_index, concurrently=True)))
+
+
+def get_retention_stats(
+    purge_cutoff: datetime, compact_cutoff: datetime, min_bytes: int
+) -> Dict:
+    """How many rows/bytes a run with these cutoffs would purge and compact."""
+    session = SessionLocal()
+    try:
+        query = text(f"""
+            SELECT
+                COUNT(*) AS total_rows,
+                COALESCE(SUM(octet_length(t.result)), 0) AS total_bytes,
+                COUNT(*) FILTER (WHERE {_PURGE_WHERE}) AS purge_rows,
+                COALESCE(SUM(octet_length(t.result))
+                    FILTER (WHERE {_PURGE_WHERE}), 0) AS purge_bytes,
+                COUNT(*) FILTER (WHERE {_COMPACT_WHERE}) AS compact_rows,
+                COALESCE(SUM(octet_length(t.result))
+                    FILTER (WHERE {_COMPACT_WHERE}), 0) AS compact_bytes,
+                MIN(t.date_done) AS oldest
+            FROM celery_taskmeta t
+            """)
+        row = session.execute(
+            query,
+            {
+                "purge_cutoff": purge_cutoff,
+                "compact_cutoff": compact_cutoff,
+                "min_bytes": min_bytes,
+            },
+        ).first()
+        return dict(row._mapping)
+    except Exception as e:
+        logger.add_log("error", "all", f"RETENTION: failed to read stats: {e}")
+        return {"error": str(e)}
+    finally:
+        session.close()
+
+
+def _run_batches(
+    sql: str,
+    params: Dict,
+    label: str,
+    max_batches: int,
+    pause_seconds: float,
+) -> Dict:
+    """Run ``sql`` one committed batch at a time until a short batch."""
+    totals = {"rows": 0, "bytes": 0, "archived": 0, "batches": 0}
+    session = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            if not explain_mode_active():
+                session.execute(
+                    text(f"SET LOCAL statement_timeout = '{BATCH_STATEMENT_TIMEOUT}'")
+                )
+            row = session.execute(text(sql), params).first()
+            session.commit()
+            if row is None:
+                # Explain mode: the batch was only planned
+                break
+
+            totals["batches"] += 1
+            totals["rows"] += row.rows
+            totals["bytes"] += row.bytes
+            totals["archived"] += row.archived
+
+            if row.rows < params["batch_size"]:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    except Exception as e:
+        session.rollback()
+        logger.add_log("error", "all", f"RETENTION: {label} stopped: {e}")
+        totals["error"] = str(e)
+    finally:
+        session.close()
+
+    logger.add_log(
+        "info",
+        "all",
+        f"RETENTION: {label} {totals['rows']} rows, {totals['bytes']} bytes "
+        f"in {totals['batches']} batches",
+    )
+    return totals
+
+
+def purge_expired(
+    cutoff: datetime,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = DEFAULT_MAX_BATCHES,
+    pause_seconds: float = DEFAULT_PAUSE_SECONDS,
+    archive: bool = True,
+) -> Dict:
+    """Delete task results finished before ``cutoff``, oldest first."""
+    return _run_batches(
+        PURGE_BATCH,
+        {"purge_cutoff": cutoff, "batch_size": batch_size, "archive": archive},
+        "purged",
+        max_batches,
+        pause_seconds,
+    )
+
+
+def compact_results(
+    cutoff: datetime,
+    purge_cutoff: datetime,
+    min_bytes: int = DEFAULT_COMPACT_MIN_BYTES,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = DEFAULT_MAX_BATCHES,
+    pause_seconds: float = DEFAULT_PAUSE_SECONDS,
+) -> Dict:
+    """Archive and drop result payloads over ``min_bytes`` finished before ``cutoff``.
+
+    The row itself stays, so AsyncResult.status and the diagnostics still see
+    the task; only ``result`` becomes NULL.
+    """
+    return _run_batches(
+        COMPACT_BATCH,
+        {
+            "compact_cutoff": cutoff,
+            "purge_cutoff": purge_cutoff,
+            "min_bytes": min_bytes,
+            "batch_size": batch_size,
+        },
+        "compacted",
+        max_batches,
+        pause_seconds,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="celery_taskmeta retention")
+    parser.add_argument(
+        "--apply", action="store_true", help="purge and compact (default: report)"
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=_env_number("TASKMETA_RETENTION_DAYS", DEFAULT_RETENTION_DAYS),
+    )
+    parser.add_argument(
+        "--compact-after-hours",
+        type=int,
+        default=_env_number(
+            "TASKMETA_COMPACT_AFTER_HOURS", DEFAULT_COMPACT_AFTER_HOURS
+        ),
+        help="0 disables compaction",
+    )
+    parser.add_argument(
+        "--compact-min-bytes",
+        type=int,
+        default=_env_number("TASKMETA_COMPACT_MIN_BYTES", DEFAULT_COMPACT_MIN_BYTES),
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=_env_number("TASKMETA_RETENTION_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+    )
+    parser.add_argument(
+        "--max-batches",
+        type=int,
+        default=_env_number("TASKMETA_RETENTION_MAX_BATCHES", DEFAULT_MAX_BATCHES),
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=_env_number(
+            "TASKMETA_RETENTION_PAUSE_SECONDS", DEFAULT_PAUSE_SECONDS, float
+        ),
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        default=os.getenv("TASKMETA_ARCHIVE", "true").lower() == "false",
+        help="delete expired rows without archiving a summary",
+    )
+    parser.add_argument(
+        "--skip-schema", action="store_true", help="do not create archive/index"
+    )
+    args = parser.parse_args()
+
+    now = datetime.now()
+    purge_cutoff = now - timedelta(days=args.retention_days)
+    compact_cutoff = now - timedelta(hours=args.compact_after_hours)
+
+    print("=== celery_taskmeta Retention ===")
+    print(f"Timestamp: {now.isoformat()}")
+    print(f"Purge before:   {purge_cutoff.isoformat()} ({args.retention_days} days)")
+    if args.compact_after_hours:
+        print(
+            f"Compact before: {compact_cutoff.isoformat()} "
+            f"(results > {args.compact_min_bytes} bytes)"
+        )
+    print()
+
+    stats = get_retention_stats(purge_cutoff, compact_cutoff, args.compact_min_bytes)
+    if "error" in stats:
+        print(f"❌ {stats['error']}")
+        return stats
+    print(
+        f"Table: {stats['total_rows']} rows, {stats['total_bytes'] / 2**20:.1f} MiB "
+        f"of results (oldest: {stats['oldest']})"
+    )
+    print(
+        f"To purge:   {stats['purge_rows']} rows, "
+        f"{stats['purge_bytes'] / 2**20:.1f} MiB"
+    )
+    if args.compact_after_hours:
+        print(
+            f"To compact: {stats['compact_rows']} rows, "
+            f"{stats['compact_bytes'] / 2**20:.1f} MiB"
+        )
+
+    if not args.apply:
+        print("\nDry run; pass --apply to purge and compact")
+        return stats
+
+    if not args.skip_schema and not explain_mode_active():
+        ensure_schema()
+
+    print()
+    purged = purge_expired(
+        purge_cutoff,
+        args.batch_size,
+        args.max_batches,
+        args.pause,
+        archive=not args.no_archive,
+    )
+    print(
+        f"{'❌' if 'error' in purged else '✅'} Purged {purged['rows']} rows "
+        f"({purged['bytes'] / 2**20:.1f} MiB, {purged['archived']} archived) "
+        f"in {purged['batches']} batches"
+    )
+
+    compacted = {}
+    if args.compact_after_hours:
+        compacted = compact_results(
+            compact_cutoff,
+            purge_cutoff,
+            args.compact_min_bytes,
+            args.batch_size,
+            args.max_batches,
+            args.pause,
+        )
+        print(
+            f"{'❌' if 'error' in compacted else '✅'} Compacted {compacted['rows']} "
+            f"rows ({compacted['bytes'] / 2**20:.1f} MiB freed) "
+            f"in {compacted['batches']} batches"
+        )
+
+    if "error" in purged or "error" in compacted:
+        sys.exit(1)
+    return {"stats": stats, "purged": purged, "compacted": compacted}
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
@@ -105,3 +105,59 @@ Return the target/server Kubernetes version
 {{- $mergedAnnotations | toYaml }}
 {{- end }}
 {{- end }}
+
+{{/*
+Celery worker profile selected by .Values.celery.workerProfile, as YAML
+(empty when no profile is selected)
+*/}}
+{{- define "base.celeryProfile" -}}
+{{- if and .Values.celery .Values.celery.workerProfile -}}
+{{- $profile := index .Values.celery.profiles .Values.celery.workerProfile -}}
+{{- if not $profile -}}
+{{- fail (printf "celery.workerProfile %q is not defined in celery.profiles" .Values.celery.workerProfile) -}}
+{{- end -}}
+{{- toYaml $profile -}}
+{{- end -}}
+{{- end -}}
+
+{{/*
+Celery worker command line for the selected profile
+*/}}
+{{- define "base.celeryWorkerCommand" -}}
+{{- $profile := include "base.celeryProfile" . | fromYaml -}}
+- {{ .Values.celery.bin | default "celery" }}
+- -A
+- {{ .Values.celery.app }}
+- worker
+- --loglevel={{ .Values.celery.loglevel | default "info" }}
+- --queues={{ join "," $profile.queues }}
+- --pool={{ $profile.pool | default "prefork" }}
+- --concurrency={{ $profile.concurrency }}
+{{- if $profile.prefetchMultiplier }}
+- --prefetch-multiplier={{ $profile.prefetchMultiplier }}
+{{- end }}
+{{- if $profile.maxTasksPerChild }}
+- --max-tasks-per-child={{ $profile.maxTasksPerChild }}
+{{- end }}
+{{- if $profile.maxMemoryPerChild }}
+- --max-memory-per-child={{ $profile.maxMemoryPerChild | int }}
+{{- end }}
+{{- end -}}
+
+{{/*
+preStop hook for the selected profile: stop consuming every profile queue
+on this worker, then give in-flight acks a moment before SIGTERM
+*/}}
+{{- define "base.celeryPreStop" -}}
+{{- $profile := include "base.celeryProfile" . | fromYaml -}}
+preStop:
+  exec:
+    command:
+      - /bin/sh
+      - -c
+      - >-
+        for queue in {{ join " " $profile.queues }}; do
+        {{ .Values.celery.bin | default "celery" }} -A {{ .Values.celery.app }} control cancel_consumer "$queue" --destination "celery@$(hostname)" || true;
+        done;
+        sleep {{ $profile.preStopDrainSeconds }}
+{{- end -}}
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Time-in-State Analytics
+Per-status dwell times from the document_status_transitions log (see
+status_transitions.py): how long documents really stay in RESTARTED,
+running, etc., independent of unrelated updates to last_modified_on.
+
+Transitions are streamed into flat columns (document run, status code,
+epoch seconds) and reduced with NumPy when it is installed; a pure-Python
+path produces the same numbers without it.
+
+Usage:
+    python time_in_state.py [--hours N] [--org ORG_ID] [--top N]
+    python time_in_state.py --benchmark N      # synthetic N transitions
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional speed-up
+    np = None
+
+from sqlalchemy import text
+from database.database import SessionLocal
+from status_transitions import TRANSITIONS_TABLE
+from logger import get_logger
+
+logger = get_logger()
+
+FETCH_CHUNK_SIZE = 50000
+PERCENTILES = (50, 90, 99)
+
+
+class TransitionColumns:
+    """Transitions as parallel arrays, sorted by document then time.
+
+    ``doc`` numbers each document's run of transitions, so consecutive rows
+    with the same value belong to one document; ``doc_ids`` maps it back.
+    """
+
+    def __init__(self):
+        self.doc = array("l")
+        self.status = array("h")
+        self.ts = array("d")
+        self.status_names: List[str] = []
+        self.doc_ids: List = []
+        self._status_codes: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.ts)
+
+    def status_code(self, status: Optional[str]) -> int:
+        status = status or "unknown"
+        code = self._status_codes.get(status)
+        if code is None:
+            code = self._status_codes[status] = len(self.status_names)
+            self.status_names.append(status)
+        return code
+
+    def append(self, document_id, status: Optional[str], changed_on: float):
+        if not self.doc_ids or self.doc_ids[-1] != document_id:
+            self.doc_ids.append(document_id)
+        self.doc.append(len(self.doc_ids) - 1)
+        self.status.append(self.status_code(status))
+        self.ts.append(changed_on)
+
+
+def load_transitions(
+    hours: int = 24, org_id: str = None, chunk_size: int = FETCH_CHUNK_SIZE
+) -> TransitionColumns:
+    """Stream transitions of the window into columns via a server-side cursor."""
+    columns = TransitionColumns()
+    session = SessionLocal()
+    try:
+        query = f"""
+            SELECT
+                document_id,
+                new_status,
+                EXTRACT(EPOCH FROM changed_on) AS changed_epoch
+            FROM {TRANSITIONS_TABLE}
+            WHERE changed_on >= :cutoff
+        """
+        params = {"cutoff": datetime.now() - timedelta(hours=hours)}
+        if org_id:
+            query += " AND org_id = :org_id"
+            params["org_id"] = org_id
+        query += " ORDER BY document_id, changed_on, id"
+
+        result = session.execute(
+            text(query).execution_options(stream_results=True), params
+        )
+        for rows in result.partitions(chunk_size):
+            for document_id, status, changed_epoch in rows:
+                columns.append(document_id, status, float(changed_epoch))
+        return columns
+    finally:
+        session.close()
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, matching numpy.percentile's default."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+def _status_summary(closed, open_ages) -> Dict:
+    summary = {
+        "completed": len(closed),
+        "open": len(open_ages),
+        "mean_seconds": round(sum(closed) / len(closed), 1) if len(closed) else None,
+        "total_hours": round(sum(closed) / 3600, 2),
+        "open_max_seconds": round(max(open_ages), 1) if len(open_ages) else None,
+    }
+    for q in PERCENTILES:
+        value = _percentile(closed, q)
+        summary[f"p{q}_seconds"] = round(value, 1) if value is not None else None
+    return summary
+
+
+def dwell_times_python(columns: TransitionColumns, now: float) -> Dict[str, Dict]:
+    """Per-status dwell statistics; pure-Python reference implementation."""
+    closed: Dict[int, List[float]] = {}
+    open_ages: Dict[int, List[float]] = {}
+    doc, status, ts = columns.doc, columns.status, columns.ts
+    n = len(ts)
+    for i in range(n):
+        if i + 1 < n and doc[i + 1] == doc[i]:
+            closed.setdefault(status[i], []).append(ts[i + 1] - ts[i])
+        else:
+            open_ages.setdefault(status[i], []).append(now - ts[i])
+
+    stats = {}
+    for code, name in enumerate(columns.status_names):
+        stats[name] = _status_summary(
+            sorted(closed.get(code, [])), open_ages.get(code, [])
+        )
+    return stats
+
+
+def dwell_times_numpy(columns: TransitionColumns, now: float) -> Dict[str, Dict]:
+    """Per-status dwell statistics with array operations."""
+    doc = np.frombuffer(columns.doc, dtype=np.dtype(columns.doc.typecode))
+    status = np.frombuffer(columns.status, dtype=np.int16)
+    ts = np.frombuffer(columns.ts, dtype=np.float64)
+    if not len(ts):
+        return {}
+
+    # A state ends where the same document's next transition starts; the
+    # last state of each document is still open
+    same_next = np.append(doc[1:] == doc[:-1], False)
+    dwell = np.where(same_next, np.append(ts[1:], now) - ts, now - ts)
+
+    order = np.argsort(status, kind="stable")
+    status_sorted = status[order]
+    closed_sorted = same_next[order]
+    dwell_sorted = dwell[order]
+    boundaries = np.searchsorted(
+        status_sorted, np.arange(len(columns.status_names) + 1)
+    )
+
+    stats = {}
+    for code, name in enumerate(columns.status_names):
+        start, stop = boundaries[code], boundaries[code + 1]
+        group_closed = closed_sorted[start:stop]
+        group_dwell = dwell_sorted[start:stop]
+        closed = group_dwell[group_closed]
+        open_ages = group_dwell[~group_closed]
+        n_closed = len(closed)
+        summary = {
+            "completed": n_closed,
+            "open": len(open_ages),
+            "mean_seconds": round(float(closed.mean()), 1) if n_closed else None,
+            "total_hours": round(float(closed.sum()) / 3600, 2),
+            "open_max_seconds": (
+                round(float(open_ages.max()), 1) if len(open_ages) else None
+            ),
+        }
+        values = (
+            np.percentile(closed, PERCENTILES)
+            if n_closed
+            else [None] * len(PERCENTILES)
+        )
+        for q, value in zip(PERCENTILES, values):
+            summary[f"p{q}_seconds"] = (
+                round(float(value), 1) if value is not None else None
+            )
+        stats[name] = summary
+    return stats
+
+
+def dwell_times(columns: TransitionColumns, now: float = None) -> Dict[str, Dict]:
+    now = time.time() if now is None else now
+    if np is not None:
+        return dwell_times_numpy(columns, now)
+    return dwell_times_python(columns, now)
+
+
+def slowest_documents(
+    columns: TransitionColumns, status: str, top: int = 10, now: float = None
+) -> List[Dict]:
+    """Documents with the longest single stay in ``status`` (open stays included)."""
+    now = time.time() if now is None else now
+    code = columns._status_codes.get(status)
+    if code is None:
+        return []
+    doc, codes, ts = columns.doc, columns.status, columns.ts
+    n = len(ts)
+    stays = []
+    for i in range(n):
+        if codes[i] != code:
+            continue
+        is_open = not (i + 1 < n and doc[i + 1] == doc[i])
+        stays.append(((now if is_open else ts[i + 1]) - ts[i], is_open, doc[i]))
+    stays.sort(reverse=True)
+    return [
+        {
+            "document_id": str(columns.doc_ids[d]),
+            "seconds": round(seconds, 1),
+            "still_in_state": is_open,
+        }
+        for seconds, is_open, d in stays[:top]
+    ]
+
+
+def synthetic_columns(transitions: int, seed_value: int = 42) -> TransitionColumns:
+    """Random RESTARTED → running → terminal histories for benchmarking."""
+    rng = random.Random(seed_value)
+    paths = [
+        ["RESTARTED", "running", "ready_for_validation"],
+        ["RESTARTED", "running", "error"],
+        ["RESTARTED", "running", "RESTARTED", "running", "ready_for_validation"],
+        ["RESTARTED", "running"],
+    ]
+    columns = TransitionColumns()
+    start = time.time() - 86400
+    document = 0
+    while len(columns) < transitions:
+        ts = start + rng.random() * 80000
+        for status in rng.choice(paths):
+            columns.append(document, status, ts)
+            ts += rng.expovariate(1 / 120.0)
+        document += 1
+    return columns
+
+
+def benchmark(transitions: int) -> Dict:
+    columns = synthetic_columns(transitions)
+    now = time.time()
+    timings = {}
+
+    started = time.perf_counter()
+    python_stats = dwell_times_python(columns, now)
+    timings["python_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    if np is not None:
+        started = time.perf_counter()
+        numpy_stats = dwell_times_numpy(columns, now)
+        timings["numpy_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        timings["results_match"] = all(
+            python_stats[s]["p50_seconds"] == numpy_stats[s]["p50_seconds"]
+            for s in python_stats
+        )
+    return {"transitions": len(columns), **timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-in-state analytics")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--org", help="restrict to one org_id")
+    parser.add_argument("--top", type=int, default=10, help="slowest documents")
+    parser.add_argument("--status", default="RESTARTED", help="status for --top")
+    parser.add_argument("--benchmark", type=int, metavar="N")
+    args = parser.parse_args()
+
+    print("=== Time in State ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print(f"Engine: {'numpy' if np is not None else 'pure python'}")
+    print()
+
+    if args.benchmark:
+        result = benchmark(args.benchmark)
+        print(f"Transitions: {result['transitions']}")
+        print(f"Pure Python: {result['python_ms']} ms")
+        if "numpy_ms" in result:
+            print(
+                f"NumPy:       {result['numpy_ms']} ms "
+                f"(results match: {result['results_match']})"
+            )
+        return result
+
+    started = time.perf_counter()
+    columns = load_transitions(args.hours, args.org)
+    loaded = time.perf_counter()
+    stats = dwell_times(columns)
+    computed = time.perf_counter()
+
+    print(
+        f"{len(columns)} transitions, {len(columns.doc_ids)} documents, "
+        f"last {args.hours}h (load {loaded - started:.2f}s, "
+        f"compute {computed - loaded:.2f}s)"
+    )
+    print()
+    print(
+        f"{'status':24s} {'done':>8s} {'open':>7s} {'p50':>9s} "
+        f"{'p90':>9s} {'p99':>9s} {'open max':>9s}"
+    )
+    for name, summary in sorted(
+        stats.items(), key=lambda item: -(item[1]["total_hours"] or 0)
+    ):
+
+        def fmt(seconds):
+            return f"{seconds / 60:8.1f}m" if seconds is not None else f"{'-':>9s}"
+
+        print(
+            f"{name:24s} {summary['completed']:8d} {summary['open']:7d} "
+            f"{fmt(summary['p50_seconds'])} {fmt(summary['p90_seconds'])} "
+            f"{fmt(summary['p99_seconds'])} {fmt(summary['open_max_seconds'])}"
+        )
+
+    slowest = slowest_documents(columns, args.status, args.top)
+    if slowest:
+        print(f"\nLongest stays in {args.status}:")
+        for entry in slowest:
+            marker = " (still there)" if entry["still_in_state"] else ""
+            print(f"  {entry['document_id']}: {entry['seconds'] / 60:.1f} min{marker}")
+    return stats
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
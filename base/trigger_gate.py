@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Trigger Gate
+Backpressure and mutual exclusion for trigger_restarted_documents. The
+beat schedules it every minute and ErrorCoordinatorFix (plus the manual
+and direct trigger scripts) start extra runs on top, so without a gate
+runs overlap and keep enqueueing while the processing queue is already
+deep.
+
+- run_gated() holds a distributed lock for the whole run, so only one
+  trigger run is active at a time. The lock lives in Redis (TRIGGER_REDIS_URL or
+  REDIS_URL), with a heartbeat extending it while the run is alive.
+  Without Redis it is a Postgres advisory lock, which is released on its
+  own if the process dies.
+- Before anything is enqueued, assess() reads the broker queue depth
+  and the workers' active + reserved tasks. It skips the run when queued
+  plus running work exceeds BACKLOG_PER_SLOT per worker slot (or the
+  queue is past MAX_QUEUE_DEPTH), and otherwise shrinks the batch to the
+  remaining headroom.
+- request_trigger() is for extra runs: it enqueues one only when no run is
+  active or already pending and the workers have room. A document it does
+  not enqueue for stays RESTARTED for the next scheduled run.
+
+The Celery task wraps its body as
+``run_gated(lambda batch_size: <select and enqueue batch_size documents>)``.
+
+Usage:
+    python trigger_gate.py            # current queue depth, load and decision
+"""
+
+import sys
+import os
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.database import SessionLocal
+from diagnostics_cache import RELEASE_LOCK_SCRIPT, SOCKET_TIMEOUT
+from logger import get_logger
+
+logger = get_logger()
+
+TRIGGER_TASK = "trigger_restarted_documents"
+LOCK_KEY = f"{TRIGGER_TASK}:lock"
+PENDING_KEY = f"{TRIGGER_TASK}:pending"
+
+# Covers a slow run; the heartbeat extends it every third of the TTL, so
+# it only runs out when the holder is gone
+LOCK_TTL_MS = 180000
+# An extra run queued by request_trigger() counts as pending this long
+PENDING_TTL_SECONDS = 120
+
+DEFAULT_BATCH_SIZE = 10
+PROCESSING_QUEUES = tuple(
+    queue.strip()
+    for queue in os.getenv("TRIGGER_PROCESSING_QUEUES", "celery").split(",")
+    if queue.strip()
+)
+# Queued + running tasks allowed per worker slot before triggers back off
+BACKLOG_PER_SLOT = float(os.getenv("TRIGGER_BACKLOG_PER_SLOT", 2))
+MAX_QUEUE_DEPTH = int(os.getenv("TRIGGER_MAX_QUEUE_DEPTH", 500))
+# Slots assumed when the workers cannot be inspected (document-processing
+# profile concurrency)
+DEFAULT_WORKER_SLOTS = int(os.getenv("TRIGGER_WORKER_SLOTS", 4))
+# Documents in running for longer are orphans, not load (task_reconciler)
+RUNNING_WINDOW_MINUTES = 30
+
+# Extends the lock only while it still holds our token
+REFRESH_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def redis_client_from_env():
+    """Redis client for TRIGGER_REDIS_URL / REDIS_URL, or None."""
+    url = os.getenv("TRIGGER_REDIS_URL") or os.getenv("REDIS_URL")
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError:
+        return None
+    return redis.Redis.from_url(
+        url, socket_timeout=SOCKET_TIMEOUT * 4, socket_connect_timeout=SOCKET_TIMEOUT
+    )
+
+
+def _advisory_key(name: str) -> int:
+    return int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big", signed=True)
+
+
+class TriggerLock:
+    """One trigger run at a time, across pods.
+
+    Redis when a client is available, otherwise a Postgres advisory lock
+    on a connection held for the run; if neither works (e.g. SQLite in
+    the offline harness) only runs within this process are excluded.
+    """
+
+    _local = threading.Lock()
+
+    def __init__(self, client="env", name: str = LOCK_KEY, ttl_ms: int = LOCK_TTL_MS):
+        self.client = redis_client_from_env() if client == "env" else client
+        self.name = name
+        self.ttl_ms = ttl_ms
+        self.token = uuid.uuid4().hex
+        self.backend = None
+        self._connection = None
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self) -> bool:
+        if self.client is not None:
+            try:
+                if not self.client.set(self.name, self.token, nx=True, px=self.ttl_ms):
+                    return False
+                self.backend = "redis"
+                self._start_heartbeat()
+                return True
+            except Exception as e:
+                logger.add_log(
+                    "warning", "all", f"TRIGGER_GATE: Redis lock unavailable: {e}"
+                )
+
+        try:
+            from database.database import engine
+
+            connection = engine.connect()
+            try:
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": _advisory_key(self.name)},
+                ).scalar()
+            except Exception:
+                connection.close()
+                raise
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+            self.backend = "postgres"
+            return True
+        except Exception as e:
+            logger.add_log(
+                "warning",
+                "all",
+                f"TRIGGER_GATE: no distributed lock, excluding local runs only: {e}",
+            )
+
+        if not self._local.acquire(blocking=False):
+            return False
+        self.backend = "local"
+        return True
+
+    def _start_heartbeat(self):
+        refresh = self.client.register_script(REFRESH_LOCK_SCRIPT)
+
+        def beat():
+            while not self._stop.wait(self.ttl_ms / 3000):
+                try:
+                    if not refresh(keys=[self.name], args=[self.token, self.ttl_ms]):
+                        logger.add_log(
+                            "warning", "all", "TRIGGER_GATE: lock lost during run"
+                        )
+                        return
+                except Exception as e:
+                    logger.add_log(
+                        "warning", "all", f"TRIGGER_GATE: lock refresh failed: {e}"
+                    )
+
+        self._heartbeat = threading.Thread(
+            target=beat, name="trigger-lock-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def release(self):
+        backend, self.backend = self.backend, None
+        if backend == "redis":
+            self._stop.set()
+            try:
+                self.client.register_script(RELEASE_LOCK_SCRIPT)(
+                    keys=[self.name], args=[self.token]
+                )
+            except Exception as e:
+                # Expires with its TTL now that the heartbeat has stopped
+                logger.add_log(
+                    "warning", "all", f"TRIGGER_GATE: lock release failed: {e}"
+                )
+        elif backend == "postgres":
+            try:
+                self._connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": _advisory_key(self.name)},
+                )
+            finally:
+                self._connection.close()
+                self._connection = None
+        elif backend == "local":
+            self._local.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class CeleryProbe:
+    """Processing queue depth and worker load from the broker and workers."""
+
+    def __init__(self, queues=PROCESSING_QUEUES, timeout: float = 2.0):
+        self.queues = tuple(queues)
+        self.timeout = timeout
+
+    def queue_depth(self) -> Optional[int]:
+        """Messages waiting in the processing queues, or None if unreadable."""
+        try:
+            from celery_run import app as celery_app
+
+            total = 0
+            with celery_app.connection_for_read() as connection:
+                channel = connection.default_channel
+                for queue in self.queues:
+                    total += channel.queue_declare(
+                        queue=queue, passive=True
+                    ).message_count
+            return total
+        except Exception as e:
+            logger.add_log("warning", "all", f"TRIGGER_GATE: queue depth unknown: {e}")
+            return None
+
+    def worker_load(self) -> Optional[Tuple[int, int]]:
+        """(active + reserved tasks, pool slots) of the processing workers."""
+        try:
+            from celery_run import app as celery_app
+
+            inspector = celery_app.control.inspect(timeout=self.timeout)
+            workers = [
+                worker
+                for worker, queues in (inspector.active_queues() or {}).items()
+                if any(queue.get("name") in self.queues for queue in queues)
+            ]
+            if not workers:
+                return None
+            inspector = celery_app.control.inspect(
+                destination=workers, timeout=self.timeout
+            )
+            capacity = sum(
+                (stats.get("pool") or {}).get("max-concurrency", 0)
+                for stats in (inspector.stats() or {}).values()
+            )
+            in_flight = sum(
+                len(tasks)
+                for method in (inspector.active, inspector.reserved)
+                for tasks in (method() or {}).values()
+            )
+            return in_flight, capacity
+        except Exception as e:
+            logger.add_log("warning", "all", f"TRIGGER_GATE: worker load unknown: {e}")
+            return None
+
+
+def running_documents() -> Optional[int]:
+    """Documents recently set to running: in-flight work when workers are opaque."""
+    session = SessionLocal()
+    try:
+        return session.execute(
+            text("""
+                SELECT COUNT(*)
+                FROM documents
+                WHERE status IN ('running', 'processing')
+                AND is_deleted = false
+                AND last_modified_on >= :since
+                """),
+            {"since": datetime.now() - timedelta(minutes=RUNNING_WINDOW_MINUTES)},
+        ).scalar()
+    except Exception as e:
+        logger.add_log("warning", "all", f"TRIGGER_GATE: running count failed: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def assess(requested: int = DEFAULT_BATCH_SIZE, probe=None) -> Dict:
+    """Whether a trigger run may enqueue now, and how many documents."""
+    probe = probe or CeleryProbe()
+    depth = probe.queue_depth()
+    load = probe.worker_load()
+    if load is not None and load[1]:
+        in_flight, capacity = load
+        load_source = "workers"
+    else:
+        in_flight, capacity = running_documents(), DEFAULT_WORKER_SLOTS
+        load_source = "documents"
+
+    assessment = {
+        "requested": requested,
+        "queue_depth": depth,
+        "in_flight": in_flight,
+        "capacity": capacity,
+        "load_source": load_source,
+    }
+    if depth is None and in_flight is None:
+        # Nothing observable: behave as before rather than stall recovery
+        return dict(assessment, admit=True, batch_size=requested, reason="unobserved")
+
+    backlog = (depth or 0) + (in_flight or 0)
+    headroom = int(capacity * BACKLOG_PER_SLOT) - backlog
+    if depth is not None and depth >= MAX_QUEUE_DEPTH:
+        return dict(
+            assessment,
+            admit=False,
+            batch_size=0,
+            reason=f"queue depth {depth} ≥ {MAX_QUEUE_DEPTH}",
+        )
+    if headroom <= 0:
+        return dict(
+            assessment,
+            admit=False,
+            batch_size=0,
+            reason=f"workers saturated ({backlog} queued+running for {capacity} slots)",
+        )
+    batch_size = min(requested, headroom)
+    return dict(
+        assessment,
+        admit=True,
+        batch_size=batch_size,
+        reason="shrunk to headroom" if batch_size < requested else "headroom",
+    )
+
+
+def run_gated(
+    run: Callable[[int], Dict],
+    requested: int = DEFAULT_BATCH_SIZE,
+    probe=None,
+    lock: TriggerLock = None,
+) -> Dict:
+    """Run ``run(batch_size)`` under the trigger lock, if backpressure allows."""
+    lock = lock or TriggerLock()
+    if not lock.acquire():
+        logger.add_log("info", "all", "TRIGGER_GATE: skipped, another run is active")
+        return {"status": "skipped", "reason": "another trigger run is active"}
+    try:
+        if lock.client is not None:
+            try:
+                # This run covers whatever an extra run was queued for
+                lock.client.delete(PENDING_KEY)
+            except Exception:
+                pass
+        assessment = assess(requested, probe)
+        if not assessment["admit"]:
+            logger.add_log(
+                "info", "all", f"TRIGGER_GATE: skipped, {assessment['reason']}"
+            )
+            return {
+                "status": "skipped",
+                "reason": assessment["reason"],
+                "backpressure": assessment,
+            }
+        result = run(assessment["batch_size"])
+        if isinstance(result, dict):
+            result.setdefault("backpressure", assessment)
+        return result
+    finally:
+        lock.release()
+
+
+def request_trigger(enqueue: Callable[[], object], client="env", probe=None) -> Dict:
+    """Queue one extra trigger run unless one is active, pending or unneeded.
+
+    Without Redis there is no pending marker to share, so only backpressure
+    is checked; the run lock still keeps the runs from overlapping.
+    """
+    client = redis_client_from_env() if client == "env" else client
+    if client is not None:
+        try:
+            if client.get(LOCK_KEY) is not None:
+                return {"enqueued": False, "reason": "a trigger run is active"}
+            if client.get(PENDING_KEY) is not None:
+                return {"enqueued": False, "reason": "a trigger run is already queued"}
+        except Exception as e:
+            logger.add_log("warning", "all", f"TRIGGER_GATE: dedupe unavailable: {e}")
+            client = None
+
+    assessment = assess(1, probe)
+    if not assessment["admit"]:
+        return {
+            "enqueued": False,
+            "reason": assessment["reason"],
+            "backpressure": assessment,
+        }
+
+    if client is not None:
+        try:
+            if not client.set(PENDING_KEY, "1", nx=True, ex=PENDING_TTL_SECONDS):
+                return {"enqueued": False, "reason": "a trigger run is already queued"}
+        except Exception as e:
+            logger.add_log("warning", "all", f"TRIGGER_GATE: dedupe unavailable: {e}")
+    result = enqueue()
+    return {
+        "enqueued": True,
+        "task_id": getattr(result, "id", None),
+        "backpressure": assessment,
+    }
+
+
+def main():
+    print("=== Trigger Gate ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print(f"Processing queues: {', '.join(PROCESSING_QUEUES)}")
+    started = time.perf_counter()
+    assessment = assess()
+    print(f"Queue depth: {assessment['queue_depth']}")
+    print(
+        f"In flight: {assessment['in_flight']} of {assessment['capacity']} slots "
+        f"(from {assessment['load_source']})"
+    )
+    marker = "✅" if assessment["admit"] else "⏸️ "
+    print(
+        f"{marker} batch {assessment['batch_size']}/{assessment['requested']}: "
+        f"{assessment['reason']} ({time.perf_counter() - started:.2f}s)"
+    )
+    return assessment
+
+
+if __name__ == "__main__":
+    from query_explainer import main_with_explain_flag
+
+    main_with_explain_flag(main)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Worker Profiles
+Build Celery worker command lines from the `celery.profiles` block in the
+base chart's values.yaml, so local launchers and deployments share one
+definition of queue, pool, concurrency and prefetch settings.
+
+Usage:
+    python worker_profiles.py PROFILE [--values FILE ...] [--exec]
+"""
+
+import os
+import argparse
+from typing import Dict, List
+
+import yaml
+
+CHART_VALUES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "values.yaml")
+
+
+def _merge(base: Dict, override: Dict) -> Dict:
+    """Deep-merge maps the way Helm merges values files."""
+    merged = dict(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_values(values_files: List[str] = None) -> Dict:
+    """Effective chart values: chart defaults plus overrides in order."""
+    values = {}
+    for path in [CHART_VALUES] + list(values_files or []):
+        with open(path) as f:
+            values = _merge(values, yaml.safe_load(f) or {})
+    return values
+
+
+def load_celery_values(values_files: List[str] = None) -> Dict:
+    """The effective ``celery`` block: chart defaults plus overrides in order."""
+    return load_values(values_files).get("celery") or {}
+
+
+def get_profile(name: str, values_files: List[str] = None) -> Dict:
+    profiles = load_celery_values(values_files).get("profiles") or {}
+    if name not in profiles:
+        raise KeyError(
+            f"Unknown worker profile {name!r}; defined: {', '.join(sorted(profiles))}"
+        )
+    return profiles[name]
+
+
+def build_worker_command(
+    name: str,
+    values_files: List[str] = None,
+    celery_bin: List[str] = None,
+) -> List[str]:
+    """Worker argv for profile ``name``, matching base.celeryWorkerCommand.
+
+    ``celery_bin`` replaces the chart's ``celery.bin`` (e.g. with
+    ``[sys.executable, "-m", "celery"]`` for a local virtualenv).
+    """
+    celery = load_celery_values(values_files)
+    profile = get_profile(name, values_files)
+
+    cmd = list(celery_bin or [celery.get("bin") or "celery"])
+    cmd += [
+        "-A",
+        celery.get("app", "celery_run"),
+        "worker",
+        f"--loglevel={celery.get('loglevel') or 'info'}",
+        f"--queues={','.join(profile['queues'])}",
+        f"--pool={profile.get('pool') or 'prefork'}",
+        f"--concurrency={profile['concurrency']}",
+    ]
+    if profile.get("prefetchMultiplier"):
+        cmd.append(f"--prefetch-multiplier={profile['prefetchMultiplier']}")
+    if profile.get("maxTasksPerChild"):
+        cmd.append(f"--max-tasks-per-child={profile['maxTasksPerChild']}")
+    if profile.get("maxMemoryPerChild"):
+        cmd.append(f"--max-memory-per-child={int(profile['maxMemoryPerChild'])}")
+    return cmd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print or run a Celery worker profile")
+    parser.add_argument("profile")
+    parser.add_argument(
+        "--values", action="append", default=[], help="values file overrides"
+    )
+    parser.add_argument(
+        "--exec", action="store_true", help="replace this process with the worker"
+    )
+    args = parser.parse_args()
+
+    cmd = build_worker_command(args.profile, args.values)
+    print(" ".join(cmd))
+    if args.exec:
+        os.execvp(cmd[0], cmd)
+
+
+if __name__ == "__main__":
+    main()
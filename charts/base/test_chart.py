@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Chart Test Harness
+Renders the base chart for every test-values file, and the release values
+files at the repository root, with `helm template` in parallel, then checks
+the parsed manifests instead of grepping the output.
+
+Rendered output is cached by a hash of everything that affects it (chart
+files, values files, release name, --set flags, helm version), so a re-run
+only calls helm for cases whose inputs changed. Failed renders are never
+cached, so a transient helm error is retried on the next run.
+
+Usage:
+    python charts/base/test_chart.py [-k NAME] [--jobs N] [--no-cache] [--no-lint]
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import yaml
+
+CHART_DIR = os.path.dirname(os.path.abspath(__file__))
+CHARTS_DIR = os.path.dirname(CHART_DIR)
+REPO_ROOT = os.path.dirname(CHARTS_DIR)
+# The chart deploy-dev.sh installs the release values files with
+DEPLOYED_CHART = os.path.join(REPO_ROOT, "base")
+TEST_VALUES_DIR = os.path.join(CHART_DIR, "test-values")
+
+CACHE_DIR = os.getenv(
+    "CHART_TEST_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "helm-chart-tests"),
+)
+
+# Chart entries that affect what helm renders; anything else in a chart
+# directory (tests, docs, the ops scripts next to ./base) is not hashed
+RENDERED = (
+    "Chart.yaml",
+    "Chart.lock",
+    "values.yaml",
+    "values.schema.json",
+    "templates",
+    "charts",
+    "crds",
+)
+
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:  # pragma: no cover - libyaml not compiled in
+    _Loader = yaml.SafeLoader
+
+
+class Case:
+    """One `helm template` invocation and the checks on its manifests.
+
+    Each check takes the parsed manifests and returns an error message, or
+    None when it holds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        values: Sequence[str] = (),
+        release: str = "test",
+        chart: str = CHART_DIR,
+        sets: Sequence[str] = (),
+        should_fail: bool = False,
+        checks: Sequence[Callable[[List[Dict]], Optional[str]]] = (),
+    ):
+        self.name = name
+        self.values = list(values)
+        self.release = release
+        self.chart = chart
+        self.sets = list(sets)
+        self.should_fail = should_fail
+        self.checks = list(checks)
+
+    def command(self) -> List[str]:
+        command = ["helm", "template", self.release, self.chart]
+        for path in self.values:
+            command += ["-f", path]
+        for assignment in self.sets:
+            command += ["--set", assignment]
+        return command
+
+
+# --- checks -----------------------------------------------------------------
+
+
+def of_kind(manifests: List[Dict], kind: str) -> List[Dict]:
+    return [m for m in manifests if m.get("kind") == kind]
+
+
+def names_of(manifests: List[Dict], kind: str) -> List[str]:
+    return [m.get("metadata", {}).get("name") for m in of_kind(manifests, kind)]
+
+
+def count(kind: str, expected: int):
+    def check(manifests):
+        found = len(of_kind(manifests, kind))
+        if found != expected:
+            return f"expected {expected} {kind}, got {found}"
+
+    return check
+
+
+def present(kind: str, name: str = None):
+    def check(manifests):
+        names = names_of(manifests, kind)
+        if not names:
+            return f"expected at least one {kind}"
+        if name is not None and name not in names:
+            return f"expected {kind} {name}, got {', '.join(map(str, names))}"
+
+    return check
+
+
+def ingress_backends(expected: Dict[str, object]):
+    """Every Ingress path points at ``{"name": ..., "port": ...}`` backends."""
+
+    def check(manifests):
+        for ingress in of_kind(manifests, "Ingress"):
+            for rule in ingress["spec"].get("rules", []):
+                for path in rule["http"]["paths"]:
+                    service = path["backend"].get("service", {})
+                    port = service.get("port", {})
+                    found = {
+                        "name": service.get("name"),
+                        "port": port.get("number", port.get("name")),
+                    }
+                    if found != expected:
+                        return f"ingress backend {found}, expected {expected}"
+
+    return check
+
+
+def release_values_cases() -> List[Case]:
+    """The values-*.yaml releases at the repo root, rendered as deployed.
+
+    They are rendered against ./base with the release name and
+    fullnameOverride from deploy-dev.sh; files with a ``jobs:`` list
+    belong to base-cronjob.
+    """
+    deploy_names = {}
+    deploy_script = os.path.join(REPO_ROOT, "deploy-dev.sh")
+    if os.path.exists(deploy_script):
+        with open(deploy_script) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == "deploy_service":
+                    release, values, *rest = (p.strip('"') for p in parts[1:])
+                    deploy_names[values] = (release, rest[0] if rest else release)
+
+    cases = []
+    for filename in sorted(os.listdir(REPO_ROOT)):
+        if not (filename.startswith("values-") and filename.endswith(".yaml")):
+            continue
+        path = os.path.join(REPO_ROOT, filename)
+        with open(path) as f:
+            values = yaml.load(f, Loader=_Loader) or {}
+
+        if isinstance(values.get("jobs"), list):
+            cases.append(
+                Case(
+                    f"Release {filename}",
+                    [path],
+                    release=filename[len("values-") : -len(".yaml")],
+                    chart=os.path.join(CHARTS_DIR, "base-cronjob"),
+                    checks=[present("CronJob", job["name"]) for job in values["jobs"]],
+                )
+            )
+            continue
+
+        release, deployment = deploy_names.get(
+            filename, (filename[len("values-dev-") : -len(".yaml")], None)
+        )
+        cases.append(
+            Case(
+                f"Release {filename}",
+                [path],
+                release=release,
+                chart=DEPLOYED_CHART,
+                sets=[f"fullnameOverride={deployment}"] if deployment else [],
+                checks=[
+                    count("Deployment", 1),
+                    present("Deployment", deployment),
+                ],
+            )
+        )
+    return cases
+
+
+def default_cases() -> List[Case]:
+    """The test-helm.sh matrix plus the release values files."""
+
+    def values(filename):
+        return [os.path.join(TEST_VALUES_DIR, filename)]
+
+    return [
+        Case(
+            "No ingress defined",
+            values("1-no-ingress.yaml"),
+            checks=[count("Ingress", 0)],
+        ),
+        Case(
+            "Ingress disabled",
+            values("2-ingress-disabled.yaml"),
+            checks=[count("Ingress", 0)],
+        ),
+        Case(
+            "Single ingress",
+            values("3-ingress-single.yaml"),
+            checks=[
+                count("Ingress", 1),
+                ingress_backends({"name": "myservice", "port": 80}),
+            ],
+        ),
+        Case(
+            "Multiple ingresses",
+            values("4-ingress-list.yaml"),
+            checks=[
+                count("Ingress", 2),
+                present("Ingress", "test-base-primary"),
+                present("Ingress", "test-base-api"),
+            ],
+        ),
+        Case(
+            "Old ingress format",
+            values("5-old-ingress-format.yaml"),
+            checks=[
+                count("Ingress", 1),
+                ingress_backends({"name": "old-service", "port": 8080}),
+            ],
+        ),
+        Case(
+            "Service as list",
+            values("6-service-list.yaml"),
+            checks=[count("Service", 1)],
+        ),
+        Case(
+            "No service defined",
+            values("7-no-service.yaml"),
+            checks=[count("Service", 0)],
+        ),
+        Case(
+            "Service without enabled",
+            values("8-service-no-enabled.yaml"),
+            checks=[count("Service", 1)],
+        ),
+        Case(
+            "Using --set flags",
+            sets=["ingress.enabled=false", "service.enabled=true"],
+            checks=[count("Ingress", 0)],
+        ),
+        Case("Default values"),
+        Case(
+            "Multi-release (api)",
+            values("9-multi-release.yaml"),
+            release="api",
+            checks=[present("ConfigMap", "api-base-debug")],
+        ),
+        Case(
+            "Multi-release (api-celery)",
+            values("9-multi-release.yaml"),
+            release="api-celery",
+            checks=[present("ConfigMap", "api-celery-base-debug")],
+        ),
+    ] + release_values_cases()
+
+
+# --- rendering --------------------------------------------------------------
+
+
+def _hash_file(digest, root: str, path: str):
+    digest.update(os.path.relpath(path, root).encode() + b"\0")
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(b"\0")
+
+
+def _hash_chart(digest, root: str):
+    for entry in RENDERED:
+        path = os.path.join(root, entry)
+        if os.path.isfile(path):
+            _hash_file(digest, root, path)
+            continue
+        for directory, subdirs, files in os.walk(path):
+            subdirs.sort()
+            for filename in sorted(files):
+                _hash_file(digest, root, os.path.join(directory, filename))
+
+
+def helm_version() -> str:
+    try:
+        result = subprocess.run(
+            ["helm", "version", "--short"], capture_output=True, text=True
+        )
+    except FileNotFoundError:
+        return ""
+    return result.stdout.strip()
+
+
+def cache_key(case: Case, chart_digests: Dict[str, str], version: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(version.encode() + b"\0")
+    digest.update(chart_digests[case.chart].encode() + b"\0")
+    digest.update(json.dumps([case.release, case.sets]).encode() + b"\0")
+    for path in case.values:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def render(command: List[str]) -> Dict:
+    """Run one `helm template` (in a pool worker)."""
+    result = subprocess.run(command, capture_output=True, text=True)
+    return {
+        "returncode": result.returncode,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def load_cached(key: str) -> Optional[Dict]:
+    try:
+        with open(_cache_path(key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(key: str, rendered: Dict):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(rendered, f)
+    os.replace(temporary, path)
+
+
+def render_all(cases: List[Case], jobs: int = None, use_cache: bool = True):
+    """Rendered output per case, from the cache where the inputs are unchanged.
+
+    Returns (outputs in case order, number of cases actually rendered).
+    """
+    chart_digests = {}
+    for chart in {case.chart for case in cases}:
+        digest = hashlib.sha256()
+        _hash_chart(digest, chart)
+        chart_digests[chart] = digest.hexdigest()
+    version = helm_version()
+
+    keys = [cache_key(case, chart_digests, version) for case in cases]
+    outputs: List[Optional[Dict]] = [
+        load_cached(key) if use_cache else None for key in keys
+    ]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            rendered = pool.map(render, [cases[i].command() for i in missing])
+            for i, output in zip(missing, rendered):
+                outputs[i] = output
+                if output["returncode"] == 0:
+                    store_cached(keys[i], output)
+    return outputs, len(missing)
+
+
+def parse_manifests(output: str) -> List[Dict]:
+    return [
+        document
+        for document in yaml.load_all(output, Loader=_Loader)
+        if isinstance(document, dict)
+    ]
+
+
+def evaluate(case: Case, output: Dict) -> List[str]:
+    """Failure messages for a case; empty when it passed."""
+    if case.should_fail:
+        return [] if output["returncode"] else ["expected rendering to fail"]
+    if output["returncode"]:
+        return [f"rendering failed: {output['stderr'].strip()}"]
+    try:
+        manifests = parse_manifests(output["stdout"])
+    except yaml.YAMLError as e:
+        return [f"rendered output is not valid YAML: {e}"]
+    return [message for check in case.checks if (message := check(manifests))]
+
+
+def lint(chart: str = CHART_DIR) -> Optional[str]:
+    result = subprocess.run(["helm", "lint", chart], capture_output=True, text=True)
+    if result.returncode:
+        return result.stdout + result.stderr
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render and check the base chart")
+    parser.add_argument("-k", dest="pattern", help="only cases whose name contains")
+    parser.add_argument("--jobs", type=int, help="parallel helm processes")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-lint", action="store_true")
+    args = parser.parse_args()
+
+    print("================================")
+    print("Helm Chart Comprehensive Testing")
+    print("================================")
+
+    if not shutil.which("helm"):
+        print("❌ helm not found on PATH; install helm to render the chart")
+        return 1
+
+    if not args.no_lint:
+        problems = lint()
+        if problems:
+            print("❌ Helm lint failed")
+            print(problems)
+            return 1
+        print("✅ Helm lint passed")
+
+    cases = default_cases()
+    if args.pattern:
+        cases = [c for c in cases if args.pattern.lower() in c.name.lower()]
+
+    started = time.perf_counter()
+    outputs, rendered = render_all(cases, args.jobs, not args.no_cache)
+    elapsed = time.perf_counter() - started
+
+    failed = 0
+    for case, output in zip(cases, outputs):
+        messages = evaluate(case, output)
+        if messages:
+            failed += 1
+            print(f"❌ {case.name}")
+            for message in messages:
+                print(f"   {message}")
+        else:
+            print(f"✅ {case.name}")
+
+    print()
+    print("================================")
+    print("Test Summary")
+    print("================================")
+    print(f"✅ Passed: {len(cases) - failed}")
+    print(f"❌ Failed: {failed}")
+    print(
+        f"Rendered {rendered} of {len(cases)} cases in {elapsed:.2f}s "
+        f"({len(cases) - rendered} from cache)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Chart Index Updater
+Incremental replacement for `helm repo index`: updates index.yaml from the
+packaged charts (*.tgz at the top level and one directory down) while only
+reading archives that are new or changed.
+
+A cache maps each archive to its digest by (path, size, mtime), with the git
+blob id as a second key because a fresh checkout resets every mtime.
+Entries whose archive is unchanged are kept as they are, including their
+`created` time. A new archive is read once: Chart.yaml is parsed from the
+tar stream as it goes past and the same bytes feed the sha256 digest, so
+nothing is unpacked to disk.
+
+Usage:
+    python update_index.py [--url URL] [--dir DIR] [--dry-run]
+"""
+
+import sys
+import os
+import json
+import re
+import gzip
+import tarfile
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+DEFAULT_URL = "https://fellow-consulting-ag.github.io/helm_public/"
+CACHE_FILE = ".index-digests.json"
+
+try:
+    _Loader, _Dumper = yaml.CSafeLoader, yaml.CSafeDumper
+except AttributeError:  # pragma: no cover - libyaml not compiled in
+    _Loader, _Dumper = yaml.SafeLoader, yaml.SafeDumper
+
+_SEMVER = re.compile(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?")
+
+
+def version_key(version: str) -> Tuple:
+    """Sort key for chart versions; a pre-release sorts below its release."""
+    match = _SEMVER.match(str(version))
+    if not match:
+        return (-1, -1, -1, 0, str(version))
+    major, minor, patch, pre = match.groups()
+    return (int(major), int(minor or 0), int(patch or 0), pre is None, pre or "")
+
+
+class _HashingReader:
+    """File wrapper that digests every byte read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.sha256.update(data)
+        return data
+
+    def drain(self, chunk_size: int = 1 << 20):
+        while self.read(chunk_size):
+            pass
+
+
+def read_archive(path: str) -> Tuple[str, Dict]:
+    """(sha256 digest, Chart.yaml metadata) from a single pass over ``path``."""
+    with open(path, "rb") as raw:
+        reader = _HashingReader(raw)
+        metadata = None
+        # gzip rather than tarfile's "r|gz", which misreads the extra header
+        # field helm writes into its packages
+        with gzip.GzipFile(fileobj=reader, mode="rb") as unzipped, tarfile.open(
+            fileobj=unzipped, mode="r|"
+        ) as archive:
+            for member in archive:
+                parts = member.name.split("/")
+                if len(parts) == 2 and parts[1] == "Chart.yaml" and member.isfile():
+                    metadata = yaml.load(archive.extractfile(member), Loader=_Loader)
+                    break
+        reader.drain()
+
+    if not isinstance(metadata, dict) or "name" not in metadata:
+        raise ValueError(f"{path}: no Chart.yaml with a name")
+    return reader.sha256.hexdigest(), metadata
+
+
+def find_archives(root: str) -> List[str]:
+    """Packaged charts as `helm repo index` finds them, relative to ``root``."""
+    found = []
+    for entry in sorted(os.listdir(root)):
+        if entry.startswith("."):
+            continue
+        path = os.path.join(root, entry)
+        if entry.endswith(".tgz") and os.path.isfile(path):
+            found.append(entry)
+        elif os.path.isdir(path):
+            for child in sorted(os.listdir(path)):
+                if child.endswith(".tgz"):
+                    found.append(f"{entry}/{child}")
+    return found
+
+
+def git_blob_ids(root: str) -> Dict[str, str]:
+    """Blob id per tracked archive; empty when ``root`` is not a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-s", "--", "*.tgz"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return {}
+    blobs = {}
+    for line in result.stdout.splitlines():
+        info, _, path = line.partition("\t")
+        fields = info.split()
+        if len(fields) == 3:
+            blobs[path] = fields[1]
+    return blobs
+
+
+class DigestCache:
+    """(path, size, mtime) → digest, also matched by (path, size, git blob)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.dirty = False
+
+    def lookup(self, relpath: str, stat, blob: Optional[str]) -> Optional[str]:
+        entry = self.entries.get(relpath)
+        if not entry or entry["size"] != stat.st_size:
+            return None
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            if blob and entry.get("blob") != blob:
+                entry["blob"] = blob
+                self.dirty = True
+            return entry["digest"]
+        if blob and entry.get("blob") == blob:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self.dirty = True
+            return entry["digest"]
+        return None
+
+    def store(self, relpath: str, stat, blob: Optional[str], digest: str):
+        self.entries[relpath] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "blob": blob,
+            "digest": digest,
+        }
+        self.dirty = True
+
+    def prune(self, keep):
+        for relpath in set(self.entries) - set(keep):
+            del self.entries[relpath]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+def load_index(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            index = yaml.load(f, Loader=_Loader) or {}
+    except FileNotFoundError:
+        index = {}
+    index.setdefault("apiVersion", "v1")
+    index["entries"] = index.get("entries") or {}
+    return index
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).astimezone().isoformat()
+
+
+def update_index(root: str, url: str, index_path: str, cache_path: str) -> Dict:
+    """Rebuild the entries from the archives on disk, reading only new ones.
+
+    Returns the new index and counts; ``generated`` is only bumped when an
+    entry was added, changed or removed.
+    """
+    url = url.rstrip("/") + "/"
+    index = load_index(index_path)
+    cache = DigestCache(cache_path)
+    blobs = git_blob_ids(root)
+
+    existing = {}
+    for versions in index["entries"].values():
+        for entry in versions:
+            for entry_url in entry.get("urls") or []:
+                if entry_url.startswith(url):
+                    existing[entry_url[len(url) :]] = entry
+
+    archives = find_archives(root)
+    entries: Dict[str, List[Dict]] = {}
+    stats = {"archives": len(archives), "read": 0, "added": 0, "updated": 0}
+    now = _timestamp()
+
+    for relpath in archives:
+        stat = os.stat(os.path.join(root, relpath))
+        blob = blobs.get(relpath)
+        digest = cache.lookup(relpath, stat, blob)
+        previous = existing.get(relpath)
+
+        if digest is not None and previous and previous.get("digest") == digest:
+            entry = previous
+        else:
+            digest, metadata = read_archive(os.path.join(root, relpath))
+            cache.store(relpath, stat, blob, digest)
+            stats["read"] += 1
+            if previous and previous.get("digest") == digest:
+                entry = previous
+            else:
+                entry = dict(metadata)
+                entry.setdefault("apiVersion", "v1")
+                entry.update(created=now, digest=digest, urls=[url + relpath])
+                stats["updated" if previous else "added"] += 1
+        entries.setdefault(entry["name"], []).append(entry)
+
+    for versions in entries.values():
+        versions.sort(key=lambda e: version_key(e.get("version")), reverse=True)
+    cache.prune(archives)
+    cache.save()
+
+    kept = sum(len(versions) for versions in entries.values())
+    before = sum(len(versions) for versions in index["entries"].values())
+    stats["removed"] = before - (kept - stats["added"])
+    changed = stats["added"] or stats["updated"] or stats["removed"]
+
+    index["entries"] = dict(sorted(entries.items()))
+    if changed or "generated" not in index:
+        index["generated"] = now
+    return {"index": index, "changed": bool(changed), **stats}
+
+
+def write_index(index: Dict, path: str):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        yaml.dump(
+            index,
+            f,
+            Dumper=_Dumper,
+            default_flow_style=False,
+            allow_unicode=True,
+            width=4096,
+        )
+    os.replace(temporary, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update index.yaml")
+    parser.add_argument("--url", default=DEFAULT_URL, help="chart repository URL")
+    parser.add_argument("--dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--index", help="index file (default DIR/index.yaml)")
+    parser.add_argument("--cache", help=f"digest cache (default DIR/{CACHE_FILE})")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    index_path = args.index or os.path.join(args.dir, "index.yaml")
+    cache_path = args.cache or os.path.join(args.dir, CACHE_FILE)
+
+    print("=== Chart Index Update ===")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+
+    result = update_index(args.dir, args.url, index_path, cache_path)
+    print(
+        f"{result['archives']} archives, {result['read']} read; "
+        f"{result['added']} added, {result['updated']} updated, "
+        f"{result['removed']} removed"
+    )
+
+    if not result["changed"]:
+        print("✅ index.yaml is up to date")
+    elif args.dry_run:
+        print("⚠️  Dry run: index.yaml not written")
+    else:
+        write_index(result["index"], index_path)
+        print(f"✅ Wrote {index_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())